@@ -3,19 +3,39 @@ import sys
 import time
 from datetime import datetime, time as dtime
 from datetime import timedelta
-import pandas as pd
+
+from utils.startup_profile import StartupProfile
+
+# --startup-profile を付けると、起動から受信開始までの時間の内訳を表示する
+STARTUP = StartupProfile(enabled="--startup-profile" in sys.argv)
 
 from config.logger import setup_logger
 from config.settings import ENABLE_TICK_OUTPUT, DUMMY_TICK_TEST_MODE,DUMMY_URL
-from client.kabu_websocket import KabuWebSocketClient
+from config.settings import PAPER_TRADING, PAPER_LATENCY_MS, PAPER_SLIPPAGE_TICKS, ENABLE_COMPACTION
+from config.settings import ENABLE_TICK_ARCHIVE, TICK_ARCHIVE_RETENTION_DAYS, ENABLE_ARCHIVE_AUDIT
+from config.settings import STORAGE_BACKEND, STORAGE_DB_PATH, FUTURE_CODE
+from config.settings import ENABLE_SHM_FEED, SHM_FEED_NAME
+from config.settings import ENABLE_FEED_BUS, FEED_BUS_PATH, FEED_BUS_POLICY
+from config.settings import STRATEGY_MODULES, STRATEGY_DEADLINE_MS, STRATEGY_EXECUTOR
+from config.settings import ENABLE_INDICATORS
+from config.settings import TICK_REORDER_WINDOW_MS, TICK_LATE_TOLERANCE_MS
+from config.settings import PROFILE_WINDOW_SEC, PROFILE_MODE, PROFILE_INTERVAL_MS, PROFILE_DIR
+from config.settings import ENABLE_FEED_WATCHDOG, FEED_STALL_FACTOR
 from handler.price_handler import PriceHandler
+from handler.tick_reorder import TickReorderBuffer
 from writer.ohlc_writer import OHLCWriter
 from writer.tick_writer import TickWriter
+from writer.storage_backend import create_storage_backend
 from utils.time_util import get_exchange_code, get_trade_date, is_night_session, is_closing_minute
 from utils.symbol_resolver import get_active_term, get_symbol_code
 from utils.export_util import export_connection_info, export_latest_minutes_to_pd
-from utils.future_info_util import get_token ,register_symbol
-from client.dummy_websocket_client import DummyWebSocketClient
+from utils.future_info_util import get_token ,register_symbol, get_trade_state_cache
+from utils.rest_client import get_rest_client
+from utils.profiler import ProfileWindow, install_signal_trigger, parse_env, ENV_VAR
+# 設定で有効にした機能のモジュール（numpy・pandas・websocket など重い依存を持つもの）は、
+# 起動を速くするため main() の中で使う直前に import する
+
+STARTUP.mark("モジュール読み込み")
 
 
 def main():
@@ -27,16 +47,84 @@ def main():
     prev_last_line = ""
     # ログ設定
     setup_logger()
+    STARTUP.mark("ログ設定")
 
 
     # 初期化
     ohlc_writer = OHLCWriter()
     tick_writer = TickWriter(enable_output=ENABLE_TICK_OUTPUT)
-    price_handler = PriceHandler(ohlc_writer, tick_writer)
+    storage = create_storage_backend(STORAGE_BACKEND, db_path=STORAGE_DB_PATH, symbol=FUTURE_CODE)
+    price_handler = PriceHandler(ohlc_writer, tick_writer, storage=storage,
+                                 reorder=TickReorderBuffer(window_ms=TICK_REORDER_WINDOW_MS),
+                                 late_tolerance_ms=TICK_LATE_TOLERANCE_MS)
     #last_export_minute = None
-
+    if STARTUP.enabled:
+        price_handler.add_tick_listener(STARTUP.on_tick)
+    STARTUP.mark("書き込み先の準備")
+
+    # 他プロセス向けに最新ティックと直近の足を共有メモリへ公開（読み出しは utils/shm_feed.py の ShmFeedReader）
+    shm_feed = None
+    if ENABLE_SHM_FEED:
+        from utils.shm_feed import ShmFeedPublisher
+        shm_feed = ShmFeedPublisher(SHM_FEED_NAME)
+        price_handler.add_tick_listener(shm_feed.on_tick)
+        price_handler.add_bar_listener(shm_feed.on_bar)
+        print(f"[INFO] 共有メモリフィード公開: {SHM_FEED_NAME}")
+
+    # 複数の戦略・ダッシュボードへ Unix ドメインソケットで配信（購読は utils/feed_bus.py の FeedSubscriber）
+    feed_bus = None
+    if ENABLE_FEED_BUS:
+        from utils.feed_bus import FeedBusServer
+        feed_bus = FeedBusServer(FEED_BUS_PATH, policy=FEED_BUS_POLICY)
+        feed_bus.start()
+        price_handler.add_tick_listener(feed_bus.on_tick)
+        price_handler.add_bar_listener(feed_bus.on_bar)
+        feed_bus.publish_status({"event": "start", "time": now})
+
+    # ペーパートレード（注文は Order(token, sender=paper_engine.send_order) で送る）
+    paper_engine = None
+    if PAPER_TRADING:
+        from trade.paper_broker import PaperTradingEngine
+        paper_engine = PaperTradingEngine(latency_ms=PAPER_LATENCY_MS, slippage_ticks=PAPER_SLIPPAGE_TICKS)
+        paper_engine.start()
+        price_handler.add_tick_listener(paper_engine.on_tick)
+        print(f"[INFO] ペーパートレード有効: latency={PAPER_LATENCY_MS}ms slippage={PAPER_SLIPPAGE_TICKS}tick")
+
+    # 指標の逐次計算（確定足ごとに EMA / ATR / VWAP / 高値・安値 / ボリンジャーバンドを更新）
+    indicator_engine = None
+    if ENABLE_INDICATORS:
+        from trade.indicators import IndicatorEngine
+        indicator_engine = IndicatorEngine()
+        indicator_engine.add_listener(lambda snapshot: print(f"[INFO][indicators] {snapshot}"))
+        price_handler.add_bar_listener(indicator_engine.on_bar)
+
+    # 戦略の実行（確定足ごとに全戦略へ並列で配る）
+    strategy_host = None
+    if STRATEGY_MODULES:
+        from trade.strategy_host import StrategyHost
+        strategy_host = StrategyHost(STRATEGY_MODULES, deadline_ms=STRATEGY_DEADLINE_MS, executor=STRATEGY_EXECUTOR)
+        strategy_host.start()
+        price_handler.add_bar_listener(strategy_host.on_bar)
+
+    # プロファイル：環境変数 PFR_PROFILE で起動直後から、またはシグナルで実行中に N 秒間だけ計測
+    profile_mode = PROFILE_MODE
+    profile_seconds = PROFILE_WINDOW_SEC
+    env_profile = parse_env(os.environ.get(ENV_VAR))
+    if env_profile:
+        profile_mode, profile_seconds = env_profile
+    profile_window = ProfileWindow(PROFILE_DIR, mode=profile_mode, interval_ms=PROFILE_INTERVAL_MS,
+                                   targets=[(price_handler, "handle_tick")])
+    signal_name = install_signal_trigger(profile_window, profile_seconds)
+    if signal_name:
+        print(f"[INFO] {signal_name} を受けると {profile_seconds:.0f}秒間プロファイルします（{profile_mode}）")
+    if env_profile:
+        profile_window.start(profile_seconds)
+    STARTUP.mark("機能の初期化")
+
+    feed_watchdog = None
     if DUMMY_TICK_TEST_MODE:
         # ダミーWebSocketクライアント起動
+        from client.dummy_websocket_client import DummyWebSocketClient
         ws_client = DummyWebSocketClient(price_handler, uri = DUMMY_URL)
     else:
         token = get_token()
@@ -57,18 +145,45 @@ def main():
         export_connection_info(symbol_code, exchange_code, token)
 
         # WebSocketクライアント起動
+        from client.kabu_websocket import KabuWebSocketClient
         ws_client = KabuWebSocketClient(price_handler)
 
+        # push配信の停止を検知したら、銘柄を登録し直して再接続する
+        if ENABLE_FEED_WATCHDOG:
+            from client.feed_watchdog import FeedWatchdog
+
+            def recover_feed():
+                register_symbol(symbol_code, get_exchange_code(datetime.now()), get_rest_client().token)
+                if feed_watchdog.stalled:  # 登録している間に受信が再開していれば張り直さない
+                    ws_client.reconnect()
+
+            feed_watchdog = FeedWatchdog(recover_feed, stall_factor=FEED_STALL_FACTOR,
+                                         status_getter=price_handler.get_current_price_status)
+            ws_client.add_message_listener(feed_watchdog.on_message)
+            if feed_bus:
+                feed_watchdog.add_listener(feed_bus.publish_status)
+
     trade_date = get_trade_date(datetime.now())
     END_TIME = datetime.combine(trade_date, dtime(6, 5)) if is_night_session(now) else None
 
+    STARTUP.mark("銘柄登録")
+
     ws_client.start()
+    if feed_watchdog:
+        feed_watchdog.start()
+    STARTUP.mark("受信開始")
+    STARTUP.report()
 
     last_checked_minute = -1
     closing_finalized = False
+    end_time_reached = False
 
     try:
         while True:
+            if TICK_REORDER_WINDOW_MS:
+                # 受信が途切れても、並べ替えのために保持しているティックを保持時間内に処理する
+                price_handler.flush_pending_ticks()
+
             price = price_handler.get_latest_price()
             timestamp = price_handler.get_latest_timestamp()
             status = price_handler.get_current_price_status()
@@ -111,6 +226,7 @@ def main():
             # ✅ 終了判定
             if END_TIME and now >= END_TIME:
                 print("[INFO] 取引終了時刻になったため、自動終了します。")
+                end_time_reached = True
                 break
 
             # ✅ ザラバ中：足の補完処理のみ（出力はhandle_tick任せ）
@@ -143,7 +259,7 @@ def main():
                 if ((now.hour == 15 and now.minute == 45) or (now.hour == 6 and now.minute == 0)) \
                     and not closing_finalized:
                     print(f"[INFO] クロージングtickをhandle_tickに送ります: {price} @ {now}")
-                    price_handler.handle_tick(price or 0, now, 1)
+                    price_handler.handle_closing_tick(price or 0, now, 1)
 
                     # ✅ 最新3分を取得して差分があれば出力
                     new_last_line, df = export_latest_minutes_to_pd(
@@ -167,11 +283,55 @@ def main():
             time.sleep(1)
 
     finally:
+        # 先に受信を止める（止める前に書き込み先を閉じると、受信スレッドが閉じたファイルに書こうとする）
+        if feed_watchdog:
+            feed_watchdog.stop()
+            feed_watchdog.print_stats()
+        ws_client.stop()
+
+        price_handler.flush_pending_ticks(force=True)
         price_handler.finalize_ohlc()
+        price_handler.reorder.print_stats()
         ohlc_writer.close()
         if tick_writer:
             tick_writer.close()
-        ws_client.stop()
+        if storage:
+            storage.close()
+
+        # 最後の足を受け取ってから止める
+        if paper_engine:
+            paper_engine.stop()
+        if strategy_host:
+            strategy_host.stop()
+            strategy_host.print_stats()
+        if shm_feed:
+            shm_feed.close()
+        if feed_bus:
+            feed_bus.publish_status({"event": "stop", "time": datetime.now()})
+            time.sleep(0.1)  # 停止通知を送り切る
+            feed_bus.stop()
+        if not DUMMY_TICK_TEST_MODE:
+            get_rest_client().print_stats()
+            get_trade_state_cache().print_stats()
+
+        # 取引日の締めの処理は、セッションが終わったとき（クロージング済み・終了時刻）だけ行う。
+        # 立会中の Ctrl-C や再起動では、書きかけの取引日を検査・圧縮しない
+        if closing_finalized or end_time_reached:
+            if ENABLE_ARCHIVE_AUDIT:
+                from utils.archive_audit import audit_archive, print_report
+                # 今回の取引日の1分足に欠損・重複・順序の乱れがないかを確認
+                print_report(audit_archive("csv", start=trade_date, end=trade_date), verbose=True)
+            if ENABLE_COMPACTION:
+                from utils.compaction import compact_closed_days
+                # 取引が終わった日のCSVを列指向形式に圧縮（読み込み側は自動で圧縮版を優先）
+                compact_closed_days("csv", "tick_csv")
+            if ENABLE_TICK_ARCHIVE:
+                from utils.tick_archive import archive_closed_ticks, apply_retention
+                # 書き込みが終わったティックCSVを圧縮して保管し、保存期間を過ぎたものを削除
+                archive_closed_ticks("tick_csv")
+                apply_retention("tick_csv", TICK_ARCHIVE_RETENTION_DAYS)
+        elif ENABLE_ARCHIVE_AUDIT or ENABLE_COMPACTION or ENABLE_TICK_ARCHIVE:
+            print("[INFO] セッションの途中で終了したため、1分足の検査・圧縮・ティックの保管は行いません")
 
 if __name__ == "__main__":
 
@@ -18,9 +18,11 @@ class DummyWebSocketClient:
     def stop(self):
         print("[MOCK WS] DummyWebSocketClient を停止します")
         self._running = False
-        if self._loop:
-            # websocket.recv() をキャンセルできるよう shutdown callback をスレッドセーフに送る
-            self._loop.call_soon_threadsafe(self._loop.stop)
+        # 受信ループは1秒ごとに _running を確認して接続を閉じるので、それを待つ
+        # （ループを外から止めると、閉じたループに recv() が残って終了時にエラーになる。
+        #  また、この後で書き込み先を閉じるため、受信中の handle_tick が終わっている必要がある）
+        if self.thread.is_alive():
+            self.thread.join(timeout=2.0)
 
     def _start_event_loop(self):
         self._loop = asyncio.new_event_loop()
@@ -0,0 +1,266 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, time as dtime, timedelta, timezone
+from typing import Callable, Optional
+
+DEFAULT_STALL_FACTOR = 5.0      # 直近のティック間隔の99パーセンタイルの何倍を停止とみなすか
+MAX_STALL_SEC = 300.0           # しきい値と再接続の間隔の上限
+CHECK_INTERVAL_SEC = 1.0
+GAP_HISTORY = 1000              # 時間帯ごとに覚えておく直近のティック間隔の数
+RECALC_EVERY = 100              # 何ティックごとにしきい値を計算し直すか
+HALT_STATUS = 12                # サーキットブレイク中（ティックが来なくても停止とみなさない）
+
+# 時間帯（開始, 終了, 名前, 停止とみなす最短の無受信秒数）。None は約定が無い時間（板寄せ）で停止を判定しない
+SESSION_PHASES = (
+    (dtime(8, 45), dtime(9, 0), "day_open", 10.0),
+    (dtime(9, 0), dtime(15, 40), "day", 20.0),
+    (dtime(15, 40), dtime(15, 46), "day_close", None),
+    (dtime(17, 0), dtime(17, 15), "night_open", 15.0),
+    (dtime(17, 15), dtime(23, 59, 59, 999999), "night", 30.0),
+    (dtime(0, 0), dtime(5, 55), "night_late", 90.0),
+    (dtime(5, 55), dtime(6, 1), "night_close", None),
+)
+
+
+def session_phase(now: datetime) -> Optional[tuple]:
+    """
+    now の時間帯 (名前, 最短しきい値) を返す。立会時間外（週末に始まるセッションを含む）は None。
+    """
+    start_day = now.date() - timedelta(days=1) if now.hour < 8 else now.date()
+    if start_day.weekday() >= 5:
+        return None
+    t = now.time()
+    for start, end, name, base_sec in SESSION_PHASES:
+        if start <= t < end:
+            return name, base_sec
+    return None
+
+
+class _PhaseStats:
+    __slots__ = ("gaps", "threshold", "messages", "trades", "max_gap", "lag_sum", "lag_max", "_since_recalc")
+
+    def __init__(self, base_sec: Optional[float]):
+        self.gaps = deque(maxlen=GAP_HISTORY)
+        self.threshold = base_sec
+        self.messages = 0
+        self.trades = 0
+        self.max_gap = 0.0
+        self.lag_sum = 0.0
+        self.lag_max = 0.0
+        self._since_recalc = 0
+
+
+class FeedWatchdog:
+    """
+    push配信の停止を検知して復旧させるクラス。
+
+    - 時間帯（SESSION_PHASES）ごとに、push の受信間隔と取引所時刻からの遅れ（ローカル時刻 − 現値の時刻）を記録する
+    - 停止のしきい値は時間帯ごとに max(最短しきい値, 直近の受信間隔の99パーセンタイル × stall_factor)。
+      閑散とした時間帯ほど長くなる
+    - 立会中にしきい値より長く push が来なければ停止とみなし、recover()（銘柄の再登録と再接続）を呼ぶ。
+      復旧しなければ間隔を倍にしながら繰り返し、次の受信で復旧までの時間（最後の受信から）を記録する
+    - 板寄せの時間・立会時間外・サーキットブレイク中は判定しない
+    """
+
+    def __init__(self, recover: Optional[Callable[[], None]] = None, stall_factor: float = DEFAULT_STALL_FACTOR,
+                 status_getter: Optional[Callable[[], Optional[int]]] = None):
+        self.recover = recover
+        self.stall_factor = stall_factor
+        self.status_getter = status_getter
+        self.phases = {name: _PhaseStats(base_sec) for _, _, name, base_sec in SESSION_PHASES}
+        self.listeners = []
+
+        self.last_tick_time = None      # 最後に受け取った現値の時刻（取引所時刻）
+        self.last_message_local = None  # 最後に push を受け取ったローカル時刻
+        self.stall_count = 0
+        self.recover_attempts = 0
+        self.last_recovery_sec = None
+        self.max_recovery_sec = 0.0
+
+        self._last_mono = None
+        self._reference = time.monotonic()   # 無受信時間の起点（最後の受信、または立会の始まり）
+        self._was_open = False
+        self._stall_started = None
+        self._attempts = 0
+        self._next_attempt = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_listener(self, listener):
+        """停止・復旧のたびに listener(event) を呼び出す（event は "event": "stall" / "recovered" を含む辞書）。"""
+        self.listeners.append(listener)
+
+    def _notify(self, event: dict):
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"[ERROR][watchdog] リスナーでエラー: {e}")
+
+    @property
+    def stalled(self) -> bool:
+        return self._stall_started is not None
+
+    def on_message(self, timestamp: Optional[datetime]):
+        """
+        push を1件受け取るごとに呼ぶ（KabuWebSocketClient のメッセージリスナー）。
+        価格が変わらない板の更新でも push は届くため、重複除去の前の受信で生存を判定する。
+        timestamp は現値の時刻（CurrentPriceTime）で、前回から変わったとき（新しい約定）だけ遅れを記録する。
+        """
+        mono = time.monotonic()
+        now = datetime.now()
+        lag = None
+        if timestamp is not None and timestamp != self.last_tick_time:
+            if timestamp.tzinfo is not None:
+                lag = (datetime.now(timezone.utc) - timestamp).total_seconds()
+            else:
+                lag = (now - timestamp).total_seconds()
+
+        recovered = None
+        with self._lock:
+            phase = session_phase(now)
+            if phase is not None:
+                stats = self.phases[phase[0]]
+                stats.messages += 1
+                if lag is not None:
+                    stats.trades += 1
+                    stats.lag_sum += lag
+                    if lag > stats.lag_max:
+                        stats.lag_max = lag
+                if self._last_mono is not None and self._stall_started is None:
+                    gap = mono - self._last_mono
+                    stats.gaps.append(gap)
+                    if gap > stats.max_gap:
+                        stats.max_gap = gap
+                    stats._since_recalc += 1
+                    if stats._since_recalc >= RECALC_EVERY and phase[1] is not None:
+                        stats._since_recalc = 0
+                        self._recalc_threshold(stats, phase[1])
+
+            if timestamp is not None:
+                self.last_tick_time = timestamp
+            self.last_message_local = now
+            self._last_mono = mono
+            self._reference = mono
+            if self._stall_started is not None:
+                recovered = mono - self._stall_started
+                self.last_recovery_sec = recovered
+                self.max_recovery_sec = max(self.max_recovery_sec, recovered)
+                self._stall_started = None
+                self._attempts = 0
+                self._next_attempt = 0.0
+
+        if recovered is not None:
+            print(f"[INFO][watchdog] 受信が再開しました（停止から {recovered:.1f}秒）")
+            self._notify({"event": "recovered", "time": now, "recovery_sec": recovered})
+
+    def _recalc_threshold(self, stats: _PhaseStats, base_sec: float):
+        gaps = sorted(stats.gaps)
+        p99 = gaps[int(len(gaps) * 0.99) - 1] if gaps else 0.0
+        stats.threshold = min(max(base_sec, p99 * self.stall_factor), MAX_STALL_SEC)
+
+    def check(self) -> bool:
+        """
+        無受信時間をしきい値と比べ、停止していれば recover() を呼ぶ。監視スレッドから定期的に呼ばれる。
+        recover() を呼んだ場合は True を返す。
+        """
+        mono = time.monotonic()
+        now = datetime.now()
+        phase = session_phase(now)
+        halted = self.status_getter is not None and self.status_getter() == HALT_STATUS
+
+        with self._lock:
+            threshold = self.phases[phase[0]].threshold if phase is not None else None
+            if threshold is None or halted:
+                # 判定しない時間帯は、次に立会が始まった時点から無受信時間を数える
+                self._was_open = False
+                return False
+            if not self._was_open:
+                self._was_open = True
+                self._reference = mono
+                return False
+
+            idle = mono - self._reference
+            if idle < threshold or mono < self._next_attempt:
+                return False
+
+            first = self._stall_started is None
+            if first:
+                self.stall_count += 1
+                self._stall_started = mono - idle
+            self._attempts += 1
+            self.recover_attempts += 1
+            self._next_attempt = mono + min(threshold * (2 ** self._attempts), MAX_STALL_SEC)
+            attempts = self._attempts
+
+        last = f"{self.last_tick_time:%H:%M:%S}" if self.last_tick_time else "なし"
+        print(f"[WARN][watchdog] {idle:.0f}秒 push を受信していません（{phase[0]} しきい値{threshold:.0f}秒 "
+              f"最後の現値時刻={last}）→ 再接続します（{attempts}回目）")
+        if first:
+            self._notify({"event": "stall", "time": now, "phase": phase[0], "idle_sec": idle,
+                          "last_tick_time": self.last_tick_time})
+        if self.recover is not None:
+            try:
+                self.recover()
+            except Exception as e:
+                print(f"[ERROR][watchdog] 復旧処理でエラー: {e}")
+        return True
+
+    def _run(self):
+        while not self._stop_event.wait(CHECK_INTERVAL_SEC):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[ERROR][watchdog] 監視エラー: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="FeedWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            age = time.monotonic() - self._last_mono if self._last_mono is not None else None
+            phases = {
+                name: {
+                    "messages": s.messages,
+                    "trades": s.trades,
+                    "threshold_sec": s.threshold,
+                    "max_gap_sec": s.max_gap,
+                    "lag_mean_sec": s.lag_sum / s.trades if s.trades else None,
+                    "lag_max_sec": s.lag_max if s.trades else None,
+                }
+                for name, s in self.phases.items()
+            }
+            return {
+                "last_tick_time": self.last_tick_time,
+                "last_message_local": self.last_message_local,
+                "last_message_age_sec": age,
+                "stalled": self._stall_started is not None,
+                "stall_count": self.stall_count,
+                "recover_attempts": self.recover_attempts,
+                "last_recovery_sec": self.last_recovery_sec,
+                "max_recovery_sec": self.max_recovery_sec,
+                "phases": phases,
+            }
+
+    def print_stats(self):
+        s = self.get_stats()
+        last = f"{s['last_tick_time']:%Y/%m/%d %H:%M:%S}" if s["last_tick_time"] else "なし"
+        recovery = f"{s['last_recovery_sec']:.1f}秒" if s["last_recovery_sec"] is not None else "-"
+        print(f"[INFO][watchdog] 最後の現値時刻={last} 停止={s['stall_count']}回 再接続={s['recover_attempts']}回 "
+              f"復旧まで 直近={recovery} 最大={s['max_recovery_sec']:.1f}秒")
+        for name, p in s["phases"].items():
+            if not p["messages"]:
+                continue
+            threshold = f"{p['threshold_sec']:.0f}秒" if p["threshold_sec"] is not None else "-"
+            lag = (f"平均={p['lag_mean_sec'] * 1000:.0f}ms 最大={p['lag_max_sec'] * 1000:.0f}ms"
+                   if p["trades"] else "-")
+            print(f"[INFO][watchdog]   {name}: push={p['messages']} 約定={p['trades']} 最大間隔={p['max_gap_sec']:.1f}秒 "
+                  f"しきい値={threshold} 遅れ {lag}")
@@ -4,8 +4,11 @@ import json
 import time
 from datetime import datetime
 
+from config.settings import KABU_WS_URL
 from handler.price_handler import PriceHandler
 
+RECONNECT_DELAY_SEC = 1.0   # 切断から再接続までの待ち（接続できない間に再接続を繰り返し続けないため）
+
 
 class KabuWebSocketClient:
     """
@@ -13,11 +16,20 @@ class KabuWebSocketClient:
     push配信を受信し、PriceHandler に現値を渡す。
     """
 
-    def __init__(self, price_handler: PriceHandler):
+    def __init__(self, price_handler: PriceHandler, url: str = KABU_WS_URL):
+        self.url = url
         self.ws = None
         self.thread = None
         self.running = False
         self.price_handler = price_handler
+        self.reconnects = 0
+        self.message_listeners = []
+
+    def add_message_listener(self, listener):
+        """
+        push を1件受け取るごとに listener(現値の時刻 or None) を呼び出す（重複除去の前。FeedWatchdog 用）。
+        """
+        self.message_listeners.append(listener)
 
     def on_message(self, ws, message):
         try:
@@ -25,9 +37,12 @@ class KabuWebSocketClient:
             price = data.get("CurrentPrice")
             timestamp_str = data.get("CurrentPriceTime")
             current_price_status = data.get("CurrentPriceStatus")
+            timestamp = datetime.fromisoformat(timestamp_str) if timestamp_str else None
 
-            if price is not None and timestamp_str:
-                timestamp = datetime.fromisoformat(timestamp_str)
+            for listener in self.message_listeners:
+                listener(timestamp)
+
+            if price is not None and timestamp is not None:
                 self.price_handler.handle_tick(price, timestamp, current_price_status)
 
         except Exception as e:
@@ -49,7 +64,7 @@ class KabuWebSocketClient:
             while self.running:
                 try:
                     self.ws = websocket.WebSocketApp(
-                        "ws://localhost:18080/kabusapi/websocket",
+                        self.url,
                         on_message=self.on_message,
                         on_error=self.on_error,
                         on_close=self.on_close,
@@ -59,11 +74,25 @@ class KabuWebSocketClient:
                 except Exception as e:
                     print(f"[ERROR] 再接続エラー: {e}")
                     time.sleep(5)
+                    continue
+                if self.running:
+                    time.sleep(RECONNECT_DELAY_SEC)
 
         self.thread = threading.Thread(target=run)
         self.thread.daemon = True
         self.thread.start()
 
+    def reconnect(self):
+        """
+        接続を閉じて張り直す（受信が止まったときに FeedWatchdog から呼ばれる）。
+        run_forever() が戻ると受信スレッドのループが新しい接続を作る。
+        """
+        self.reconnects += 1
+        print(f"[INFO] WebSocket を再接続します（{self.reconnects}回目）")
+        ws = self.ws
+        if ws:
+            ws.close()
+
     def stop(self):
         self.running = False
         if self.ws:
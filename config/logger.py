@@ -1,9 +1,12 @@
+from __future__ import annotations
 import os
 import sys
 from datetime import datetime
 import atexit
-import pandas as pd
 from utils.time_util import get_trade_date
+from utils.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
 
 class DualLogger:
     """
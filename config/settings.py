@@ -8,6 +8,7 @@ SETTINGS_PATH = os.path.join(os.path.dirname(__file__), "settings.json")
 DEFAULT_SETTINGS = {
     "API_PASSWORD": "your_kabu_api_password",
     "API_BASE_URL": "http://localhost:18080/kabusapi",
+    "KABU_WS_URL": "ws://localhost:18080/kabusapi/websocket",
     "FUTURE_CODE": "NK225mini",
     "ENABLE_TICK_OUTPUT": "true"
 }
@@ -31,6 +32,7 @@ ENABLE_TICK_OUTPUT = SETTINGS.get("ENABLE_TICK_OUTPUT", True)
 
 # 各種設定値にアクセスするためのエイリアス
 API_BASE_URL = SETTINGS.get("API_BASE_URL")
+KABU_WS_URL = SETTINGS.get("KABU_WS_URL", "ws://localhost:18080/kabusapi/websocket")
 API_PASSWORD = SETTINGS.get("API_PASSWORD")
 FUTURE_CODE = SETTINGS.get("FUTURE_CODE")
 
@@ -39,5 +41,58 @@ FUTURE_CODE = SETTINGS.get("FUTURE_CODE")
 DUMMY_TICK_TEST_MODE = SETTINGS.get("DUMMY_TICK_TEST_MODE")
 DUMMY_URL = SETTINGS.get("DUMMY_URL")
 
+# 追加：ティックの重複除去・並べ替え（保持時間 0 は並べ替えなし）と遅延ティックの許容範囲
+TICK_REORDER_WINDOW_MS = SETTINGS.get("TICK_REORDER_WINDOW_MS", 0)
+TICK_LATE_TOLERANCE_MS = SETTINGS.get("TICK_LATE_TOLERANCE_MS", 2000)
+
+# 追加：push配信の停止検知と再接続（しきい値は時間帯ごとの受信間隔の99パーセンタイル × 係数）
+ENABLE_FEED_WATCHDOG = SETTINGS.get("ENABLE_FEED_WATCHDOG", True)
+FEED_STALL_FACTOR = SETTINGS.get("FEED_STALL_FACTOR", 5.0)
+
+# 追加：取引終了後の列指向圧縮
+ENABLE_COMPACTION = SETTINGS.get("ENABLE_COMPACTION", True)
+
+# 追加：終了時の1分足の整合性チェック（欠損・重複・順序・OHLC）
+ENABLE_ARCHIVE_AUDIT = SETTINGS.get("ENABLE_ARCHIVE_AUDIT", True)
+
+# 追加：ティックCSVの圧縮保管（保存期間 0 は無期限）
+ENABLE_TICK_ARCHIVE = SETTINGS.get("ENABLE_TICK_ARCHIVE", False)  # 元のCSVを削除するため明示的に有効にした場合のみ
+TICK_ARCHIVE_RETENTION_DAYS = SETTINGS.get("TICK_ARCHIVE_RETENTION_DAYS", 0)
+
+# 追加：CSVに加える保存先（"none" / "sqlite"）
+STORAGE_BACKEND = SETTINGS.get("STORAGE_BACKEND", "none")
+STORAGE_DB_PATH = SETTINGS.get("STORAGE_DB_PATH", "db/market.sqlite3")
+
+# 追加：共有メモリへの最新ティック・足の公開
+ENABLE_SHM_FEED = SETTINGS.get("ENABLE_SHM_FEED", False)
+SHM_FEED_NAME = SETTINGS.get("SHM_FEED_NAME", "pfr_feed")
+
+# 追加：Unix ドメインソケットでのティック・足・ステータス配信
+ENABLE_FEED_BUS = SETTINGS.get("ENABLE_FEED_BUS", False)
+FEED_BUS_PATH = SETTINGS.get("FEED_BUS_PATH", "/tmp/pfr_feed.sock")
+FEED_BUS_POLICY = SETTINGS.get("FEED_BUS_POLICY", "conflate")
+
+# 追加：複数戦略の並列実行（モジュール名のリスト。空なら起動しない）
+STRATEGY_MODULES = SETTINGS.get("STRATEGY_MODULES", [])
+STRATEGY_DEADLINE_MS = SETTINGS.get("STRATEGY_DEADLINE_MS", 200)
+STRATEGY_EXECUTOR = SETTINGS.get("STRATEGY_EXECUTOR", "thread")
+
+# 追加：確定足ごとの指標の逐次計算
+ENABLE_INDICATORS = SETTINGS.get("ENABLE_INDICATORS", False)
+
+# 追加：プロファイル（シグナルまたは環境変数 PFR_PROFILE で開始。mode は "sample" / "cprofile"）
+PROFILE_MODE = SETTINGS.get("PROFILE_MODE", "sample")
+PROFILE_WINDOW_SEC = SETTINGS.get("PROFILE_WINDOW_SEC", 30)
+PROFILE_INTERVAL_MS = SETTINGS.get("PROFILE_INTERVAL_MS", 5)
+PROFILE_DIR = SETTINGS.get("PROFILE_DIR", "profile")
+
+# 追加：PFR_main の読み込み時間の予算（python -m utils.startup_profile で確認）
+STARTUP_BUDGET_MS = SETTINGS.get("STARTUP_BUDGET_MS", 150)
+
+# 追加：ペーパートレード関連
+PAPER_TRADING = SETTINGS.get("PAPER_TRADING", False)
+PAPER_LATENCY_MS = SETTINGS.get("PAPER_LATENCY_MS", 50)
+PAPER_SLIPPAGE_TICKS = SETTINGS.get("PAPER_SLIPPAGE_TICKS", 1)
+
 def get_api_password() -> str:
     return API_PASSWORD
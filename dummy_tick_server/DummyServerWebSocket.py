@@ -1,14 +1,16 @@
+import argparse
 import asyncio
 import websockets
-import pandas as pd
 import json
 import time
 import os
 import sys
-import inspect
+from datetime import datetime
 
-SEND_INTERVAL = 0.01  # 秒
+SEND_INTERVAL = 0.01  # 秒（--rate 未指定時の送信間隔）
 DURATION = 600       # 送信時間（秒）
+REPORT_INTERVAL = 5.0  # 送信レートの報告間隔（秒）
+MAX_BATCH = 2000     # 1回のループでまとめて送る最大件数
 
 # ✅ 設定読み込み
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -19,75 +21,258 @@ with open(import_path, "r", encoding="utf-8") as f:
 
 python_exec = settings.get("DUMMY_SERVER_PYTHON_EXECUTABLE", sys.executable)
 
-print("✅ このDummyServerWebSocket.pyは最新です")
-print("[確認] 実行中のファイル:", os.path.abspath(__file__))
-print("✅ 実行中のPythonインタプリタ:", python_exec)
+# スクリプトとして直接起動しても utils を import できるようにする
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
-# ✅ 受信関数
-async def tick_sender(websocket, path):
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    TICK_DIR = os.path.join(BASE_DIR, "dummy_tick_data")
+from utils.tick_archive import ARCHIVE_EXTS, iter_tick_rows
 
-    print("[DEBUG] tick_sender() 呼び出されました")
-    print("✅ tick_sender 定義:", inspect.signature(tick_sender))
-    print("[接続] クライアントが接続しました")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TICK_DIR = os.path.join(BASE_DIR, "dummy_tick_data")
 
-    try:
-        csv_files = [
-            os.path.join(TICK_DIR, f)
-            for f in os.listdir(TICK_DIR)
-            if f.endswith(".csv")
-        ]
-        if not csv_files:
-            raise FileNotFoundError("dummy_tick_data フォルダにCSVファイルが見つかりません")
 
-        latest_csv = max(csv_files, key=os.path.getmtime)
-        print(f"[INFO] 最新のCSVファイルを使用: {latest_csv}")
+def find_latest_tick_file(tick_dir: str = TICK_DIR) -> str:
+    """dummy_tick_data フォルダ内で最も新しいティックファイル（CSV / 圧縮CSV / バイナリ）を返す。"""
+    csv_files = [
+        os.path.join(tick_dir, f)
+        for f in os.listdir(tick_dir)
+        if f.endswith((".csv", ".bin") + ARCHIVE_EXTS)
+    ]
+    if not csv_files:
+        raise FileNotFoundError("dummy_tick_data フォルダにCSV/バイナリファイルが見つかりません")
+    return max(csv_files, key=os.path.getmtime)
 
-        df = pd.read_csv(latest_csv)
-        df.fillna("", inplace=True)
 
-        start_time = time.time()
-        idx = 0
+def _parse_time(text: str) -> datetime:
+    for fmt in ("%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return datetime.fromisoformat(text)
 
-        while time.time() - start_time < DURATION:
-            if idx >= len(df):
-                print("✔️ データをすべて送信しました")
-                break
 
-            row = df.iloc[idx]
+def load_binary_messages(path: str) -> tuple[list, list]:
+    """
+    ティックバイナリ（utils/tick_binary.py）を読み込み、送信用のJSON文字列を事前に作っておく。
+    """
+    import numpy as np
+    from utils.tick_binary import read_ticks
+
+    ticks = read_ticks(path)
+    stamps = ticks["time_ms"].astype("datetime64[ms]").astype("datetime64[s]")
+    time_strs = [t.replace("T", " ") for t in np.datetime_as_string(stamps).tolist()]
+
+    messages = [
+        json.dumps({
+            "Symbol": "165120019",
+            "Price": price,
+            "Volume": 1,
+            "Time": time_str,
+            "CurrentPriceStatus": status
+        })
+        for time_str, price, status in zip(time_strs, ticks["price"].tolist(), ticks["status"].tolist())
+    ]
+    times = (ticks["time_ms"] / 1000.0).tolist()
+    return messages, times
+
 
-            # Price と CurrentPriceStatus を安全に取得
+def load_messages(path: str) -> tuple[list, list]:
+    """
+    ティックCSV（.csv / .csv.gz / .csv.zst）を読み込み、送信用のJSON文字列を事前に作っておく。
+    圧縮ファイルはディスクに展開せず、塊ごとに読みながら伸長する。
+    戻り値は (JSON文字列のリスト, 元の時刻（epoch秒）のリスト)。
+    """
+    if path.endswith(".bin"):
+        return load_binary_messages(path)
+
+    messages = []
+    times = []
+    parsed = {}  # 同一秒のティックが多いため時刻のパース結果を使い回す
+
+    for rows in iter_tick_rows(path):
+        for row in rows:
             try:
-                price = float(row["Price"]) if row["Price"] != "" else None
-                status = int(row["CurrentPriceStatus"]) if "CurrentPriceStatus" in row and row["CurrentPriceStatus"] != "" else 1
-                time_str = pd.to_datetime(row["Time"]).strftime("%Y-%m-%d %H:%M:%S")
+                price = float(row["Price"]) if row.get("Price") else None
+                status_text = row.get("CurrentPriceStatus")
+                status = int(float(status_text)) if status_text else 1
+                ts = parsed.get(row["Time"])
+                if ts is None:
+                    ts = parsed[row["Time"]] = _parse_time(row["Time"])
             except Exception as e:
                 print(f"[WARN] 行の変換エラー (スキップ): {e}")
-                idx += 1
                 continue
 
             tick = {
                 "Symbol": "165120019",
                 "Price": price,
                 "Volume": 1,
-                "Time": time_str,
+                "Time": ts.strftime("%Y-%m-%d %H:%M:%S"),
                 "CurrentPriceStatus": status
             }
+            messages.append(json.dumps(tick))
+            times.append(ts.timestamp())
+
+    return messages, times
+
+
+class TickBroadcaster:
+    """
+    事前にエンコードしたティックを接続中の全クライアントへ配信する負荷生成器。
+
+    - mode="rate"  : rate 件/秒で送信
+    - mode="replay": 元データの時刻間隔どおり（speed 倍速）に送信
+    - mode="burst" : 通常は rate 件/秒、burst_every 秒ごとに burst_duration 秒間だけ burst_rate 件/秒
+    実際の送信レートを定期的に表示する。
+    """
+
+    def __init__(self, messages: list, times: list, mode: str = "rate", rate: float = 1 / SEND_INTERVAL,
+                 speed: float = 1.0, burst_rate: float = 0.0, burst_every: float = 10.0,
+                 burst_duration: float = 1.0, duration: float = DURATION, loop: bool = False,
+                 verbose: bool = False):
+        self.messages = messages
+        self.times = times
+        self.mode = mode
+        self.rate = rate
+        self.speed = speed
+        self.burst_rate = burst_rate
+        self.burst_every = burst_every
+        self.burst_duration = burst_duration
+        self.duration = duration
+        self.loop = loop
+        self.verbose = verbose
+
+        self.clients = set()
+        self._client_joined = asyncio.Event()
+        self.sent = 0
+
+    async def handler(self, websocket, path=None):
+        print("[接続] クライアントが接続しました")
+        self.clients.add(websocket)
+        self._client_joined.set()
+        try:
+            await websocket.wait_closed()
+        finally:
+            self.clients.discard(websocket)
+            print(f"[切断] クライアントが切断しました（残り {len(self.clients)}件）")
+
+    def _current_rate(self, elapsed: float) -> float:
+        if self.mode == "burst" and self.burst_rate > 0 and (elapsed % self.burst_every) < self.burst_duration:
+            return self.burst_rate
+        return self.rate
+
+    def _due_count(self, idx: int, elapsed: float, credit: float) -> int:
+        if self.mode == "replay":
+            base = self.times[0]
+            due = 0
+            limit = min(len(self.times), idx + MAX_BATCH)
+            while idx + due < limit and (self.times[idx + due] - base) / self.speed <= elapsed:
+                due += 1
+            return due
+        return int(credit)
+
+    def _send(self, message: str):
+        if hasattr(websockets, "broadcast"):
+            # 送信バッファに積むだけで待たない（遅いクライアントに引きずられない）
+            websockets.broadcast(self.clients, message)
+        else:
+            for ws in list(self.clients):
+                asyncio.ensure_future(ws.send(message))
+        if self.verbose:
+            print("📤 送信:", message)
 
-            await websocket.send(json.dumps(tick))
-            print("📤 送信:", tick)
-            await asyncio.sleep(SEND_INTERVAL)
-            idx += 1
+    async def run(self):
+        while True:
+            await self._client_joined.wait()
+            await self._run_once()
+            if not self.loop:
+                return
+
+    async def _run_once(self):
+        started = time.perf_counter()
+        last = started
+        last_report = started
+        sent_at_report = 0
+        credit = 0.0
+        idx = 0
+        total = len(self.messages)
+
+        print(f"[INFO] 配信開始 mode={self.mode} 件数={total}")
+
+        while idx < total:
+            now = time.perf_counter()
+            elapsed = now - started
+            if elapsed >= self.duration:
+                print("[INFO] 送信時間の上限に達しました")
+                break
+            if not self.clients:
+                self._client_joined.clear()
+                print("[INFO] クライアントがいないため配信を一時停止します")
+                await self._client_joined.wait()
+                last = time.perf_counter()
+                continue
+
+            credit += self._current_rate(elapsed) * (now - last)
+            last = now
+
+            due = min(self._due_count(idx, elapsed, credit), MAX_BATCH, total - idx)
+            for message in self.messages[idx:idx + due]:
+                self._send(message)
+            idx += due
+            self.sent += due
+            if self.mode != "replay":
+                credit -= due
+
+            if now - last_report >= REPORT_INTERVAL:
+                rate = (self.sent - sent_at_report) / (now - last_report)
+                print(f"[INFO] 実送信レート: {rate:.0f}件/秒 累計={self.sent} 接続={len(self.clients)}")
+                last_report = now
+                sent_at_report = self.sent
+
+            await asyncio.sleep(0 if due else 0.001)
+
+        elapsed = time.perf_counter() - started
+        print(f"✔️ データをすべて送信しました: {idx}件 / {elapsed:.2f}秒（平均 {idx / max(elapsed, 1e-9):.0f}件/秒）")
 
-    except Exception as e:
-        print(f"[ERROR] 送信中にエラー: {e}")
 
 # ✅ サーバー起動
-async def main():
-    async with websockets.serve(tick_sender, "localhost", 9000):
-        print("✅ 疑似Tickサーバー起動中 ws://localhost:9000")
-        await asyncio.Future()  # 永久待機
+async def main(args):
+    path = args.file or find_latest_tick_file()
+    print(f"[INFO] ティックファイルを使用: {path}")
+
+    started = time.perf_counter()
+    messages, times = load_messages(path)
+    print(f"[INFO] {len(messages)}件のメッセージを事前エンコードしました（{time.perf_counter() - started:.2f}秒）")
+
+    broadcaster = TickBroadcaster(
+        messages, times, mode=args.mode, rate=args.rate, speed=args.speed,
+        burst_rate=args.burst_rate, burst_every=args.burst_every, burst_duration=args.burst_duration,
+        duration=args.duration, loop=args.loop, verbose=args.verbose
+    )
+
+    async with websockets.serve(broadcaster.handler, args.host, args.port):
+        print(f"✅ 疑似Tickサーバー起動中 ws://{args.host}:{args.port}")
+        await broadcaster.run()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="疑似Tickサーバー（負荷生成器）")
+    parser.add_argument("--file", default=None, help="送信するティックファイル（省略時は dummy_tick_data の最新CSV）")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--mode", choices=["rate", "replay", "burst"], default="rate")
+    parser.add_argument("--rate", type=float, default=1 / SEND_INTERVAL, help="送信レート（件/秒）")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay時の再生速度（倍）")
+    parser.add_argument("--burst-rate", type=float, default=0.0, help="バースト中の送信レート（件/秒）")
+    parser.add_argument("--burst-every", type=float, default=10.0, help="バーストの周期（秒）")
+    parser.add_argument("--burst-duration", type=float, default=1.0, help="バーストの継続時間（秒）")
+    parser.add_argument("--duration", type=float, default=DURATION, help="送信時間の上限（秒）")
+    parser.add_argument("--loop", action="store_true", help="送信し終えたら先頭から繰り返す")
+    parser.add_argument("--verbose", action="store_true", help="送信したティックを1件ずつ表示する")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    print("[確認] 実行中のファイル:", os.path.abspath(__file__))
+    print("✅ 実行中のPythonインタプリタ:", python_exec)
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+
+JST = timezone(timedelta(hours=9))
+API_PREFIX = "/kabusapi"
+# 全ての応答に付けるヘッダー（utils/rest_client.py の MOCK_SERVER_HEADER と同じ）。
+# 本番と同じポートで動くため、受け取った側がモックの応答（架空の銘柄コードなど）を保存しないよう区別に使う
+MOCK_HEADER = "X-Mock-Kabu"
+
+
+class MockKabuState:
+    """
+    モックサーバーの状態（トークン・登録銘柄・価格・注文・建玉）。
+    REST と push の両方から参照される。
+    """
+
+    def __init__(self, price: float = 38000.0, volatility: float = 5.0, seed: int = None):
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.tokens = set()
+        self.registered = []
+        self.price = price
+        self.volatility = volatility
+        self.status = 1
+        self.orders = []
+        self.positions = []
+        self._order_ids = itertools.count(1)
+
+    def issue_token(self) -> str:
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens.add(token)
+        return token
+
+    def next_price(self) -> float:
+        # 5円刻みのランダムウォーク
+        step = round(self.random.gauss(0, self.volatility) / 5) * 5
+        self.price = max(5.0, self.price + step)
+        return self.price
+
+    def send_order(self, payload: dict) -> dict:
+        with self.lock:
+            order_id = f"MOCK{next(self._order_ids):08d}"
+            side = int(payload.get("Side", 1))
+            qty = int(payload.get("Qty", 0))
+            now = datetime.now(JST).isoformat()
+            self.orders.append({
+                "Id": order_id, "State": 5, "OrderState": 5, "OrdType": payload.get("OrdType", 1),
+                "Symbol": payload.get("Symbol"), "OrderQty": qty, "CumQty": qty,
+                "Side": str(side), "Price": self.price, "RecvTime": now, "Details": [],
+            })
+            self.positions.append({
+                "ExecutionID": order_id, "Symbol": payload.get("Symbol"), "Price": self.price,
+                "LeavesQty": qty, "HoldQty": 0, "Side": side, "ProfitLoss": 0.0,
+                "Commission": 0, "CommissionTax": 0, "SecurityType": 103,
+            })
+            return {"Result": 0, "OrderId": order_id}
+
+    def board(self, symbol: str, exchange: int) -> dict:
+        return {
+            "Symbol": symbol, "Exchange": exchange, "CurrentPrice": self.price,
+            "CurrentPriceTime": datetime.now(JST).isoformat(), "CurrentPriceStatus": self.status,
+            "UpperLimitPrice": self.price * 1.1, "LowerLimitPrice": self.price * 0.9,
+            "SpecialQuote": None, "TradingSuspension": 0,
+        }
+
+
+class MockKabuRestHandler(BaseHTTPRequestHandler):
+    """
+    kabuステーションREST APIのモック。
+    server 属性の state / latency / jitter / error_rate を参照する。
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    # ===== 共通処理 =====
+
+    def _reply(self, code: int, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header(MOCK_HEADER, "1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length == 0:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _before(self, need_auth: bool = True) -> bool:
+        server = self.server
+        delay = server.latency + (server.random.uniform(0, server.jitter) if server.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+        if server.error_rate and server.random.random() < server.error_rate:
+            self._reply(500, {"Code": 4001001, "Message": "injected error"})
+            return False
+
+        if need_auth and self.headers.get("X-API-KEY") not in server.state.tokens:
+            self._reply(401, {"Code": 4001009, "Message": "APIキー不一致"})
+            return False
+        return True
+
+    def _path(self) -> tuple[str, dict]:
+        parsed = urlparse(self.path)
+        path = parsed.path
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        return path, {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+    # ===== メソッド別 =====
+
+    def do_POST(self):
+        path, _ = self._path()
+        body = self._read_json()
+
+        if path == "/token":
+            if not self._before(need_auth=False):
+                return
+            self._reply(200, {"ResultCode": 0, "Token": self.server.state.issue_token()})
+        elif path.startswith("/sendorder"):
+            if not self._before():
+                return
+            self._reply(200, self.server.state.send_order(body))
+        else:
+            self._reply(404, {"Message": f"not found: {path}"})
+
+    def do_PUT(self):
+        path, _ = self._path()
+        body = self._read_json()
+
+        if path == "/register":
+            if not self._before():
+                return
+            state = self.server.state
+            with state.lock:
+                for sym in body.get("Symbols", []):
+                    if sym not in state.registered:
+                        state.registered.append(sym)
+                regist_list = list(state.registered)
+            self._reply(200, {"RegistList": regist_list})
+        else:
+            self._reply(404, {"Message": f"not found: {path}"})
+
+    def do_GET(self):
+        path, query = self._path()
+        state = self.server.state
+
+        if not self._before():
+            return
+
+        if path == "/symbolname/future":
+            term = str(query.get("DerivMonth", "0"))
+            self._reply(200, {"Symbol": f"1{term[-4:]}0019", "SymbolName": f"日経225mini {term}"})
+        elif path == "/positions":
+            with state.lock:
+                self._reply(200, list(state.positions))
+        elif path == "/orders":
+            with state.lock:
+                self._reply(200, list(state.orders))
+        elif path == "/wallet/future":
+            self._reply(200, {"FutureTradeLimit": 10_000_000, "MarginRequirement": 2_000_000})
+        elif path.startswith("/board/"):
+            symbol, _, exchange = path[len("/board/"):].partition("@")
+            if exchange and not exchange.isdecimal():
+                self._reply(400, {"Code": 4001005, "Message": f"パラメータ変換エラー: Exchange={exchange}"})
+                return
+            self._reply(200, state.board(symbol, int(exchange or 0)))
+        else:
+            self._reply(404, {"Message": f"not found: {path}"})
+
+
+class MockKabuServer:
+    """
+    kabuステーションのREST APIとpush配信（WebSocket）のローカル代替。
+
+    - REST: /token, /register, /symbolname/future, /positions, /orders,
+            /wallet/future, /board, /sendorder
+    - push: ランダムウォークの現値を push_rate 件/秒で全接続に配信
+    - latency_ms / jitter_ms / error_rate でREST応答の遅延とエラーを注入できる
+    """
+
+    def __init__(self, host: str = "localhost", rest_port: int = 18080, ws_port: int = 18081,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 push_rate: float = 10.0, seed: int = None):
+        self.host = host
+        self.rest_port = rest_port
+        self.ws_port = ws_port
+        self.push_rate = push_rate
+        self.state = MockKabuState(seed=seed)
+        self.clients = set()
+        self.sent = 0
+
+        self.http = ThreadingHTTPServer((host, rest_port), MockKabuRestHandler)
+        self.http.daemon_threads = True
+        self.http.state = self.state
+        self.http.latency = latency_ms / 1000.0
+        self.http.jitter = jitter_ms / 1000.0
+        self.http.error_rate = error_rate
+        self.http.random = random.Random(seed)
+
+    def _push_message(self) -> str:
+        state = self.state
+        price = state.next_price()
+        symbol = state.registered[0]["Symbol"] if state.registered else "160060019"
+        return json.dumps({
+            "Symbol": symbol,
+            "CurrentPrice": price,
+            "CurrentPriceTime": datetime.now(JST).isoformat(timespec="seconds"),
+            "CurrentPriceStatus": state.status,
+            "TradingVolume": 1,
+        })
+
+    async def _ws_handler(self, websocket, *args):
+        self.clients.add(websocket)
+        print(f"[MOCK KABU] push接続: {len(self.clients)}件")
+        try:
+            await websocket.wait_closed()
+        finally:
+            self.clients.discard(websocket)
+            print(f"[MOCK KABU] push切断: {len(self.clients)}件")
+
+    async def _push_loop(self):
+        started = time.perf_counter()
+        sent_at_start = 0
+        last_report = started
+
+        while True:
+            now = time.perf_counter()
+            due = int((now - started) * self.push_rate) - sent_at_start
+            if not self.clients or due <= 0:
+                if not self.clients:
+                    started, sent_at_start = now, 0
+                await asyncio.sleep(0.001)
+                continue
+
+            # 遅れた分はまとめて送る（1回あたりの上限で他の処理を塞がないようにする）
+            for _ in range(min(due, 1000)):
+                message = self._push_message()
+                for ws in list(self.clients):
+                    try:
+                        await ws.send(message)
+                    except websockets.ConnectionClosed:
+                        self.clients.discard(ws)
+                sent_at_start += 1
+                self.sent += 1
+
+            if now - last_report >= 5.0:
+                rate = sent_at_start / max(now - started, 1e-9)
+                print(f"[MOCK KABU] push送信レート: {rate:.0f}件/秒（目標 {self.push_rate:.0f}件/秒） 接続={len(self.clients)}")
+                last_report = now
+            await asyncio.sleep(0)
+
+    async def _serve_ws(self):
+        async with websockets.serve(self._ws_handler, self.host, self.ws_port):
+            await self._push_loop()
+
+    def serve_forever(self):
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+        print(f"[MOCK KABU] REST: http://{self.host}:{self.rest_port}{API_PREFIX}")
+        print(f"[MOCK KABU] push: ws://{self.host}:{self.ws_port}{API_PREFIX}/websocket")
+        try:
+            asyncio.run(self._serve_ws())
+        finally:
+            self.http.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="kabuステーションのモックサーバー")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--rest-port", type=int, default=18080)
+    parser.add_argument("--ws-port", type=int, default=18081)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="REST応答の固定遅延")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="REST応答の遅延のばらつき")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500を返す割合（0〜1）")
+    parser.add_argument("--push-rate", type=float, default=10.0, help="push配信の件数/秒")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    MockKabuServer(
+        host=args.host, rest_port=args.rest_port, ws_port=args.ws_port,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        push_rate=args.push_rate, seed=args.seed
+    ).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
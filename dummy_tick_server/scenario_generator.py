@@ -0,0 +1,272 @@
+import argparse
+import os
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Iterator
+
+import numpy as np
+
+from utils.tick_binary import TickBinaryWriter
+
+TICK_SIZE = 5.0               # 日経225miniの呼値
+STATUS_NORMAL = 1
+STATUS_CIRCUIT_BREAK = 12
+CHUNK_SECONDS = 600           # 1回に生成する時間幅（秒）。メモリ使用量はこの幅で決まる
+
+DAY_OPEN, DAY_PRE_CLOSE, DAY_CLOSE = dtime(8, 45), dtime(15, 40), dtime(15, 45)
+NIGHT_OPEN, NIGHT_PRE_CLOSE, NIGHT_CLOSE = dtime(17, 0), dtime(5, 55), dtime(6, 0)
+
+
+class Segment:
+    """
+    ティックを生成する時間区間。
+    rate_multiplier で基本レートを増減し、status が 12 の区間はサーキットブレイク中として価格を動かさない。
+    closing_tick=True の区間は end 時刻に1件だけ板寄せのティックを出す。
+    """
+    __slots__ = ("start", "end", "rate_multiplier", "status", "closing_tick")
+
+    def __init__(self, start: datetime, end: datetime, rate_multiplier: float = 1.0,
+                 status: int = STATUS_NORMAL, closing_tick: bool = False):
+        self.start = start
+        self.end = end
+        self.rate_multiplier = rate_multiplier
+        self.status = status
+        self.closing_tick = closing_tick
+
+
+def second_friday(year: int, month: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=((4 - first.weekday()) % 7) + 7)
+
+
+def session_segments(start: date, days: int) -> Iterator[Segment]:
+    """
+    start から days 日分（平日のみ）の日中・夜間セッションの区間を返す。
+    プレクロージング（15:40〜15:45、5:55〜6:00）はザラバを止め、引けの1件だけを出す。
+    金曜の夜間は土曜6:00まで続く。
+    """
+    for offset in range(days):
+        d = start + timedelta(days=offset)
+        if d.weekday() >= 5:
+            continue
+        yield Segment(datetime.combine(d, DAY_OPEN), datetime.combine(d, DAY_PRE_CLOSE))
+        yield Segment(datetime.combine(d, DAY_PRE_CLOSE), datetime.combine(d, DAY_CLOSE), closing_tick=True)
+
+        next_day = d + timedelta(days=1)
+        yield Segment(datetime.combine(d, NIGHT_OPEN), datetime.combine(next_day, NIGHT_PRE_CLOSE))
+        yield Segment(datetime.combine(next_day, NIGHT_PRE_CLOSE), datetime.combine(next_day, NIGHT_CLOSE),
+                      closing_tick=True)
+
+
+def _split(segments: Iterator[Segment], at: datetime, until: datetime, **overrides) -> Iterator[Segment]:
+    """[at, until) に掛かる区間を分割し、その部分だけ属性を上書きする。"""
+    for seg in segments:
+        if seg.closing_tick or seg.end <= at or seg.start >= until:
+            yield seg
+            continue
+        if seg.start < at:
+            yield Segment(seg.start, at, seg.rate_multiplier, seg.status)
+        inner = Segment(max(seg.start, at), min(seg.end, until), seg.rate_multiplier, seg.status)
+        for key, value in overrides.items():
+            setattr(inner, key, value)
+        yield inner
+        if seg.end > until:
+            yield Segment(until, seg.end, seg.rate_multiplier, seg.status)
+
+
+def _bursts(segments: Iterator[Segment], every_sec: int, duration_sec: int, multiplier: float) -> Iterator[Segment]:
+    for seg in segments:
+        if seg.closing_tick:
+            yield seg
+            continue
+        cursor = seg.start
+        while cursor < seg.end:
+            burst_end = min(cursor + timedelta(seconds=duration_sec), seg.end)
+            yield Segment(cursor, burst_end, seg.rate_multiplier * multiplier, seg.status)
+            quiet_end = min(cursor + timedelta(seconds=every_sec), seg.end)
+            if burst_end < quiet_end:
+                yield Segment(burst_end, quiet_end, seg.rate_multiplier, seg.status)
+            cursor = quiet_end
+
+
+def build_segments(scenario: str, start: date, days: int, params: dict) -> Iterator[Segment]:
+    """
+    シナリオ名から生成区間を組み立てる。
+
+    - random_walk     : 通常のセッションのみ
+    - burst           : burst_every 秒ごとに burst_duration 秒間、ティックレートを burst_multiplier 倍
+    - circuit_breaker : 初日の halt_at から halt_minutes 分間サーキットブレイク（status=12）
+    - long_gap        : 初日の gap_at から gap_minutes 分間ティックなし
+    - sq_roll         : start を含む月以降の最初のSQ日の前々日から開始（第2木曜・限月交代を含む）
+    - weekend         : start 以降の最初の金曜から開始（土曜早朝までの夜間と週明けの取引日切り替え）
+    """
+    if scenario == "sq_roll":
+        year, month = start.year, ((start.month - 1) // 3 + 1) * 3
+        sq = second_friday(year, month)
+        if sq < start:
+            month += 3
+            if month > 12:
+                year, month = year + 1, month - 12
+            sq = second_friday(year, month)
+        start = sq - timedelta(days=2)
+        days = max(days, 4)
+    elif scenario == "weekend":
+        start = start + timedelta(days=(4 - start.weekday()) % 7)
+        days = max(days, 4)
+
+    segments = session_segments(start, days)
+
+    if scenario == "burst":
+        segments = _bursts(segments, params["burst_every"], params["burst_duration"], params["burst_multiplier"])
+    elif scenario == "circuit_breaker":
+        at = datetime.combine(start, params["halt_at"])
+        segments = _split(segments, at, at + timedelta(minutes=params["halt_minutes"]),
+                          status=STATUS_CIRCUIT_BREAK, rate_multiplier=0.05)
+    elif scenario == "long_gap":
+        at = datetime.combine(start, params["gap_at"])
+        segments = _split(segments, at, at + timedelta(minutes=params["gap_minutes"]), rate_multiplier=0.0)
+    elif scenario not in ("random_walk", "sq_roll", "weekend"):
+        raise ValueError(f"未知のシナリオです: {scenario}")
+
+    return segments
+
+
+class ScenarioGenerator:
+    """
+    シード付きで合成ティックを生成するクラス。
+
+    区間を CHUNK_SECONDS ごとに区切り、ポアソン過程で到着時刻を、
+    呼値単位のランダムウォークで価格を生成する。塊ごとに出力へ書き出すため、
+    何億件生成してもメモリ使用量は一定。
+    """
+
+    def __init__(self, seed: int = 0, rate: float = 10.0, volatility: float = 1.0,
+                 start_price: float = 38000.0, max_ticks: int = None):
+        self.rng = np.random.default_rng(seed)
+        self.rate = rate
+        self.volatility = volatility
+        self.price = start_price
+        self.max_ticks = max_ticks
+        self.generated = 0
+
+    def _random_walk(self, count: int) -> np.ndarray:
+        steps = np.rint(self.rng.normal(0.0, self.volatility, count)) * TICK_SIZE
+        prices = self.price + np.cumsum(steps)
+        np.maximum(prices, TICK_SIZE, out=prices)
+        if count:
+            self.price = float(prices[-1])
+        return prices
+
+    def generate(self, segments: Iterator[Segment]) -> Iterator[tuple]:
+        """(time_ms, price, status) の配列の組を塊ごとに返す。"""
+        for seg in segments:
+            if self.max_ticks is not None and self.generated >= self.max_ticks:
+                return
+
+            start_ms = int(np.datetime64(seg.start, "ms").astype(np.int64))
+            end_ms = int(np.datetime64(seg.end, "ms").astype(np.int64))
+
+            if seg.closing_tick:
+                chunk = (np.array([end_ms], dtype=np.int64), self._random_walk(1),
+                         np.array([seg.status], dtype=np.int16))
+                self.generated += 1
+                yield chunk
+                continue
+
+            rate = self.rate * seg.rate_multiplier
+            for chunk_start in range(start_ms, end_ms, CHUNK_SECONDS * 1000):
+                chunk_end = min(chunk_start + CHUNK_SECONDS * 1000, end_ms)
+                count = int(self.rng.poisson(rate * (chunk_end - chunk_start) / 1000.0))
+                if self.max_ticks is not None:
+                    count = min(count, self.max_ticks - self.generated)
+                if count <= 0:
+                    continue
+
+                times = np.sort(self.rng.integers(chunk_start, chunk_end, count, dtype=np.int64))
+                if seg.status == STATUS_CIRCUIT_BREAK:
+                    prices = np.full(count, self.price)
+                else:
+                    prices = self._random_walk(count)
+                status = np.full(count, seg.status, dtype=np.int16)
+
+                self.generated += count
+                yield times, prices, status
+
+
+def write_csv(path: str, chunks: Iterator[tuple]) -> int:
+    """ダミーサーバー用のCSV（Time, Price, CurrentPriceStatus）に書き出す。"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    total = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("Time,Price,CurrentPriceStatus\n")
+        for time_ms, prices, status in chunks:
+            seconds = time_ms.astype("datetime64[ms]").astype("datetime64[s]")
+            stamps = np.datetime_as_string(seconds)
+            lines = [
+                f"{t[:4]}/{t[5:7]}/{t[8:10]} {t[11:]},{p},{s}\n"
+                for t, p, s in zip(stamps.tolist(), prices.tolist(), status.tolist())
+            ]
+            f.writelines(lines)
+            total += len(lines)
+    return total
+
+
+def write_binary(path: str, chunks: Iterator[tuple]) -> int:
+    """高速リプレイ用のティックバイナリ形式に書き出す。"""
+    if os.path.exists(path):
+        os.remove(path)
+    writer = TickBinaryWriter(path)
+    try:
+        for time_ms, prices, status in chunks:
+            writer.write_chunk(time_ms, prices, status)
+    finally:
+        writer.close()
+    return writer.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="シナリオ別の合成ティックを生成する")
+    parser.add_argument("--scenario", default="random_walk",
+                        choices=["random_walk", "burst", "circuit_breaker", "long_gap", "sq_roll", "weekend"])
+    parser.add_argument("--start", default=datetime.now().strftime("%Y-%m-%d"), help="開始日（YYYY-MM-DD）")
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate", type=float, default=10.0, help="基本ティックレート（件/秒）")
+    parser.add_argument("--volatility", type=float, default=1.0, help="1ティックあたりの値動きの標準偏差（呼値単位）")
+    parser.add_argument("--start-price", type=float, default=38000.0)
+    parser.add_argument("--max-ticks", type=int, default=None)
+    parser.add_argument("--burst-every", type=int, default=600)
+    parser.add_argument("--burst-duration", type=int, default=30)
+    parser.add_argument("--burst-multiplier", type=float, default=50.0)
+    parser.add_argument("--halt-at", default="10:30")
+    parser.add_argument("--halt-minutes", type=int, default=10)
+    parser.add_argument("--gap-at", default="13:00")
+    parser.add_argument("--gap-minutes", type=int, default=20)
+    parser.add_argument("--format", choices=["csv", "bin"], default="csv")
+    parser.add_argument("--output", default=None, help="出力先（省略時は dummy_tick_data/<シナリオ名>.<形式>）")
+    args = parser.parse_args()
+
+    params = {
+        "burst_every": args.burst_every,
+        "burst_duration": args.burst_duration,
+        "burst_multiplier": args.burst_multiplier,
+        "halt_at": datetime.strptime(args.halt_at, "%H:%M").time(),
+        "halt_minutes": args.halt_minutes,
+        "gap_at": datetime.strptime(args.gap_at, "%H:%M").time(),
+        "gap_minutes": args.gap_minutes,
+    }
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "dummy_tick_data", f"{args.scenario}.{args.format}"
+    )
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").date()
+    segments = build_segments(args.scenario, start, args.days, params)
+    generator = ScenarioGenerator(seed=args.seed, rate=args.rate, volatility=args.volatility,
+                                  start_price=args.start_price, max_ticks=args.max_ticks)
+
+    writer = write_csv if args.format == "csv" else write_binary
+    count = writer(output, generator.generate(segments))
+    print(f"[INFO] {args.scenario}: {count}件のティックを {output} に書き出しました")
+
+
+if __name__ == "__main__":
+    main()
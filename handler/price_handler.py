@@ -1,14 +1,22 @@
-
+from __future__ import annotations
+import threading
 from writer.ohlc_writer import OHLCWriter
 from writer.tick_writer import TickWriter
 from writer.ohlc_builder import OHLCBuilder
-from utils.time_util import is_closing_end, is_market_closed
+from handler.tick_reorder import DEFAULT_LATE_TOLERANCE_MS, TickReorderBuffer
+from utils.time_util import from_minute, is_closing_end, is_market_closed, to_minute
 from datetime import datetime, timedelta, time as dtime
-from utils.symbol_resolver import get_active_term
+from utils.contract_calendar import get_contract_calendar
 from utils.export_util import export_latest_minutes_to_pd, get_last_ohlc_time_from_csv
-import pandas as pd
 from typing import Optional
 from utils.future_info_util import get_previous_close_price  # 事前に作るユーティリティ想定
+from utils.market_types import Bar, Tick
+from utils.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+# クロージングtickで足を強制確定する時刻（15:45 / 6:00 を1日の中の分で表す）
+CLOSING_MINUTES = (15 * 60 + 45, 6 * 60)
 
 
 class PriceHandler:
@@ -16,7 +24,8 @@ class PriceHandler:
     ティックを受信してOHLCを生成し、
     ファイルへの出力を管理するクラス。
     """
-    def __init__(self, ohlc_writer: OHLCWriter, tick_writer: TickWriter):
+    def __init__(self, ohlc_writer: OHLCWriter, tick_writer: TickWriter, storage=None,
+                 reorder: Optional[TickReorderBuffer] = None, late_tolerance_ms: int = DEFAULT_LATE_TOLERANCE_MS):
 
         self.ohlc_builder = OHLCBuilder()
         self.ohlc_writer = ohlc_writer
@@ -25,7 +34,44 @@ class PriceHandler:
         self.latest_price = None
         self.latest_timestamp = None
         self.latest_price_status = None
-        self.last_written_minute = get_last_ohlc_time_from_csv("csv")
+        # 最後に書き込んだ足の時刻（epoch分）
+        last_time = get_last_ohlc_time_from_csv("csv")
+        self.last_written_minute = to_minute(last_time) if last_time is not None else None
+        self.tick_listeners = []
+        self.bar_listeners = []
+        # 追加の保存先（writer/storage_backend.py）。None ならCSVのみ
+        self.storage = storage
+        # 重複・順序の乱れたティックの処理（handler/tick_reorder.py）
+        self.reorder = reorder if reorder is not None else TickReorderBuffer()
+        self.late_tolerance_ms = late_tolerance_ms
+        # 受信スレッド（handle_tick）とメインループ（flush_pending_ticks・handle_closing_tick）が同時に
+        # ティックを処理しないよう、バッファから取り出して足に反映し終えるまでをこのロックで囲む。
+        # 取り出しと処理の間に他方が割り込むと、古いティックが新しいティックの後に処理されて捨てられる
+        self._tick_lock = threading.RLock()
+        # ティックの限月は切り替わりの表から引く（utils/contract_calendar.py）
+        self.contract_calendar = get_contract_calendar()
+
+    def add_tick_listener(self, listener):
+        """
+        ティック受信ごとに listener(tick) を呼び出す（tick は utils/market_types.py の Tick）。
+        受信処理を遅らせないよう、listener 側では重い処理をしないこと。
+        """
+        self.tick_listeners.append(listener)
+
+    def add_bar_listener(self, listener):
+        """
+        足を書き込むごとに listener(bar) を呼び出す（bar は utils/market_types.py の Bar。ダミー足も含む）。
+        クロージングの足は書き込み後も同じオブジェクトが更新されるため、保持する場合は bar.copy() すること。
+        """
+        self.bar_listeners.append(listener)
+
+    def _write_bar(self, bar: Bar):
+        """確定した足をCSVと追加の保存先に書き込み、listener に通知する。"""
+        self.ohlc_writer.write_row(bar)
+        if self.storage is not None:
+            self.storage.write_bar(bar)
+        for listener in self.bar_listeners:
+            listener(bar)
 
     def get_latest_price(self) -> Optional[float]:
         """最新の価格を返す"""
@@ -40,14 +86,59 @@ class PriceHandler:
         return self.latest_price_status
 
     def handle_tick(self, price: float, timestamp: datetime,current_price_status: int) -> Optional[pd.DataFrame]:
+        tick = Tick(price, timestamp, current_price_status)
         self.latest_price = price
         self.latest_timestamp = timestamp
         self.latest_price_status = current_price_status
 
-        contract_month = get_active_term(timestamp)
+        # 重複を除き、取引所時刻の順に並べ直したティックを処理する
+        df = None
+        with self._tick_lock:
+            for released, lateness_ms in self.reorder.push(tick):
+                result = self._process_tick(released, lateness_ms)
+                if result is not None:
+                    df = result
+        return df
+
+    def handle_closing_tick(self, price: float, timestamp: datetime, current_price_status: int = 1) -> Optional[pd.DataFrame]:
+        """
+        メインループからのクロージングtick（15:45 / 6:00）。分の頭の時刻で送られ、受信済みのティックより
+        古くなるため、並べ替え・重複除去を通さずにそのまま処理して足を確定させる。
+        """
+        with self._tick_lock:
+            self.flush_pending_ticks(force=True)
+            return self._process_tick(Tick(price, timestamp, current_price_status))
+
+    def flush_pending_ticks(self, force: bool = False):
+        """並べ替えのために保持しているティックのうち、保持時間を過ぎたもの（force=True なら全て）を処理する。"""
+        with self._tick_lock:
+            for released, lateness_ms in self.reorder.flush(force):
+                self._process_tick(released, lateness_ms)
+
+    def _amend_late_tick(self, tick: Tick, lateness_ms: int):
+        """
+        すでに処理したティックより古いティック。許容範囲内で構築中の足と同じ分なら高値・安値に反映し、
+        それ以外（確定済みの足の分、許容範囲外）は足には使わない。
+        """
+        if lateness_ms <= self.late_tolerance_ms and self.ohlc_builder.amend(tick):
+            self.reorder.late_amended += 1
+            print(f"[LATE] 遅延ティックを構築中の足に反映: {tick.price} @ {tick.timestamp}（{lateness_ms}ms遅れ）")
+        else:
+            self.reorder.late_dropped += 1
+            print(f"[LATE] 遅延ティックを足に反映せず破棄: {tick.price} @ {tick.timestamp}（{lateness_ms}ms遅れ）")
+
+    def _process_tick(self, tick: Tick, lateness_ms: int = 0) -> Optional[pd.DataFrame]:
+        price = tick.price
+        timestamp = tick.timestamp
+        contract_month = self.contract_calendar.term_for_tick(tick)
 
         if self.tick_writer is not None:
-            self.tick_writer.write_tick(price, timestamp,current_price_status)
+            self.tick_writer.write_tick(tick)
+        if self.storage is not None:
+            self.storage.write_tick(tick)
+
+        for listener in self.tick_listeners:
+            listener(tick)
 
         # 次セッションの最初の価格を記録（ダミー補完に使用）
         if (
@@ -60,34 +151,38 @@ class PriceHandler:
         df = None  # ✅ 最後に返すdf
 
         # ===== update() を繰り返し呼んで OHLC を返すまで処理 =====
-        while True:
-            ohlc = self.ohlc_builder.update(price, timestamp, contract_month=contract_month)
-            if not ohlc:
+        if lateness_ms:
+            self._amend_late_tick(tick, lateness_ms)
+        while not lateness_ms:
+            bar = self.ohlc_builder.update(tick, contract_month=contract_month)
+            if not bar:
                 break  # 返ってこなければループ終了
 
-            ohlc_time = ohlc["time"].replace(second=0, microsecond=0)
-            current_tick_minute = timestamp.replace(second=0, microsecond=0, tzinfo=None)
+            bar_minute = bar.minute
 
             # 同一分または未来分（未確定） → 通常はスキップ
-            if ohlc_time >= current_tick_minute and not ohlc["is_dummy"]:
-                print(f"[SKIP] {ohlc_time} は現在分または未来分 → 未確定でスキップ")
+            if bar_minute >= tick.minute and not bar.is_dummy:
+                print(f"[SKIP] {bar.time} は現在分または未来分 → 未確定でスキップ")
                 break
 
             # ダミーの重複を防ぐ（同一分で複数回出さない）
-            if self.last_written_minute and ohlc["is_dummy"] and ohlc_time == self.last_written_minute:
-                print(f"[SKIP] 同一のダミーは出力済みのためスキップ: {ohlc_time}")
+            if self.last_written_minute is not None and bar.is_dummy and bar_minute == self.last_written_minute:
+                print(f"[SKIP] 同一のダミーは出力済みのためスキップ: {bar.time}")
                 break
 
             # 通常の重複チェック
-            if self.last_written_minute and ohlc_time <= self.last_written_minute:
-                print(f"[SKIP] 重複のため {ohlc_time} をスキップ")
+            if self.last_written_minute is not None and bar_minute <= self.last_written_minute:
+                print(f"[SKIP] 重複のため {bar.time} をスキップ")
+                if self.storage is not None and not bar.is_dummy:
+                    # 保存先ではUPSERTで補完済みのダミー足を実データに置き換える
+                    self.storage.write_bar(bar)
                 break
 
             # 書き込み処理
-            self.ohlc_writer.write_row(ohlc)
-            self.last_written_minute = ohlc_time
-            self.ohlc_builder.current_minute = ohlc_time
-            print(f"[WRITE] OHLC確定: {ohlc_time} 値: {ohlc}")
+            self._write_bar(bar)
+            self.last_written_minute = bar_minute
+            self.ohlc_builder.current_minute = bar_minute
+            print(f"[WRITE] OHLC確定: {bar.time} 値: {bar}")
 
             # ✅ OHLC確定ごとにdfを取得
             new_last_line, latest_df = export_latest_minutes_to_pd(
@@ -100,16 +195,15 @@ class PriceHandler:
             #print("[DEBUG][handle_tick] latest_df:\n", latest_df)
 
         # ===== クロージングtick用の強制確定処理（15:45 or 6:00）=====
-        if (timestamp.hour == 15 and timestamp.minute == 45) or (timestamp.hour == 6 and timestamp.minute == 0):
+        if tick.minute % 1440 in CLOSING_MINUTES:
             print(f"[INFO][handle_tick] クロージングtickをhandle_tickに送ります: {price} @ {timestamp}")
 
-            final_ohlc = self.ohlc_builder.force_finalize()
-            if final_ohlc:
-                final_time = final_ohlc["time"].replace(second=0, microsecond=0)
-                if not self.last_written_minute or final_time > self.last_written_minute:
-                    self.ohlc_writer.write_row(final_ohlc)
-                    self.last_written_minute = final_time
-                    print(f"[INFO][handle_tick] クロージングOHLCを強制出力: {final_time}")
+            final_bar = self.ohlc_builder.force_finalize()
+            if final_bar:
+                if self.last_written_minute is None or final_bar.minute > self.last_written_minute:
+                    self._write_bar(final_bar)
+                    self.last_written_minute = final_bar.minute
+                    print(f"[INFO][handle_tick] クロージングOHLCを強制出力: {final_bar.time}")
                     # ✅ クロージングも出力
                     new_last_line, latest_df = export_latest_minutes_to_pd(
                         base_dir="csv",
@@ -120,11 +214,16 @@ class PriceHandler:
                     df = latest_df
                     #print(df)
                 else:
-                    print(f"[INFO][handle_tick] クロージングOHLCはすでに出力済み: {final_time}")
+                    print(f"[INFO][handle_tick] クロージングOHLCはすでに出力済み: {final_bar.time}")
 
         return df  # ✅ mainなどから受け取れるように返す
 
     def fill_missing_minutes(self, now: datetime):
+        """ティックの無い分をダミー足で埋める（メインループから。受信スレッドと同じロックの中で行う）。"""
+        with self._tick_lock:
+            self._fill_missing_minutes(now)
+
+    def _fill_missing_minutes(self, now: datetime):
         if is_market_closed(now):
             print(f"[DEBUG][fill_missing_minutes] 市場閉場中のため補完スキップ: {now}")
             return
@@ -139,70 +238,56 @@ class PriceHandler:
 
             prev_date = now.date() - timedelta(days=1)
             last_time = datetime.combine(prev_date, datetime.min.time()) + timedelta(hours=15, minutes=15)
-
-            dummy = {
-                "time": last_time,
-                "open": prev_close,
-                "high": prev_close,
-                "low": prev_close,
-                "close": prev_close,
-                "is_dummy": True,
-                "contract_month": "from_prev_day"
-            }
+            dummy = Bar.flat(to_minute(last_time), prev_close, True, "from_prev_day")
 
             self.ohlc_builder.ohlc = dummy
-            self.ohlc_builder.current_minute = last_time
-            self.last_written_minute = last_time
+            self.ohlc_builder.current_minute = dummy.minute
+            self.last_written_minute = dummy.minute
 
         # 🧮 通常の補完処理
-        current_minute = now.replace(second=0, microsecond=0, tzinfo=None)
+        current_minute = to_minute(now)
         last_minute = self.ohlc_builder.current_minute
 
         if current_minute <= last_minute:
-            print(f"[DEBUG][fill_missing_minutes] 補完不要: now={now}, current={current_minute}, last_written_minute={self.last_written_minute}")
+            print(f"[DEBUG][fill_missing_minutes] 補完不要: now={now}, current={from_minute(current_minute)}, last_written_minute={self._last_written_time()}")
             return
 
-        while last_minute + timedelta(minutes=1) <= current_minute:
-            next_minute = last_minute + timedelta(minutes=1)
-            if is_market_closed(next_minute):
-                print(f"[DEBUG][fill_missing_minutes] 補完対象が無音時間のためスキップ: {next_minute}")
+        while last_minute + 1 <= current_minute:
+            next_minute = last_minute + 1
+            if is_market_closed(from_minute(next_minute)):
+                print(f"[DEBUG][fill_missing_minutes] 補完対象が無音時間のためスキップ: {from_minute(next_minute)}")
                 last_minute = next_minute
                 continue
 
             last_minute = next_minute
-            last_close = self.ohlc_builder.ohlc["close"]
-
-            dummy = {
-                "time": last_minute,
-                "open": last_close,
-                "high": last_close,
-                "low": last_close,
-                "close": last_close,
-                "is_dummy": True,
-                "contract_month": "dummy"
-            }
-
-            dummy_time = dummy["time"].replace(second=0, microsecond=0)
-            if not self.last_written_minute or dummy_time > self.last_written_minute:
-                print(f"[DEBUG][fill_missing_minutes] ダミー補完: {dummy_time}")
-                self.ohlc_writer.write_row(dummy)
-                self.last_written_minute = dummy_time
-                self.ohlc_builder.current_minute = dummy_time
+            dummy = Bar.flat(last_minute, self.ohlc_builder.ohlc.close, True, "dummy")
+
+            if self.last_written_minute is None or dummy.minute > self.last_written_minute:
+                print(f"[DEBUG][fill_missing_minutes] ダミー補完: {dummy.time}")
+                self._write_bar(dummy)
+                self.last_written_minute = dummy.minute
+                self.ohlc_builder.current_minute = dummy.minute
                 self.ohlc_builder.ohlc = dummy
             else:
-                print(f"[DEBUG][fill_missing_minutes] 重複のため補完打ち切り: {dummy_time}")
+                print(f"[DEBUG][fill_missing_minutes] 重複のため補完打ち切り: {dummy.time}")
                 break
 
+    def _last_written_time(self) -> Optional[datetime]:
+        return from_minute(self.last_written_minute) if self.last_written_minute is not None else None
+
     def finalize_ohlc(self):
+        with self._tick_lock:
+            self._finalize_ohlc()
+
+    def _finalize_ohlc(self):
         final = self.ohlc_builder._finalize_ohlc()
         if final:
-            final_time = final["time"].replace(second=0, microsecond=0)
-            if not self.last_written_minute or final_time > self.last_written_minute:
-                print(f"[DEBUG][finalize_ohlc] 終了時最終OHLC書き込み: {final_time}")
-                self.ohlc_writer.write_row(final)
-                self.last_written_minute = final_time
+            if self.last_written_minute is None or final.minute > self.last_written_minute:
+                print(f"[DEBUG][finalize_ohlc] 終了時最終OHLC書き込み: {final.time}")
+                self._write_bar(final)
+                self.last_written_minute = final.minute
             else:
-                print(f"[DEBUG][finalize_ohlc] 重複でスキップ: {final_time}")
+                print(f"[DEBUG][finalize_ohlc] 重複でスキップ: {final.time}")
         else:
             print(f"[DEBUG][finalize_ohlc] 最終OHLCなし")
 
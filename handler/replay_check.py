@@ -0,0 +1,80 @@
+import argparse
+import csv
+import difflib
+import io
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+
+DEFAULT_TICK_FILE = os.path.join("dummy_tick_server", "dummy_tick_data", "DummyTick.csv")
+# 基準の1分足CSV。dummy_tick_data/ に置くとダミーサーバーが最新のティックファイルとして配信してしまうため外に置く
+DEFAULT_EXPECTED_FILE = os.path.join("dummy_tick_server", "DummyTick_expected_ohlc.csv")
+
+
+def replay(tick_file: str) -> list:
+    """
+    ティックCSV（Time,Price）を PriceHandler に1件ずつ流し、書き出された1分足CSVの行を返す。
+    出力は一時ディレクトリで行い、作業ディレクトリの csv/ には触れない。
+    """
+    from handler.price_handler import PriceHandler
+    from writer.ohlc_writer import OHLCWriter
+    from writer.tick_writer import TickWriter
+
+    tick_file = os.path.abspath(tick_file)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            with redirect_stdout(io.StringIO()):
+                ohlc_writer = OHLCWriter()
+                handler = PriceHandler(ohlc_writer, TickWriter(enable_output=False))
+                with open(tick_file, "r", encoding="utf-8-sig", newline="") as f:
+                    for row in csv.DictReader(f):
+                        timestamp = datetime.strptime(row["Time"], "%Y/%m/%d %H:%M:%S")
+                        handler.handle_tick(float(row["Price"]), timestamp, 1)
+                handler.finalize_ohlc()
+                ohlc_writer.close()
+            lines = []
+            for name in sorted(os.listdir("csv")):
+                if name.endswith("_nikkei_mini_future.csv"):
+                    with open(os.path.join("csv", name), "r", encoding="utf-8") as f:
+                        lines += f.read().splitlines()
+            return lines
+        finally:
+            os.chdir(cwd)
+
+
+def check(tick_file: str = DEFAULT_TICK_FILE, expected_file: str = DEFAULT_EXPECTED_FILE) -> bool:
+    """リプレイ結果が基準の1分足CSVと一致するかを確かめる。違いがあれば差分を表示する。"""
+    actual = replay(tick_file)
+    with open(expected_file, "r", encoding="utf-8") as f:
+        expected = f.read().splitlines()
+    if actual == expected:
+        print(f"[INFO][replay] {os.path.basename(tick_file)}: {len(actual) - 1}本 基準と一致")
+        return True
+    print(f"[ERROR][replay] {os.path.basename(tick_file)}: 基準と一致しません（基準 {len(expected)}行 / 出力 {len(actual)}行）")
+    for line in difflib.unified_diff(expected, actual, "expected", "actual", lineterm=""):
+        print(line)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ティックCSVをリプレイし、1分足の出力が基準と一致するかを確かめる")
+    parser.add_argument("--file", default=DEFAULT_TICK_FILE, help="ティックCSV（Time,Price）")
+    parser.add_argument("--expected", default=DEFAULT_EXPECTED_FILE, help="基準の1分足CSV")
+    parser.add_argument("--update", action="store_true", help="現在の出力で基準を書き直す（出力を意図して変えた場合のみ）")
+    args = parser.parse_args()
+
+    if args.update:
+        lines = replay(args.file)
+        with open(args.expected, "w", encoding="utf-8", newline="") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"[INFO][replay] 基準を更新しました: {args.expected}（{len(lines) - 1}本）")
+        return
+    sys.exit(0 if check(args.file, args.expected) else 1)
+
+
+if __name__ == "__main__":
+    main()
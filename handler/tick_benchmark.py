@@ -0,0 +1,155 @@
+import argparse
+import gc
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.market_types import Bar, Tick
+from writer.ohlc_builder import OHLCBuilder
+
+
+class _DictBuilder:
+    """比較用：Bar 導入前の辞書ベースの足の構築（分の判定に datetime.replace を使う）。"""
+
+    def __init__(self):
+        self.current_minute = None
+        self.ohlc = None
+
+    def update(self, price: float, timestamp: datetime, contract_month=None):
+        minute = timestamp.replace(second=0, microsecond=0, tzinfo=None)
+        if self.current_minute is None or minute > self.current_minute:
+            completed = self.ohlc.copy() if self.ohlc is not None else None
+            self.current_minute = minute
+            self.ohlc = {"time": minute, "open": price, "high": price, "low": price, "close": price,
+                         "is_dummy": False, "contract_month": contract_month}
+            return completed
+        self.ohlc["high"] = max(self.ohlc["high"], price)
+        self.ohlc["low"] = min(self.ohlc["low"], price)
+        self.ohlc["close"] = price
+        return None
+
+
+def make_ticks(count: int, ticks_per_minute: int = 60, seed: int = 0) -> tuple[list, list]:
+    """ベンチマーク用のティック（価格と時刻）を作る。"""
+    rng = np.random.default_rng(seed)
+    prices = (38000 + np.cumsum(rng.integers(-1, 2, count)) * 5).astype(float).tolist()
+    start = datetime(2025, 1, 6, 9, 0)
+    step = timedelta(seconds=60 / ticks_per_minute)
+    times = [start + step * i for i in range(count)]
+    return prices, times
+
+
+def _measure(label: str, run, count: int):
+    gc.collect()
+    gen0_before = gc.get_stats()[0]["collections"]
+    tracemalloc.start()
+    started = time.perf_counter()
+    kept = run()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gen0 = gc.get_stats()[0]["collections"] - gen0_before
+
+    per_bar = sys.getsizeof(kept[0]) + (sum(sys.getsizeof(v) for v in kept[0].values())
+                                        if isinstance(kept[0], dict) else 0)
+    print(f"[BENCH] {label:<28} {elapsed / count * 1e6:7.3f}µs/tick  GC(gen0)={gen0:5d}回  "
+          f"ピーク={peak / 1024:8.0f}KiB  足1本={per_bar}バイト")
+
+
+def bench_builder(count: int):
+    """OHLCBuilder 単体（ティック → 足）の比較。ログ出力は捨てて計測する。"""
+    prices, times = make_ticks(count)
+
+    def run_dict():
+        builder = _DictBuilder()
+        bars = []
+        for price, ts in zip(prices, times):
+            completed = builder.update(price, ts, "202503")
+            if completed:
+                bars.append(completed)
+        return bars
+
+    def run_slotted():
+        builder = OHLCBuilder()
+        bars = []
+        with redirect_stdout(io.StringIO()) as sink:
+            for price, ts in zip(prices, times):
+                completed = builder.update(Tick(price, ts, 1), "202503")
+                if completed:
+                    bars.append(completed)
+                if sink.tell() > 1 << 24:
+                    sink.seek(0)
+                    sink.truncate()
+        return bars
+
+    def run_slotted_core():
+        # update() の print を除いた分の切り替えと値の更新だけ
+        current = None
+        bar = None
+        bars = []
+        for price, ts in zip(prices, times):
+            tick = Tick(price, ts, 1)
+            if current is None or tick.minute > current:
+                if bar is not None:
+                    bars.append(bar)
+                current = tick.minute
+                bar = Bar.flat(tick.minute, price, False, "202503")
+            else:
+                bar.update(price)
+        return bars
+
+    _measure("辞書（従来）", run_dict, count)
+    _measure("Bar/Tick（ログ出力なし）", run_slotted_core, count)
+    _measure("OHLCBuilder（ログ出力込み）", run_slotted, count)
+
+
+def bench_handler(count: int):
+    """PriceHandler.handle_tick 全体（CSV出力込み）の1ティックあたりの時間。"""
+    from handler.price_handler import PriceHandler
+    from writer.ohlc_writer import OHLCWriter
+    from writer.tick_writer import TickWriter
+
+    prices, times = make_ticks(count)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            with redirect_stdout(io.StringIO()):
+                handler = PriceHandler(OHLCWriter(), TickWriter(enable_output=True))
+
+            def run():
+                with redirect_stdout(io.StringIO()) as sink:
+                    for price, ts in zip(prices, times):
+                        handler.handle_tick(price, ts, 1)
+                        if sink.tell() > 1 << 24:
+                            sink.seek(0)
+                            sink.truncate()
+                return [handler.ohlc_builder.ohlc]
+
+            _measure("PriceHandler.handle_tick", run, count)
+            handler.tick_writer.close()
+            handler.ohlc_writer.close()
+        finally:
+            os.chdir(cwd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ティック処理のホットパスの計測（時間・GC回数・メモリ）")
+    parser.add_argument("--ticks", type=int, default=200_000)
+    parser.add_argument("--handler", action="store_true", help="PriceHandler 全体（CSV出力込み）も計測する")
+    args = parser.parse_args()
+
+    bench_builder(args.ticks)
+    if args.handler:
+        bench_handler(min(args.ticks, 50_000))
+
+
+if __name__ == "__main__":
+    main()
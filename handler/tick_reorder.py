@@ -0,0 +1,126 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+from utils.market_types import Tick
+from writer.ohlc_builder import PRE_CLOSE_TRIGGER_MINUTES
+
+DEFAULT_WINDOW_MS = 0          # 並べ替えのために保持する時間（0 なら保持せず、重複除去と遅延判定のみ）
+DEFAULT_CAPACITY = 256         # 保持するティックの上限（超えたら古いものから出す）
+DEFAULT_DEDUP_SIZE = 4096      # 重複判定に覚えておく直近のティック数
+DEFAULT_LATE_TOLERANCE_MS = 2000
+
+
+class TickReorderBuffer:
+    """
+    OHLCBuilder の手前で、取引所時刻（Tick.epoch_ms）を基準にティックを並べ直すクラス。
+
+    - (時刻, 価格, ステータス) が直近 dedup_size 件と同じティックは重複として捨てる
+      （再接続後に同じ push が再送された場合など）。
+      ただしプレクロージング補完の分（15:40 / 5:55）のティックは捨てない。OHLCBuilder はこの分に
+      届いた push の回数でダミー足を出すため、板だけの更新で同じ時刻・価格が続く push も必要になる
+    - window_ms > 0 の場合、受信したティックを最大 window_ms（取引所時刻・受信からの経過時間の早い方）
+      だけ保持し、時刻順に出す。保持数は capacity 件まで
+    - すでに出したティックより古いティックは遅延ティックとして、遅れ（ミリ秒）を付けて出す。
+      構築中の足に反映するか捨てるかは受け取り側（PriceHandler）が決める
+    """
+
+    def __init__(self, window_ms: int = DEFAULT_WINDOW_MS, capacity: int = DEFAULT_CAPACITY,
+                 dedup_size: int = DEFAULT_DEDUP_SIZE):
+        self.window_ms = window_ms
+        self.capacity = capacity
+        self._heap = []                 # (epoch_ms, 受信順, 受信時刻, tick)
+        self._seq = itertools.count()
+        self._seen = set()
+        self._seen_order = deque()
+        self._dedup_size = dedup_size
+        self._newest_ms = None          # 受信した中で最も新しい取引所時刻
+        self._released_ms = None        # 最後に出したティックの取引所時刻
+        self._last_released_seq = -1
+        self._lock = threading.Lock()
+
+        self.received = 0
+        self.duplicates = 0
+        self.reordered = 0              # 受信順と異なる順で出したティック
+        self.late = 0                   # 出した後に届いた古いティック
+        self.late_amended = 0           # うち構築中の足に反映したもの（PriceHandler が数える）
+        self.late_dropped = 0           # うち反映できずに捨てたもの（同上）
+        self.max_lateness_ms = 0
+
+    def _is_duplicate(self, key: tuple) -> bool:
+        if key in self._seen:
+            return True
+        self._seen.add(key)
+        self._seen_order.append(key)
+        if len(self._seen_order) > self._dedup_size:
+            self._seen.discard(self._seen_order.popleft())
+        return False
+
+    def push(self, tick: Tick) -> list:
+        """
+        ティックを受け取り、出せるようになったティックを [(tick, 遅れミリ秒)] で時刻順に返す。
+        遅れが 0 でないものは、すでに出したティックより古い遅延ティック。
+        """
+        epoch_ms = tick.epoch_ms
+        with self._lock:
+            self.received += 1
+            if (tick.minute % 1440 not in PRE_CLOSE_TRIGGER_MINUTES
+                    and self._is_duplicate((epoch_ms, tick.price, tick.status))):
+                self.duplicates += 1
+                return []
+            if self._newest_ms is None or epoch_ms > self._newest_ms:
+                self._newest_ms = epoch_ms
+            heapq.heappush(self._heap, (epoch_ms, next(self._seq), time.monotonic(), tick))
+            return self._release(force=False)
+
+    def flush(self, force: bool = False) -> list:
+        """
+        保持時間を過ぎたティックを出す（受信が途切れたときのために定期的に呼ぶ）。force=True なら全て出す。
+        """
+        with self._lock:
+            return self._release(force)
+
+    def _release(self, force: bool) -> list:
+        released = []
+        now = time.monotonic()
+        window_sec = self.window_ms / 1000.0
+        while self._heap:
+            epoch_ms, seq, arrived, tick = self._heap[0]
+            due = (force or len(self._heap) > self.capacity
+                   or self._newest_ms - epoch_ms >= self.window_ms
+                   or now - arrived >= window_sec)
+            if not due:
+                break
+            heapq.heappop(self._heap)
+
+            lateness = 0
+            if self._released_ms is not None and epoch_ms < self._released_ms:
+                lateness = self._released_ms - epoch_ms
+                self.late += 1
+                self.max_lateness_ms = max(self.max_lateness_ms, lateness)
+            else:
+                self._released_ms = epoch_ms
+            if seq < self._last_released_seq:
+                self.reordered += 1
+            self._last_released_seq = max(self._last_released_seq, seq)
+            released.append((tick, lateness))
+        return released
+
+    def get_stats(self) -> dict:
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "reordered": self.reordered,
+            "late": self.late,
+            "late_amended": self.late_amended,
+            "late_dropped": self.late_dropped,
+            "max_lateness_ms": self.max_lateness_ms,
+            "buffered": len(self._heap),
+        }
+
+    def print_stats(self):
+        s = self.get_stats()
+        print(f"[INFO][reorder] 受信={s['received']} 重複={s['duplicates']} 並べ替え={s['reordered']} "
+              f"遅延={s['late']}（反映={s['late_amended']} 破棄={s['late_dropped']} 最大{s['max_lateness_ms']}ms）")
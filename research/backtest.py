@@ -0,0 +1,177 @@
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.compaction import list_ohlc_days, read_ohlc_file
+
+# バックテストで扱う1分足配列の列名
+BAR_COLUMNS = ("time", "open", "high", "low", "close", "dummy")
+
+# セッション判定（0:00起点の分）
+DAY_SESSION_START = 8 * 60 + 45    # 8:45
+DAY_SESSION_END = 15 * 60 + 45     # 15:45
+NIGHT_SESSION_START = 17 * 60      # 17:00
+NIGHT_SESSION_END = 6 * 60         # 6:00
+
+
+def list_bar_files(base_dir: str = "csv") -> list[str]:
+    """
+    base_dir 内の *_nikkei_mini_future.csv を日付順に返す（圧縮済みのみの日も含む）。
+    """
+    return list(list_ohlc_days(base_dir).values())
+
+
+def bars_from_dataframe(df: pd.DataFrame) -> dict:
+    """
+    OHLCのDataFrame（Time, Open, High, Low, Close, Dummy）をNumPy配列の辞書に変換する。
+    time は epoch分（int64）、dummy は bool で保持する。
+    """
+    if df.empty:
+        return {
+            "time": np.empty(0, dtype=np.int64),
+            "open": np.empty(0, dtype=np.float64),
+            "high": np.empty(0, dtype=np.float64),
+            "low": np.empty(0, dtype=np.float64),
+            "close": np.empty(0, dtype=np.float64),
+            "dummy": np.empty(0, dtype=np.bool_),
+        }
+
+    times = pd.to_datetime(df["Time"]).values.astype("datetime64[m]").astype(np.int64)
+    order = np.argsort(times, kind="stable")
+
+    return {
+        "time": np.ascontiguousarray(times[order]),
+        "open": df["Open"].to_numpy(dtype=np.float64)[order],
+        "high": df["High"].to_numpy(dtype=np.float64)[order],
+        "low": df["Low"].to_numpy(dtype=np.float64)[order],
+        "close": df["Close"].to_numpy(dtype=np.float64)[order],
+        "dummy": (df["Dummy"].astype(str) == "dummy").to_numpy()[order],
+    }
+
+
+def load_bar_arrays(paths: Iterable[str]) -> dict:
+    """
+    複数の1分足CSVを読み込み、時刻順に並べたNumPy配列の辞書を返す。
+    圧縮済み（Parquet）のファイルがあればそちらを読む。
+    """
+    frames = []
+    for path in paths:
+        try:
+            frames.append(read_ohlc_file(path))
+        except Exception as e:
+            print(f"[警告] {path} の読み込みに失敗: {e}")
+
+    if not frames:
+        return bars_from_dataframe(pd.DataFrame())
+
+    return bars_from_dataframe(pd.concat(frames, ignore_index=True))
+
+
+def session_mask(time_min: np.ndarray, session: str = "all") -> np.ndarray:
+    """
+    epoch分の配列から、指定セッション（all / day / night）に属する足のマスクを返す。
+    """
+    minute_of_day = time_min % (24 * 60)
+
+    if session == "day":
+        return (minute_of_day >= DAY_SESSION_START) & (minute_of_day <= DAY_SESSION_END)
+    if session == "night":
+        return (minute_of_day >= NIGHT_SESSION_START) | (minute_of_day <= NIGHT_SESSION_END)
+    return np.ones(len(time_min), dtype=np.bool_)
+
+
+def _pivot_levels(values: np.ndarray, lookback: int, find_high: bool) -> np.ndarray:
+    """
+    lookback本の窓の中央が窓内で最大（最小）になった時点で水準を更新し、
+    各足の時点で確定している直近の水準を返す。
+    初期値は Rule_Class と同様に最初の lookback 本の最大（最小）値。
+    """
+    n = len(values)
+    levels = np.full(n, np.nan)
+    if n == 0:
+        return levels
+
+    head = values[:lookback]
+    initial = head.max() if find_high else head.min()
+
+    if n < lookback:
+        levels[:] = initial
+        return levels
+
+    half = lookback // 2
+    windows = np.lib.stride_tricks.sliding_window_view(values, lookback)
+    center = windows[:, half]
+    others = np.delete(windows, half, axis=1)
+
+    if find_high:
+        is_pivot = center > others.max(axis=1)
+    else:
+        is_pivot = center < others.min(axis=1)
+
+    # 窓の最後の足で水準が確定する
+    confirm_idx = np.nonzero(is_pivot)[0] + lookback - 1
+    levels[confirm_idx] = center[is_pivot]
+    levels[0] = initial
+
+    # 直前の確定値で前方補完
+    idx = np.where(~np.isnan(levels), np.arange(n), 0)
+    np.maximum.accumulate(idx, out=idx)
+    return levels[idx]
+
+
+def backtest_rule(
+    bars: dict,
+    lookback: int = 3,
+    level_buffer: float = 0.0,
+    session: str = "all",
+    cost: float = 0.0,
+    mask: Optional[np.ndarray] = None,
+) -> dict:
+    """
+    Rule_Class と同じ抵抗線・支持線ルールをパラメータ付きで実行し、成績を返す。
+
+    - lookback: 抵抗線・支持線を判定する窓の本数（奇数、3で Rule_Class と同一）
+    - level_buffer: 水準に持たせる余裕幅（円）
+    - session: 売買対象セッション（all / day / night）
+    - cost: 建玉変更1回あたりのコスト（円）
+
+    シグナルは各足の終値で判定し、次の足の終値まで保持したものとして損益を計算する。
+    """
+    if lookback < 3 or lookback % 2 == 0:
+        raise ValueError(f"lookback は3以上の奇数で指定してください: {lookback}")
+
+    close = bars["close"]
+    n = len(close)
+    if n < 2:
+        return {"pnl": 0.0, "trades": 0, "max_drawdown": 0.0, "win_rate": 0.0, "bars": n}
+
+    resistance = _pivot_levels(bars["high"], lookback, find_high=True)
+    support = _pivot_levels(bars["low"], lookback, find_high=False)
+
+    signal = np.where(
+        close < resistance - level_buffer, 1,
+        np.where(close > support + level_buffer, -1, 0)
+    ).astype(np.int8)
+
+    active = session_mask(bars["time"], session) & ~bars["dummy"]
+    if mask is not None:
+        active &= mask
+    signal[~active] = 0
+
+    returns = np.diff(close) * signal[:-1]
+    changes = np.abs(np.diff(signal.astype(np.int16), prepend=0)) > 0
+    trade_count = int(changes[:-1].sum())
+    returns = returns - changes[:-1] * cost
+
+    equity = np.cumsum(returns)
+    drawdown = np.maximum.accumulate(np.maximum(equity, 0.0)) - equity
+    held = returns[signal[:-1] != 0]
+
+    return {
+        "pnl": float(equity[-1]),
+        "trades": trade_count,
+        "max_drawdown": float(drawdown.max()),
+        "win_rate": float((held > 0).mean()) if len(held) else 0.0,
+        "bars": n,
+    }
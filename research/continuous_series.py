@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from research.backtest import bars_from_dataframe
+from utils.contract_calendar import next_term, sq_date
+from utils.compaction import compacted_path, has_fresh_compacted, list_ohlc_days, read_ohlc_file
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "continuous")
+ADJUST_METHODS = ("none", "back", "ratio")
+ROLL_WINDOW_DAYS = 7   # SQ日の前後この日数以内の ContractMonth の切り替わりを限月交代とみなす
+
+
+def front_term(trade_date: date) -> int:
+    """
+    取引日の期近限月を返す。SQ日を取引日とするセッション（前日の夜間から）は次の限月。
+    """
+    month = ((trade_date.month - 1) // 3 + 1) * 3
+    term = trade_date.year * 100 + month
+    if trade_date >= sq_date(term):
+        term = next_term(term)
+    return term
+
+
+def _contract_labels(values) -> np.ndarray:
+    """ContractMonth 列を整数（YYYYMM）に変換する。dummy や空欄は 0。"""
+    labels = pd.to_numeric(pd.Series(values, dtype=object).astype(str).str[:6], errors="coerce")
+    return labels.fillna(0).to_numpy(dtype=np.int64)
+
+
+def _file_stamp(path: str) -> list:
+    """実際に読まれるファイル（圧縮済みがあればそちら）の (サイズ, 更新時刻)。"""
+    source = compacted_path(path) if has_fresh_compacted(path) else path
+    st = os.stat(source)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _empty_day() -> dict:
+    arrays = bars_from_dataframe(pd.DataFrame())
+    arrays["label"] = np.empty(0, dtype=np.int64)
+    arrays["trade_date"] = np.empty(0, dtype=np.int64)
+    return arrays
+
+
+class ContinuousSeriesBuilder:
+    """
+    日ごとの1分足ファイルを限月をまたいでつなぎ、連続した1分足の系列を作るクラス。
+
+    - 未調整の足を取引日ごとに <cache_dir>/<YYYYMMDD>.npz に保存し、次回からは新しい日と
+      内容が変わった日だけを読む（系列は末尾に追記されるだけ）
+    - 限月交代は ContractMonth の切り替わりから検出し、SQ日の前後 ROLL_WINDOW_DAYS 日に無いものは
+      採用しない。切り替わりが記録されていない交代は、SQ日を取引日とする最初の足で行ったものとする
+    - 調整は交代ごとの価格差（新限月の最初の始値 − 旧限月の最後の実データの終値）から出力時に計算する
+      （"back" は差を加算、"ratio" は比を乗算して最新限月の水準に合わせる）。交代が増えても
+      保存済みの足は書き換えない
+    """
+
+    def __init__(self, csv_dir: str = "csv", cache_dir: str = DEFAULT_CACHE_DIR):
+        self.csv_dir = csv_dir
+        self.cache_dir = cache_dir
+        self._manifest_path = os.path.join(cache_dir, "manifest.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+        self.days = {}      # 取引日 → 未調整の足の配列
+        self.raw = _empty_day()
+        self.rolls = []
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _day_cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _read_day(self, trade_date: date, path: str) -> dict:
+        df = read_ohlc_file(path)
+        arrays = bars_from_dataframe(df)
+        if df.empty:
+            return _empty_day()
+        order = np.argsort(pd.to_datetime(df["Time"]).values.astype("datetime64[m]").astype(np.int64), kind="stable")
+        arrays["label"] = _contract_labels(df["ContractMonth"].to_numpy())[order]
+        arrays["trade_date"] = np.full(len(order), trade_date.toordinal(), dtype=np.int64)
+        return arrays
+
+    def update(self) -> int:
+        """
+        新しい日と内容が変わった日を取り込む。取り込んだ日数を返す。
+        最後の日より前の日が変わった場合（再構築など）は、その日以降を並べ直す。
+        """
+        changed = []
+        read = 0
+        for trade_date, path in list_ohlc_days(self.csv_dir).items():
+            key = trade_date.strftime("%Y%m%d")
+            stamp = _file_stamp(path)
+            cache_path = self._day_cache_path(key)
+
+            if trade_date in self.days and self.manifest.get(key) == stamp:
+                continue
+            if self.manifest.get(key) == stamp and os.path.isfile(cache_path):
+                with np.load(cache_path) as data:
+                    self.days[trade_date] = {name: data[name] for name in data.files}
+                changed.append(trade_date)
+                continue
+
+            arrays = self._read_day(trade_date, path)
+            read += 1
+            np.savez(cache_path, **arrays)
+            self.manifest[key] = stamp
+            self.days[trade_date] = arrays
+            changed.append(trade_date)
+
+        if not changed:
+            return 0
+
+        self._save_manifest()
+        known = len(self.raw["time"])
+        first_changed = min(changed)
+        if known and first_changed > date.fromordinal(int(self.raw["trade_date"][-1])):
+            # 末尾への追記だけで済む
+            parts = [self.raw] + [self.days[d] for d in sorted(changed)]
+        else:
+            parts = [self.days[d] for d in sorted(self.days)]
+        self.raw = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+        self.rolls = detect_rolls(self.raw)
+        print(f"[INFO][continuous] {len(changed)}日分を取り込みました（うちファイルから{read}日 計{len(self.raw['time'])}本 限月交代{len(self.rolls)}回）")
+        return len(changed)
+
+    def series(self, method: str = "back") -> dict:
+        """
+        連続系列を backtest と同じ形式の配列の辞書で返す（time は epoch分、contract は足ごとの限月）。
+        """
+        return adjust_series(self.raw, self.rolls, method)
+
+    def to_dataframe(self, method: str = "back") -> pd.DataFrame:
+        arrays = self.series(method)
+        return pd.DataFrame({
+            "Time": pd.to_datetime(arrays["time"].astype("datetime64[m]")),
+            "Open": arrays["open"],
+            "High": arrays["high"],
+            "Low": arrays["low"],
+            "Close": arrays["close"],
+            "Dummy": np.where(arrays["dummy"], "dummy", "real"),
+            "ContractMonth": arrays["contract"],
+        })
+
+
+def detect_rolls(raw: dict) -> list:
+    """
+    未調整の系列から限月交代を検出し、[{index, from, to, gap, ratio, source}] を返す。
+    index は新限月の最初の足の位置。
+    """
+    n = len(raw["time"])
+    if n == 0:
+        return []
+
+    trade_dates = raw["trade_date"]
+    labels = raw["label"]
+    real = ~raw["dummy"]
+    first_day = date.fromordinal(int(trade_dates[0]))
+    last_day = date.fromordinal(int(trade_dates[-1]))
+
+    rolls = []
+    term = front_term(first_day)
+    while sq_date(term) <= last_day:
+        sq = sq_date(term)
+        new = next_term(term)
+        window_start = (sq - timedelta(days=ROLL_WINDOW_DAYS)).toordinal()
+        window_end = (sq + timedelta(days=ROLL_WINDOW_DAYS)).toordinal()
+
+        in_window = (trade_dates >= window_start) & (trade_dates <= window_end)
+        switched = np.flatnonzero(in_window & real & (labels == new))
+        if len(switched):
+            index, source = int(switched[0]), "contract_month"
+        else:
+            index, source = int(np.searchsorted(trade_dates, sq.toordinal())), "calendar"
+
+        before = np.flatnonzero(real[:index])
+        if 0 < index < n and len(before):
+            old_close = float(raw["close"][before[-1]])
+            new_open = float(raw["open"][index])
+            rolls.append({
+                "index": index,
+                "from": term,
+                "to": new,
+                "gap": new_open - old_close,
+                "ratio": new_open / old_close if old_close else 1.0,
+                "source": source,
+            })
+        term = new
+    return rolls
+
+
+def adjust_series(raw: dict, rolls: list, method: str = "back") -> dict:
+    """
+    交代ごとの価格差で過去の足を調整する。
+    - "back"  : 交代より前の足に、それ以降の価格差の合計を加える（値幅が保たれる）
+    - "ratio" : 交代より前の足に、それ以降の価格比の積を掛ける（変化率が保たれる）
+    - "none"  : 調整しない
+    """
+    if method not in ADJUST_METHODS:
+        raise ValueError(f"未知の調整方法です: {method}")
+
+    n = len(raw["time"])
+    indices = np.array([r["index"] for r in rolls], dtype=np.int64)
+    segment = np.searchsorted(indices, np.arange(n), side="right")
+
+    # 区間ごとの限月（最初の区間は最初の交代の旧限月、交代がなければ最初の取引日の期近）
+    if rolls:
+        terms = np.array([rolls[0]["from"]] + [r["to"] for r in rolls], dtype=np.int64)
+    else:
+        terms = np.array([front_term(date.fromordinal(int(raw["trade_date"][0])))] if n else [0], dtype=np.int64)
+
+    out = {
+        "time": raw["time"],
+        "dummy": raw["dummy"],
+        "contract": terms[segment] if n else np.empty(0, dtype=np.int64),
+    }
+    prices = ("open", "high", "low", "close")
+    if method == "none" or not rolls:
+        out.update({name: raw[name].copy() for name in prices})
+        return out
+
+    if method == "back":
+        gaps = np.array([r["gap"] for r in rolls])
+        # 区間 k の調整量 = 交代 k 以降の価格差の合計（最後の区間は 0）
+        offsets = np.append(np.cumsum(gaps[::-1])[::-1], 0.0)
+        out.update({name: raw[name] + offsets[segment] for name in prices})
+    else:
+        ratios = np.array([r["ratio"] for r in rolls])
+        factors = np.append(np.cumprod(ratios[::-1])[::-1], 1.0)
+        out.update({name: raw[name] * factors[segment] for name in prices})
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="限月をつないだ連続1分足を作る")
+    parser.add_argument("--csv-dir", default="csv")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--method", choices=ADJUST_METHODS, default="back")
+    parser.add_argument("--out", help="連続系列の出力先（.parquet または .csv）")
+    args = parser.parse_args()
+
+    builder = ContinuousSeriesBuilder(args.csv_dir, args.cache_dir)
+    builder.update()
+    for roll in builder.rolls:
+        print(f"[INFO][continuous] {roll['from']} → {roll['to']} "
+              f"位置={roll['index']} 差={roll['gap']:+.1f} 比={roll['ratio']:.5f}（{roll['source']}）")
+
+    if args.out:
+        df = builder.to_dataframe(args.method)
+        if args.out.endswith(".parquet"):
+            df.to_parquet(args.out, index=False)
+        else:
+            df.to_csv(args.out, index=False, date_format="%Y/%m/%d %H:%M:%S")
+        print(f"[INFO][continuous] {args.method} 調整の {len(df)}本を {args.out} に出力しました")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import os
+import time
+from multiprocessing import Pool, shared_memory
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from research.backtest import BAR_COLUMNS, backtest_rule, list_bar_files, load_bar_arrays
+
+# ワーカープロセス側で共有メモリから復元した配列
+_worker_bars = None
+_worker_handles = []
+
+RESULT_HEADERS = ["Key", "Lookback", "LevelBuffer", "Session", "Cost",
+                  "PnL", "Trades", "MaxDrawdown", "WinRate", "Bars"]
+
+
+class SharedBarArrays:
+    """
+    1分足のNumPy配列を共有メモリに配置し、ワーカープロセスからコピーなしで参照させるクラス。
+    DataFrameをpickleして各プロセスに送る代わりに、共有メモリ名と形状だけを渡す。
+    """
+
+    def __init__(self, bars: dict):
+        self._blocks = []
+        self.spec = {}
+
+        for name in BAR_COLUMNS:
+            array = np.ascontiguousarray(bars[name])
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[:] = array
+            self._blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(spec: dict) -> tuple[dict, list]:
+        """
+        spec から共有メモリに接続し、(配列の辞書, 共有メモリのハンドル) を返す。
+        ハンドルは配列を使い終わるまで保持すること。
+        """
+        bars = {}
+        handles = []
+        for name, (shm_name, shape, dtype) in spec.items():
+            block = shared_memory.SharedMemory(name=shm_name)
+            bars[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            handles.append(block)
+        return bars, handles
+
+    def close(self):
+        """共有メモリを解放する。"""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def _init_worker(spec: dict):
+    global _worker_bars, _worker_handles
+    _worker_bars, _worker_handles = SharedBarArrays.attach(spec)
+
+
+def _run_combination(params: dict) -> tuple[dict, dict]:
+    stats = backtest_rule(_worker_bars, **params)
+    return params, stats
+
+
+def make_key(params: dict) -> str:
+    """パラメータの組み合わせを一意に表すキーを返す。"""
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+
+class ParamSweepRunner:
+    """
+    Rule のパラメータグリッドをプロセスプールで並列に評価するクラス。
+
+    - 1分足配列は共有メモリ経由でワーカーと共有する
+    - 結果は1件ごとに result_path へ追記し、ランキングを随時表示する
+    - result_path に残っている組み合わせはスキップするため、中断したスイープを再開できる
+    """
+
+    def __init__(
+        self,
+        bar_files: list[str],
+        grid: dict,
+        result_path: str = os.path.join("sweep", "sweep_results.csv"),
+        processes: Optional[int] = None,
+        rank_by: str = "PnL",
+        top_n: int = 10,
+        chunksize: int = 16,
+        progress_interval: float = 5.0,
+    ):
+        self.bar_files = bar_files
+        self.grid = grid
+        self.result_path = result_path
+        self.processes = processes
+        self.rank_by = rank_by
+        self.top_n = top_n
+        self.chunksize = chunksize
+        self.progress_interval = progress_interval
+
+    def iter_combinations(self):
+        """グリッドの全組み合わせを辞書として順に返す。"""
+        names = list(self.grid.keys())
+        for values in itertools.product(*(self.grid[n] for n in names)):
+            yield dict(zip(names, values))
+
+    def load_completed(self) -> set:
+        """result_path から評価済みの組み合わせのキーを読み込む。"""
+        if not os.path.isfile(self.result_path):
+            return set()
+        with open(self.result_path, "r", encoding="utf-8", newline="") as f:
+            return {row["Key"] for row in csv.DictReader(f)}
+
+    def run(self) -> pd.DataFrame:
+        """
+        スイープを実行し、rank_by の降順に並べた結果のDataFrameを返す。
+        """
+        completed = self.load_completed()
+        pending = [p for p in self.iter_combinations() if make_key(p) not in completed]
+        total = len(completed) + len(pending)
+        print(f"[INFO] パラメータスイープ: 全{total}件（評価済み {len(completed)}件 / 残り {len(pending)}件）")
+
+        if pending:
+            self._run_pending(pending, total, len(completed))
+
+        return self.ranked_table()
+
+    def _run_pending(self, pending: list, total: int, done: int):
+        bars = load_bar_arrays(self.bar_files)
+        print(f"[INFO] {len(self.bar_files)}ファイル / {len(bars['time'])}本の1分足を共有メモリに配置します")
+
+        os.makedirs(os.path.dirname(self.result_path) or ".", exist_ok=True)
+        is_new = not os.path.isfile(self.result_path) or os.path.getsize(self.result_path) == 0
+
+        shared = SharedBarArrays(bars)
+        del bars
+        top = []
+        started = time.time()
+        last_report = started
+
+        try:
+            with open(self.result_path, "a", encoding="utf-8", newline="") as f, \
+                    Pool(self.processes, initializer=_init_worker, initargs=(shared.spec,)) as pool:
+                writer = csv.writer(f)
+                if is_new:
+                    writer.writerow(RESULT_HEADERS)
+
+                for params, stats in pool.imap_unordered(_run_combination, pending, chunksize=self.chunksize):
+                    row = self._to_row(params, stats)
+                    writer.writerow(row)
+                    f.flush()
+                    done += 1
+
+                    score = row[RESULT_HEADERS.index(self.rank_by)]
+                    entry = (score, row[0], row)
+                    if len(top) < self.top_n:
+                        heapq.heappush(top, entry)
+                    else:
+                        heapq.heappushpop(top, entry)
+
+                    now = time.time()
+                    if now - last_report >= self.progress_interval or done == total:
+                        rate = (done - (total - len(pending))) / max(now - started, 1e-9)
+                        print(f"[INFO] 進捗 {done}/{total}（{rate:.1f}件/秒）")
+                        self._print_top(top)
+                        last_report = now
+        finally:
+            shared.close()
+
+    def _to_row(self, params: dict, stats: dict) -> list:
+        return [
+            make_key(params),
+            params.get("lookback"),
+            params.get("level_buffer"),
+            params.get("session"),
+            params.get("cost"),
+            stats["pnl"],
+            stats["trades"],
+            stats["max_drawdown"],
+            stats["win_rate"],
+            stats["bars"],
+        ]
+
+    def _print_top(self, top: list):
+        print(f"[INFO] 暫定上位{len(top)}件（{self.rank_by}順）")
+        for _, _, row in sorted(top, reverse=True):
+            print("  " + ", ".join(f"{h}={v}" for h, v in zip(RESULT_HEADERS[1:], row[1:])))
+
+    def ranked_table(self) -> pd.DataFrame:
+        """result_path の全結果を rank_by の降順に並べて返す。"""
+        if not os.path.isfile(self.result_path):
+            return pd.DataFrame(columns=RESULT_HEADERS)
+        df = pd.read_csv(self.result_path)
+        return df.sort_values(self.rank_by, ascending=False, ignore_index=True)
+
+
+def _parse_list(text: str, cast):
+    return [cast(v) for v in text.split(",") if v != ""]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule のパラメータスイープを並列実行する")
+    parser.add_argument("--csv-dir", default="csv", help="1分足CSVのディレクトリ")
+    parser.add_argument("--lookback", default="3,5,7,9", help="カンマ区切りの lookback 候補")
+    parser.add_argument("--level-buffer", default="0,5,10,20", help="カンマ区切りの level_buffer 候補")
+    parser.add_argument("--session", default="all,day,night", help="カンマ区切りのセッション候補")
+    parser.add_argument("--cost", default="0", help="カンマ区切りのコスト候補")
+    parser.add_argument("--output", default=os.path.join("sweep", "sweep_results.csv"))
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--rank-by", default="PnL")
+    args = parser.parse_args()
+
+    grid = {
+        "lookback": _parse_list(args.lookback, int),
+        "level_buffer": _parse_list(args.level_buffer, float),
+        "session": _parse_list(args.session, str),
+        "cost": _parse_list(args.cost, float),
+    }
+    runner = ParamSweepRunner(
+        list_bar_files(args.csv_dir), grid,
+        result_path=args.output, processes=args.processes, rank_by=args.rank_by
+    )
+    df = runner.run()
+    print(df.head(20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.archive_catalog import OHLC_COLUMNS, OHLC_SUFFIX
+from utils.compaction import COMPACT_EXT, TICK_SUFFIX, compact_file, compacted_path, has_fresh_compacted, read_tick_file
+from utils.tick_archive import find_tick_source
+from utils.time_util import get_trade_date, is_closing_minute
+
+CHECKPOINT_NAME = ".rebuild_checkpoint.json"
+CODE_VERSION = 2           # 足の作り方を変えたら上げる（チェックポイントを無効にする）
+SESSION_STARTS = (dtime(8, 45), dtime(17, 0))   # PFR_main と同じく、ここでクロージング済みの印を戻す
+
+
+def trade_dates_of(minutes: np.ndarray) -> np.ndarray:
+    """
+    epoch分の配列から取引日（epoch日）を返す。time_util.get_trade_date と同じ規則
+    （17:00以降は翌日、土日は直前の金曜）をベクトル化したもの。
+    """
+    day, minute_of_day = np.divmod(minutes, 1440)
+    trade_day = day + (minute_of_day >= 17 * 60)
+    weekday = (trade_day + 3) % 7   # 1970/1/1 は木曜（月曜=0）
+    return trade_day - np.where(weekday == 5, 1, np.where(weekday == 6, 2, 0))
+
+
+def _epoch_day(d: date) -> int:
+    return d.toordinal() - date(1970, 1, 1).toordinal()
+
+
+def tick_path(tick_dir: str, calendar_date: date) -> str:
+    return os.path.join(tick_dir, f"{calendar_date:%Y%m%d}{TICK_SUFFIX}.csv")
+
+
+def _tick_exists(path: str) -> bool:
+    return has_fresh_compacted(path) or find_tick_source(path) is not None
+
+
+def _source_stamp(path: str) -> Optional[list]:
+    """実際に読まれるティックファイルの (サイズ, 更新時刻)。無ければ None。"""
+    if has_fresh_compacted(path):
+        source = compacted_path(path)
+    else:
+        source = find_tick_source(path)
+        if source is None:
+            return None
+    st = os.stat(source)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def list_tick_dates(tick_dir: str) -> list:
+    """ティックファイル（CSV・Parquet・アーカイブ）のある暦日を昇順で返す。"""
+    dates = set()
+    if not os.path.isdir(tick_dir):
+        return []
+    for fname in os.listdir(tick_dir):
+        if fname[:8].isdigit() and fname[8:].startswith(TICK_SUFFIX + "."):
+            dates.add(datetime.strptime(fname[:8], "%Y%m%d").date())
+    return sorted(dates)
+
+
+def plan_trade_dates(tick_dates: list) -> list:
+    """ティックのある暦日から、作り直す対象の取引日を求める（夜間・週末は前後の取引日に属する）。"""
+    trade_dates = set()
+    for d in tick_dates:
+        for hour, minute in ((0, 0), (8, 45), (17, 0)):
+            trade_dates.add(get_trade_date(datetime.combine(d, datetime.min.time()).replace(hour=hour, minute=minute)))
+    return sorted(trade_dates)
+
+
+def source_dates(trade_date: date) -> list:
+    """
+    取引日のティックが入りうる暦日（前日の夜間〜金曜なら土曜早朝・週末まで）。
+    """
+    return [trade_date + timedelta(days=offset) for offset in range(-1, 3)]
+
+
+def _load_ticks(path: str) -> tuple:
+    df = read_tick_file(path)
+    if df.empty:
+        return np.empty(0, dtype=np.int64), [], np.empty(0), np.empty(0, dtype=np.int64)
+    times = pd.to_datetime(df["Time"])
+    minutes = times.values.astype("datetime64[m]").astype(np.int64)
+    price = df["Price"].to_numpy(dtype=np.float64)
+    status = (df["CurrentPriceStatus"].to_numpy(dtype=np.int64) if "CurrentPriceStatus" in df.columns
+              else np.ones(len(df), dtype=np.int64))
+    return minutes, list(times.dt.to_pydatetime()), price, status
+
+
+class _BarCollector:
+    """PriceHandler の ohlc_writer の代わりに、書き込まれた足をメモリに集める。"""
+
+    def __init__(self):
+        self.bars = []
+
+    def write_row(self, bar):
+        # クロージングの足は書き込み後も同じ Bar が更新されるため、書き込んだ時点の値を写す
+        self.bars.append(bar.copy())
+
+
+def _replay(ticks: list) -> tuple:
+    """
+    ティック (時刻, 価格, ステータス) を記録された順に PriceHandler へ流し、書き込まれた足と重複の数を返す。
+    PFR_main のメインループと同じく、分が変わるたびに fill_missing_minutes() を、15:45 / 6:00 には
+    セッションごとに1回 handle_closing_tick() を呼ぶ（メインループの「現在時刻」は最新ティックの時刻）。
+    PriceHandler は作業ディレクトリの csv/ を参照するため、空の一時ディレクトリで実行する。
+    """
+    from handler.price_handler import PriceHandler
+
+    collector = _BarCollector()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        os.chdir(tmp)
+        try:
+            handler = PriceHandler(collector, None)
+            last_checked = None
+            closing_finalized = False
+            for timestamp, price, status in ticks:
+                handler.handle_tick(price, timestamp, status)
+                now = timestamp.replace(second=0, microsecond=0, tzinfo=None)
+                if now.time() in SESSION_STARTS:
+                    closing_finalized = False
+                if not is_closing_minute(now.time()):
+                    if now != last_checked:
+                        handler.fill_missing_minutes(now)
+                        last_checked = now
+                elif not closing_finalized:
+                    handler.handle_closing_tick(handler.get_latest_price() or 0, now, 1)
+                    closing_finalized = True
+                    last_checked = now
+            handler.flush_pending_ticks(force=True)
+            handler.finalize_ohlc()
+        finally:
+            os.chdir(cwd)
+    return collector.bars, handler.reorder.duplicates
+
+
+def build_day_bars(tick_dir: str, trade_date: date) -> tuple:
+    """
+    1取引日分のティックから1分足を作る。戻り値は (DataFrame, 統計)。
+
+    - 取引日に属するティック（time_util の規則）だけを、記録された順に PriceHandler で処理し直す。
+      重複除去・プレクロージングのダミー足・クロージングの確定は実行中の記録と同じ処理になる
+    - 実行中の記録と同じく、ティックの無い分は埋めない（最後のティックより後の分も埋めない）
+    - 各取引日は前後の暦日のティックファイルを自分で読むため、取引日どうしは独立に並列処理できる
+    """
+    target = _epoch_day(trade_date)
+    ticks = []
+    for d in source_dates(trade_date):
+        path = tick_path(tick_dir, d)
+        if not _tick_exists(path):
+            continue
+        minutes, times, price, status = _load_ticks(path)
+        for i in np.flatnonzero(trade_dates_of(minutes) == target):
+            ticks.append((times[i], float(price[i]), int(status[i])))
+
+    bars, duplicates = _replay(ticks) if ticks else ([], 0)
+    df = pd.DataFrame({
+        "Time": [bar.time for bar in bars],
+        "Open": [bar.open for bar in bars],
+        "High": [bar.high for bar in bars],
+        "Low": [bar.low for bar in bars],
+        "Close": [bar.close for bar in bars],
+        "Dummy": ["dummy" if bar.is_dummy else "real" for bar in bars],
+        # OHLCWriter と同じく、ダミー足の限月は dummy
+        "ContractMonth": ["dummy" if bar.is_dummy else bar.contract_month for bar in bars],
+    }, columns=OHLC_COLUMNS)
+    stats = {"ticks": len(ticks), "duplicates": duplicates, "bars": len(bars),
+             "dummy": sum(bar.is_dummy for bar in bars)}
+    return df, stats
+
+
+def write_bars_csv(df: pd.DataFrame, path: str):
+    """OHLCWriter と同じ書式でCSVに書き出す（一時ファイルに書いてから置き換える）。"""
+    tmp_path = path + ".tmp"
+    df.to_csv(tmp_path, index=False, date_format="%Y/%m/%d %H:%M:%S")
+    os.replace(tmp_path, path)
+
+
+def rebuild_day(tick_dir: str, out_dir: str, trade_date: date, compact: bool = False) -> dict:
+    """1取引日分を作り直してファイルに書き出す（ワーカープロセスで実行）。"""
+    started = time.perf_counter()
+    df, stats = build_day_bars(tick_dir, trade_date)
+    out_path = os.path.join(out_dir, f"{trade_date:%Y%m%d}{OHLC_SUFFIX}")
+    if not stats["ticks"]:
+        # ティックが1つも無い取引日（休日など）はダミーだけのファイルを作らない
+        stats.update({"bars": 0, "dummy": 0, "trade_date": trade_date.isoformat(), "path": None,
+                      "elapsed_sec": time.perf_counter() - started})
+        return stats
+    write_bars_csv(df, out_path)
+    if compact:
+        # 作り直したCSVより古い圧縮版が残らないよう、先に消してから圧縮する
+        if os.path.isfile(compacted_path(out_path)):
+            os.remove(compacted_path(out_path))
+        compact_file(out_path, "ohlc")
+    stats.update({"trade_date": trade_date.isoformat(), "path": out_path,
+                  "elapsed_sec": time.perf_counter() - started})
+    return stats
+
+
+class RebuildCheckpoint:
+    """
+    作り直しの進捗を out_dir に保存し、中断後の再実行では終わった取引日を飛ばす。
+    入力のティックファイル（サイズ・更新時刻）か作り方（CODE_VERSION・圧縮の有無）が変わった日はやり直す。
+    """
+
+    def __init__(self, out_dir: str):
+        self.path = os.path.join(out_dir, CHECKPOINT_NAME)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.done = json.load(f)
+        except (OSError, ValueError):
+            self.done = {}
+        self._last_save = 0.0
+
+    @staticmethod
+    def fingerprint(tick_dir: str, trade_date: date, compact: bool) -> list:
+        stamps = [_source_stamp(tick_path(tick_dir, d)) for d in source_dates(trade_date)]
+        return [CODE_VERSION, compact, stamps]
+
+    def is_done(self, trade_date: date, fingerprint: list) -> bool:
+        return self.done.get(trade_date.isoformat(), {}).get("fingerprint") == fingerprint
+
+    def mark(self, trade_date: date, fingerprint: list, stats: dict):
+        self.done[trade_date.isoformat()] = {"fingerprint": fingerprint, "bars": stats["bars"]}
+        # 完了ごとに書くと日数が多いときに遅いので、1秒に1回までにする（最後に必ず save()）
+        if time.monotonic() - self._last_save >= 1.0:
+            self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.done, f)
+        os.replace(tmp_path, self.path)
+        self._last_save = time.monotonic()
+
+
+def run_rebuild(tick_dir: str = "tick_csv", out_dir: str = os.path.join("rebuild", "csv"),
+                start: Optional[date] = None, end: Optional[date] = None,
+                workers: Optional[int] = None, compact: bool = False) -> dict:
+    """
+    ティックから取引日ごとの1分足を作り直す。取引日を単位にプロセスプールへ配り、全コアで並列に処理する。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint = RebuildCheckpoint(out_dir)
+
+    trade_dates = [d for d in plan_trade_dates(list_tick_dates(tick_dir))
+                   if (start is None or d >= start) and (end is None or d <= end)]
+    pending = []
+    for d in trade_dates:
+        fingerprint = checkpoint.fingerprint(tick_dir, d, compact)
+        if not checkpoint.is_done(d, fingerprint):
+            pending.append((d, fingerprint))
+    skipped = len(trade_dates) - len(pending)
+    print(f"[INFO][rebuild] 対象{len(trade_dates)}日 完了済み{skipped}日 残り{len(pending)}日")
+
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    busy = 0.0
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(rebuild_day, tick_dir, out_dir, d, compact): (d, fp) for d, fp in pending}
+        for i, future in enumerate(as_completed(futures), 1):
+            d, fingerprint = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                failed.append(d)
+                print(f"[ERROR][rebuild] {d}: {e}")
+                continue
+            busy += stats["elapsed_sec"]
+            checkpoint.mark(d, fingerprint, stats)
+            if i % 20 == 0 or i == len(futures):
+                print(f"[INFO][rebuild] {i}/{len(futures)}日 {d}: 足={stats['bars']}（ダミー{stats['dummy']}） "
+                      f"ティック={stats['ticks']}")
+    checkpoint.save()
+
+    elapsed = time.perf_counter() - started
+    # 並列の効率 = ワーカーでの処理時間の合計 / (経過時間 × ワーカー数)
+    efficiency = busy / (elapsed * workers) if elapsed and pending else 0.0
+    print(f"[INFO][rebuild] {len(pending) - len(failed)}日を {elapsed:.1f}秒で作り直しました "
+          f"（{workers}並列 効率{efficiency:.0%} 失敗{len(failed)}日）")
+    return {"days": len(pending) - len(failed), "skipped": skipped, "failed": failed,
+            "elapsed_sec": elapsed, "workers": workers, "efficiency": efficiency}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ティックから1分足を取引日単位で並列に作り直す")
+    parser.add_argument("--tick-dir", default="tick_csv")
+    parser.add_argument("--out-dir", default=os.path.join("rebuild", "csv"))
+    parser.add_argument("--start", help="YYYYMMDD")
+    parser.add_argument("--end", help="YYYYMMDD")
+    parser.add_argument("--workers", type=int, default=None, help="既定はCPUコア数")
+    parser.add_argument("--compact", action="store_true", help=f"作り直した足を {COMPACT_EXT} にも圧縮する")
+    args = parser.parse_args()
+
+    parse = lambda s: datetime.strptime(s, "%Y%m%d").date() if s else None
+    run_rebuild(args.tick_dir, args.out_dir, parse(args.start), parse(args.end), args.workers, args.compact)
+
+
+if __name__ == "__main__":
+    main()
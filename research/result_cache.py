@@ -0,0 +1,250 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+from research import backtest
+from research.backtest import backtest_rule, list_bar_files, load_bar_arrays
+from utils.compaction import compacted_path, has_fresh_compacted
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "backtest")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_fingerprint(path: str, memo: Optional[dict] = None) -> str:
+    """
+    ファイル内容のSHA-256を返す。
+    memo を渡すと (サイズ, 更新時刻) が同じファイルはハッシュ計算を省略する。
+    """
+    st = os.stat(path)
+    stamp = [st.st_size, st.st_mtime_ns]
+    abs_path = os.path.abspath(path)
+
+    if memo is not None:
+        cached = memo.get(abs_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    value = digest.hexdigest()
+
+    if memo is not None:
+        memo[abs_path] = [stamp, value]
+    return value
+
+
+def strategy_code_version() -> str:
+    """
+    バックテストのロジック（research/backtest.py）のソースからバージョン文字列を作る。
+    ロジックを変更するとキャッシュは自動的に無効になる。
+    """
+    source = inspect.getsource(backtest)
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+class BacktestResultCache:
+    """
+    バックテスト結果をローカルディスクに保存する内容アドレス型キャッシュ。
+
+    キーは「入力ファイルのハッシュ + 戦略コードのバージョン + パラメータ」から作り、
+    合計サイズが max_bytes を超えたら最後に参照された時刻が古いものから削除する（LRU）。
+    合計サイズは最初の保存時に1回だけディレクトリを走査して求め、以後は保存のたびに足し込む
+    （上限を超えたときだけ走査し直す）。
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total = None          # エントリの合計サイズ（最初の put() で求める）
+        self._fingerprint_path = os.path.join(cache_dir, "fingerprints.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._fingerprints = self._load_fingerprints()
+
+    def _load_fingerprints(self) -> dict:
+        try:
+            with open(self._fingerprint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_fingerprints(self):
+        """ファイルハッシュのメモをディスクに保存する。"""
+        tmp_path = self._fingerprint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._fingerprints, f)
+        os.replace(tmp_path, self._fingerprint_path)
+
+    def fingerprint(self, path: str) -> str:
+        return file_fingerprint(path, self._fingerprints)
+
+    @staticmethod
+    def make_key(fingerprint: str, code_version: str, params: dict) -> str:
+        payload = json.dumps(
+            {"data": fingerprint, "code": code_version, "params": params},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        """キャッシュを参照し、あれば参照時刻を更新して返す。"""
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: dict):
+        """結果を保存し、サイズ上限を超えていれば古いものから削除する。"""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            old_size = os.path.getsize(path)   # 同じキーの上書き
+        except OSError:
+            old_size = 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total is None:
+                self._total = self.total_bytes()   # 今回の保存分も含まれる
+            else:
+                self._total += os.path.getsize(path) - old_size
+            over = self._total > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self) -> list:
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json") or name == "fingerprints.json":
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+        return entries
+
+    def evict(self):
+        """合計サイズが max_bytes 以下になるまで、参照時刻の古いエントリを削除する。"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        # 他のプロセスが同じディレクトリに書いた分もここで反映される
+        with self._lock:
+            self._total = total
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+
+def run_cached_backtest(bar_files: list[str], params: dict, cache: BacktestResultCache) -> dict:
+    """
+    1日（1ファイル）単位でキャッシュを使いながらバックテストを実行し、全期間の成績を返す。
+
+    変更のない日はキャッシュ済みの日次結果を再利用し、新しい日や内容が変わった日だけを再計算する。
+    キャッシュできるよう日次結果は互いに独立させており、全期間を1本の系列として計算する
+    research/param_sweep とは次の点で結果が異なる（同じパラメータでも一致しない）。
+    - 抵抗線・支持線は日ごとに初期化される（その日の最初の lookback 本の高値・安値から始まる）
+    - 日の最後の足で持っている建玉は持ち越さない（翌日の最初の足までの損益は数えない）
+    """
+    code_version = strategy_code_version()
+    daily = []
+
+    for path in bar_files:
+        # 実際に読まれるファイル（圧縮済みがあればそちら）の内容でキーを作る
+        source = compacted_path(path) if has_fresh_compacted(path) else path
+        key = cache.make_key(cache.fingerprint(source), code_version, params)
+        result = cache.get(key)
+        if result is None:
+            result = backtest_rule(load_bar_arrays([path]), **params)
+            result["file"] = os.path.basename(path)
+            cache.put(key, result)
+        daily.append(result)
+
+    cache.save_fingerprints()
+
+    if not daily:
+        return {"pnl": 0.0, "trades": 0, "max_drawdown": 0.0, "days": 0, "daily": []}
+
+    # 日をまたぐドローダウンは日次損益の累積から求め、日中の最大値と比べて大きい方を採用
+    daily_pnl = np.array([d["pnl"] for d in daily])
+    equity = np.cumsum(daily_pnl)
+    cross_day_dd = float((np.maximum.accumulate(np.maximum(equity, 0.0)) - equity).max())
+    intraday_dd = max(d["max_drawdown"] for d in daily)
+
+    return {
+        "pnl": float(equity[-1]),
+        "trades": int(sum(d["trades"] for d in daily)),
+        "max_drawdown": max(cross_day_dd, intraday_dd),
+        "days": len(daily),
+        "daily": daily,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="キャッシュ付きでバックテストを実行する")
+    parser.add_argument("--csv-dir", default="csv")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024))
+    parser.add_argument("--lookback", type=int, default=3)
+    parser.add_argument("--level-buffer", type=float, default=0.0)
+    parser.add_argument("--session", default="all")
+    parser.add_argument("--cost", type=float, default=0.0)
+    args = parser.parse_args()
+
+    cache = BacktestResultCache(args.cache_dir, max_bytes=args.max_mb * 1024 * 1024)
+    params = {
+        "lookback": args.lookback,
+        "level_buffer": args.level_buffer,
+        "session": args.session,
+        "cost": args.cost,
+    }
+    result = run_cached_backtest(list_bar_files(args.csv_dir), params, cache)
+    print(f"[INFO] 損益={result['pnl']} 取引回数={result['trades']} 最大DD={result['max_drawdown']} 日数={result['days']}")
+    print("[INFO] 日ごとに独立に計算した合計です（水準は日ごとに初期化し、建玉は翌日に持ち越しません）。"
+          "全期間を通して計算する research.param_sweep の結果とは一致しません")
+    print(f"[INFO] キャッシュ ヒット={cache.hits} ミス={cache.misses} サイズ={cache.total_bytes()}バイト")
+
+
+if __name__ == "__main__":
+    main()
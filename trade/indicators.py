@@ -0,0 +1,436 @@
+import argparse
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.market_types import Bar
+
+NAN = float("nan")
+
+# セッションの区切り（8:45〜17:00 が日中、17:00〜翌8:45 が夜間）
+SESSION_ORIGIN = 8 * 60 + 45
+DAY_SESSION_LENGTH = 17 * 60 - SESSION_ORIGIN
+
+
+def session_key(minute: int) -> int:
+    """epoch分からセッション番号（日中・夜間で1ずつ増える）を返す。"""
+    day, offset = divmod(minute - SESSION_ORIGIN, 24 * 60)
+    return day * 2 + (offset >= DAY_SESSION_LENGTH)
+
+
+def session_keys(minutes: np.ndarray) -> np.ndarray:
+    day, offset = np.divmod(minutes.astype(np.int64) - SESSION_ORIGIN, 24 * 60)
+    return day * 2 + (offset >= DAY_SESSION_LENGTH)
+
+
+class EMA:
+    """
+    指数移動平均。pandas の ewm(span=period, adjust=False) と同じ式・同じ演算順で更新する。
+    """
+    __slots__ = ("period", "alpha", "decay", "value")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.decay = 1.0 - self.alpha
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if self.value != self.value:  # 最初の値
+            self.value = x
+        else:
+            self.value = (self.decay * self.value + self.alpha * x) / (self.decay + self.alpha)
+        return self.value
+
+    @staticmethod
+    def batch(values: np.ndarray, period: int) -> np.ndarray:
+        return pd.Series(values).ewm(span=period, adjust=False).mean().to_numpy()
+
+
+class ATR:
+    """
+    Wilder の ATR。最初の period 本の真の値幅の単純平均を初期値とし、以降は 1/period で平滑化する。
+    """
+    __slots__ = ("period", "prev_close", "seed", "count", "smoother", "value")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close = None
+        self.seed = 0.0
+        self.count = 0
+        # Wilder の平滑化は alpha=1/period の EMA（span = 2*period-1）
+        self.smoother = EMA(2 * period - 1)
+        self.value = NAN
+
+    @staticmethod
+    def true_range(high: float, low: float, prev_close: Optional[float]) -> float:
+        if prev_close is None:
+            return high - low
+        return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+    def update(self, high: float, low: float, close: float) -> float:
+        tr = self.true_range(high, low, self.prev_close)
+        self.prev_close = close
+        self.count += 1
+        if self.count < self.period:
+            self.seed += tr
+        elif self.count == self.period:
+            self.seed += tr
+            self.value = self.smoother.update(self.seed / self.period)
+        else:
+            self.value = self.smoother.update(tr)
+        return self.value
+
+    @staticmethod
+    def batch(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+        n = len(close)
+        out = np.full(n, NAN)
+        if n < period:
+            return out
+        prev_close = np.concatenate(([np.nan], close[:-1]))
+        tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        # 初期値は逐次版と同じく先頭から順に足す
+        seeded = tr[period - 1:].copy()
+        seeded[0] = sum(tr[:period].tolist()) / period
+        out[period - 1:] = EMA.batch(seeded, 2 * period - 1)
+        return out
+
+
+class RollingRange:
+    """
+    直近 period 本の最高値・最安値（本数が足りない間はそれまでの全体）。単調キューで償却 O(1)。
+    """
+    __slots__ = ("period", "count", "highs", "lows", "high", "low")
+
+    def __init__(self, period: int = 20):
+        self.period = period
+        self.count = 0
+        self.highs = deque()  # (番号, 高値) 高値は降順
+        self.lows = deque()   # (番号, 安値) 安値は昇順
+        self.high = NAN
+        self.low = NAN
+
+    def update(self, high: float, low: float):
+        i = self.count
+        self.count += 1
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append((i, high))
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append((i, low))
+
+        start = i - self.period + 1
+        if self.highs[0][0] < start:
+            self.highs.popleft()
+        if self.lows[0][0] < start:
+            self.lows.popleft()
+        self.high = self.highs[0][1]
+        self.low = self.lows[0][1]
+        return self.high, self.low
+
+    @staticmethod
+    def batch(high: np.ndarray, low: np.ndarray, period: int = 20) -> tuple:
+        n = len(high)
+        highs = np.maximum.accumulate(high) if n else high.copy()
+        lows = np.minimum.accumulate(low) if n else low.copy()
+        if n >= period:
+            highs[period - 1:] = np.lib.stride_tricks.sliding_window_view(high, period).max(axis=1)
+            lows[period - 1:] = np.lib.stride_tricks.sliding_window_view(low, period).min(axis=1)
+        return highs, lows
+
+
+class Bollinger:
+    """
+    ボリンジャーバンド（母標準偏差）。
+
+    最初の値を基準 K とした (x-K) と (x-K)^2 の移動合計で平均と分散を求める（基準をずらすことで
+    価格の大きさによる桁落ちを避ける）。呼値の倍数の価格では合計が整数になり、丸め誤差は出ない。
+    合計の誤差が溜まらないよう、period 本ごとに窓の中身から合計を取り直す。
+    """
+    __slots__ = ("period", "k", "window", "base", "total", "total_sq", "since_resum", "mid", "upper", "lower")
+
+    def __init__(self, period: int = 20, k: float = 2.0):
+        self.period = period
+        self.k = k
+        self.window = deque()
+        self.base = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.since_resum = 0
+        self.mid = self.upper = self.lower = NAN
+
+    def update(self, x: float):
+        if self.base is None:
+            self.base = x
+        d = x - self.base
+        self.window.append(d)
+        self.total += d
+        self.total_sq += d * d
+        if len(self.window) > self.period:
+            old = self.window.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+        self.since_resum += 1
+        if self.since_resum >= self.period:
+            self.total = math.fsum(self.window)
+            self.total_sq = math.fsum(v * v for v in self.window)
+            self.since_resum = 0
+
+        if len(self.window) == self.period:
+            self.mid, self.upper, self.lower = self._bands(self.total, self.total_sq, self.period, self.base, self.k)
+        return self.mid, self.upper, self.lower
+
+    @staticmethod
+    def _bands(total: float, total_sq: float, n: int, base: float, k: float) -> tuple:
+        mean = total / n
+        std = math.sqrt(max(total_sq / n - mean * mean, 0.0))
+        mid = base + mean
+        return mid, mid + k * std, mid - k * std
+
+    @staticmethod
+    def batch(values: np.ndarray, period: int = 20, k: float = 2.0) -> tuple:
+        n = len(values)
+        mid = np.full(n, NAN)
+        upper = np.full(n, NAN)
+        lower = np.full(n, NAN)
+        if n < period:
+            return mid, upper, lower
+        base = values[0]
+        windows = np.lib.stride_tricks.sliding_window_view(values - base, period)
+        mean = windows.sum(axis=1) / period
+        std = np.sqrt(np.maximum((windows * windows).sum(axis=1) / period - mean * mean, 0.0))
+        mid[period - 1:] = base + mean
+        upper[period - 1:] = mid[period - 1:] + k * std
+        lower[period - 1:] = mid[period - 1:] - k * std
+        return mid, upper, lower
+
+
+class SessionVWAP:
+    """
+    セッション（日中・夜間）ごとの出来高加重平均。典型価格 (高値+安値+終値)/3 を使い、セッションの最初の足で初期化する。
+    1分足に出来高が記録されていないため、volume を渡さない場合は各足を同じ重み（1）で扱う。
+    """
+    __slots__ = ("session", "weighted", "volume", "value")
+
+    def __init__(self):
+        self.session = None
+        self.weighted = 0.0
+        self.volume = 0.0
+        self.value = NAN
+
+    def update(self, minute: int, high: float, low: float, close: float, volume: float = 1.0) -> float:
+        key = session_key(minute)
+        if key != self.session:
+            self.session = key
+            self.weighted = 0.0
+            self.volume = 0.0
+        # 3で割るのは最後に1回だけにして、呼値の倍数の価格なら合計を整数のまま保つ
+        self.weighted += (high + low + close) * volume
+        self.volume += volume
+        self.value = self.weighted / (3.0 * self.volume) if self.volume else NAN
+        return self.value
+
+    @staticmethod
+    def batch(minutes: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+              volume: Optional[np.ndarray] = None) -> np.ndarray:
+        if volume is None:
+            volume = np.ones(len(close))
+        keys = pd.Series(session_keys(minutes))
+        weighted = pd.Series((high + low + close) * volume).groupby(keys).cumsum().to_numpy()
+        total = pd.Series(volume, dtype=np.float64).groupby(keys).cumsum().to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return weighted / (3.0 * total)
+
+
+class IndicatorSnapshot:
+    """
+    ある足の確定時点の指標値。作った後は書き換えないので、別スレッドからそのまま参照してよい。
+    まだ計算できない値（本数不足）は NaN。
+    """
+    __slots__ = ("minute", "close", "ema_fast", "ema_slow", "atr", "vwap",
+                 "range_high", "range_low", "bb_mid", "bb_upper", "bb_lower", "bars")
+
+    def __init__(self, minute: int, close: float, ema_fast: float, ema_slow: float, atr: float, vwap: float,
+                 range_high: float, range_low: float, bb_mid: float, bb_upper: float, bb_lower: float, bars: int):
+        self.minute = minute
+        self.close = close
+        self.ema_fast = ema_fast
+        self.ema_slow = ema_slow
+        self.atr = atr
+        self.vwap = vwap
+        self.range_high = range_high
+        self.range_low = range_low
+        self.bb_mid = bb_mid
+        self.bb_upper = bb_upper
+        self.bb_lower = bb_lower
+        self.bars = bars
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        values = " ".join(f"{name}={getattr(self, name):.2f}" for name in self.__slots__[2:-1])
+        return f"IndicatorSnapshot(minute={self.minute} close={self.close} {values})"
+
+
+# batch() が返す列名（IndicatorSnapshot の属性と同じ）
+SNAPSHOT_FIELDS = IndicatorSnapshot.__slots__[1:-1]
+
+
+class IndicatorEngine:
+    """
+    PriceHandler.add_bar_listener に登録し、確定足ごとに各指標を O(1) で更新するクラス。
+
+    - snapshot は足ごとに新しい IndicatorSnapshot に置き換わる（受信スレッドを止めずに読める）
+    - ダミー足（補完した足）では更新しない。include_dummy=True なら実データと同じく扱う
+    - batch(bars) は research.backtest と同じ形式の配列から同じ指標をまとめて計算する。
+      値は on_bar を順に呼んだ場合と一致する（ダミー足の位置には直前の値が入る）
+    """
+
+    def __init__(self, ema_fast: int = 9, ema_slow: int = 21, atr_period: int = 14, range_period: int = 20,
+                 bb_period: int = 20, bb_k: float = 2.0, include_dummy: bool = False):
+        self.params = {
+            "ema_fast": ema_fast, "ema_slow": ema_slow, "atr_period": atr_period,
+            "range_period": range_period, "bb_period": bb_period, "bb_k": bb_k,
+        }
+        self.include_dummy = include_dummy
+        self._ema_fast = EMA(ema_fast)
+        self._ema_slow = EMA(ema_slow)
+        self._atr = ATR(atr_period)
+        self._range = RollingRange(range_period)
+        self._bollinger = Bollinger(bb_period, bb_k)
+        self._vwap = SessionVWAP()
+        self._bars = 0
+        self.snapshot: Optional[IndicatorSnapshot] = None
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """指標を更新するたびに listener(snapshot) を呼ぶ。"""
+        self._listeners.append(listener)
+
+    def on_bar(self, bar: Bar):
+        if bar.is_dummy and not self.include_dummy:
+            return
+        with self._lock:
+            snapshot = self.update(bar.minute, bar.high, bar.low, bar.close)
+        for listener in self._listeners:
+            listener(snapshot)
+
+    def update(self, minute: int, high: float, low: float, close: float) -> IndicatorSnapshot:
+        self._bars += 1
+        range_high, range_low = self._range.update(high, low)
+        bb_mid, bb_upper, bb_lower = self._bollinger.update(close)
+        self.snapshot = IndicatorSnapshot(
+            minute, close,
+            self._ema_fast.update(close),
+            self._ema_slow.update(close),
+            self._atr.update(high, low, close),
+            self._vwap.update(minute, high, low, close),
+            range_high, range_low, bb_mid, bb_upper, bb_lower, self._bars,
+        )
+        return self.snapshot
+
+    def batch(self, bars: dict) -> dict:
+        """
+        足の配列（time は epoch分、open/high/low/close/dummy）から全指標を計算し、列名 → 配列の辞書を返す。
+        """
+        p = self.params
+        n = len(bars["close"])
+        use = np.ones(n, dtype=np.bool_) if self.include_dummy else ~bars["dummy"]
+        minutes = bars["time"][use]
+        high, low, close = bars["high"][use], bars["low"][use], bars["close"][use]
+
+        range_high, range_low = RollingRange.batch(high, low, p["range_period"])
+        bb_mid, bb_upper, bb_lower = Bollinger.batch(close, p["bb_period"], p["bb_k"])
+        columns = {
+            "close": close,
+            "ema_fast": EMA.batch(close, p["ema_fast"]),
+            "ema_slow": EMA.batch(close, p["ema_slow"]),
+            "atr": ATR.batch(high, low, close, p["atr_period"]),
+            "vwap": SessionVWAP.batch(minutes, high, low, close),
+            "range_high": range_high,
+            "range_low": range_low,
+            "bb_mid": bb_mid,
+            "bb_upper": bb_upper,
+            "bb_lower": bb_lower,
+        }
+
+        # 使わなかった足（ダミー）の位置には直前の値を入れる
+        position = np.cumsum(use) - 1
+        valid = position >= 0
+        out = {}
+        for name, values in columns.items():
+            full = np.full(n, NAN)
+            full[valid] = values[position[valid]]
+            out[name] = full
+        return out
+
+
+def compare_with_batch(bars: dict, engine_kwargs: Optional[dict] = None) -> dict:
+    """
+    同じ足を逐次版（on_bar）と一括版（batch）で計算し、指標ごとの最大誤差と所要時間を返す。
+    """
+    engine_kwargs = engine_kwargs or {}
+    engine = IndicatorEngine(**engine_kwargs)
+    n = len(bars["close"])
+    streamed = {name: np.full(n, NAN) for name in SNAPSHOT_FIELDS}
+
+    started = time.perf_counter()
+    for i in range(n):
+        engine.on_bar(Bar(int(bars["time"][i]), float(bars["open"][i]), float(bars["high"][i]),
+                          float(bars["low"][i]), float(bars["close"][i]), bool(bars["dummy"][i])))
+        if engine.snapshot is not None:
+            for name in SNAPSHOT_FIELDS:
+                streamed[name][i] = getattr(engine.snapshot, name)
+    stream_sec = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = IndicatorEngine(**engine_kwargs).batch(bars)
+    batch_sec = time.perf_counter() - started
+
+    diffs = {}
+    for name in SNAPSHOT_FIELDS:
+        a, b = streamed[name], batched[name]
+        if not np.array_equal(np.isnan(a), np.isnan(b)):
+            diffs[name] = float("inf")
+            continue
+        both = ~np.isnan(a)
+        diffs[name] = float(np.max(np.abs(a[both] - b[both]))) if both.any() else 0.0
+    return {"bars": n, "stream_us_per_bar": stream_sec / max(n, 1) * 1e6, "batch_sec": batch_sec, "max_diff": diffs}
+
+
+def main():
+    from research.backtest import list_bar_files, load_bar_arrays
+
+    parser = argparse.ArgumentParser(description="指標の逐次計算と一括計算の一致と速度を確認する")
+    parser.add_argument("--csv-dir", default="csv")
+    parser.add_argument("--synthetic", type=int, default=0, help="CSVの代わりに指定本数の乱数の足を使う")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        close = 38000 + np.cumsum(rng.integers(-4, 5, args.synthetic)) * 5.0
+        spread = rng.integers(0, 4, args.synthetic) * 5.0
+        bars = {
+            "time": np.arange(args.synthetic, dtype=np.int64) + 29_000_000,
+            "open": close, "high": close + spread, "low": close - spread, "close": close,
+            "dummy": rng.random(args.synthetic) < 0.02,
+        }
+    else:
+        bars = load_bar_arrays(list_bar_files(args.csv_dir))
+
+    result = compare_with_batch(bars)
+    print(f"[INFO][indicators] {result['bars']}本 逐次={result['stream_us_per_bar']:.2f}µs/本 一括={result['batch_sec'] * 1000:.1f}ms")
+    for name, diff in result["max_diff"].items():
+        print(f"[INFO][indicators] {name:<10} 最大誤差={diff:.3g}")
+
+
+if __name__ == "__main__":
+    main()
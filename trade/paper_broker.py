@@ -0,0 +1,284 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from utils.market_types import Tick
+
+# 注文種別（buy_entry_market の OrdType と同じ定義）
+ORD_TYPE_MARKET = 1  # 成行
+ORD_TYPE_LIMIT = 2   # 指値
+ORD_TYPE_STOP = 3    # 逆指値
+
+# kabuステーションの FrontOrderType からの読み替え
+_FRONT_ORDER_TYPE_MAP = {120: ORD_TYPE_MARKET, 20: ORD_TYPE_LIMIT, 30: ORD_TYPE_STOP}
+
+SIDE_BUY = 1
+SIDE_SELL = 2
+
+
+class PaperOrder:
+    """
+    ペーパートレード用の注文1件。
+    """
+    __slots__ = ("order_id", "symbol", "side", "qty", "ord_type", "price", "trigger_price",
+                 "active_at", "active_tick", "state", "fill_price", "fill_time", "payload")
+
+    def __init__(self, order_id: str, payload: dict, active_at: float):
+        self.order_id = order_id
+        self.payload = payload
+        self.symbol = payload.get("Symbol")
+        self.side = int(payload.get("Side", SIDE_BUY))
+        self.qty = int(payload.get("Qty", 0))
+
+        ord_type = payload.get("OrdType")
+        if ord_type is None:
+            ord_type = _FRONT_ORDER_TYPE_MAP.get(payload.get("FrontOrderType"), ORD_TYPE_MARKET)
+        self.ord_type = int(ord_type)
+
+        self.price = float(payload.get("Price") or 0)
+        trigger = payload.get("TriggerPrice")
+        if trigger is None:
+            trigger = (payload.get("ReverseLimitOrder") or {}).get("TriggerPrice")
+        self.trigger_price = float(trigger) if trigger is not None else None
+
+        self.active_at = active_at
+        self.active_tick = None      # 板に載った直後に照合するティックの番号（tick_count）
+        self.state = "pending"
+        self.fill_price = None
+        self.fill_time = None
+
+    def to_dict(self) -> dict:
+        return {
+            "Id": self.order_id,
+            "Symbol": self.symbol,
+            "Side": self.side,
+            "OrderQty": self.qty,
+            "OrdType": self.ord_type,
+            "Price": self.price,
+            "TriggerPrice": self.trigger_price,
+            "State": self.state,
+            "FillPrice": self.fill_price,
+            "FillTime": self.fill_time,
+        }
+
+
+class PaperTradingEngine:
+    """
+    ライブのティックで約定させるローカルの疑似取引所。
+
+    - send_order() は buy_entry_market と同じ形の payload を受け付ける（成行・指値・逆指値）
+    - on_tick() は PriceHandler から呼ばれ、キューに積むだけで即座に戻る
+    - 照合はバックグラウンドスレッドで行い、受信処理の経路を遅らせない
+    - latency_ms 経過後に到着したティックから約定対象になり、成行・逆指値は slippage_ticks 分不利に約定する
+    """
+
+    def __init__(self, latency_ms: float = 0.0, slippage_ticks: int = 0,
+                 tick_size: float = 5.0, multiplier: int = 100):
+        self.latency = latency_ms / 1000.0
+        self.slippage = slippage_ticks * tick_size
+        self.multiplier = multiplier
+
+        self._ticks = deque()
+        self._inbox = deque()
+        self._cancels = deque()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+
+        # 待機中の注文（価格順のヒープ）
+        self._waiting = deque()       # レイテンシ待ちの注文
+        self._market = deque()
+        self._buy_limits = []         # (-price, seq, order)
+        self._sell_limits = []        # (price, seq, order)
+        self._buy_stops = []          # (trigger, seq, order)
+        self._sell_stops = []         # (-trigger, seq, order)
+
+        self.orders = {}
+        self.fills = []
+        self.position = 0
+        self.avg_price = 0.0
+        self.realized_pnl = 0.0
+        self.last_price = None
+        self.last_timestamp = None
+        self.tick_count = 0
+
+    # ===== 外部インターフェース =====
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+        print(f"[PAPER] 停止: 建玉={self.position} 実現損益={self.realized_pnl} 評価損益={self.unrealized_pnl()}")
+
+    def on_tick(self, tick: Tick):
+        """PriceHandler のティックリスナー。キューに積むだけで照合はしない。"""
+        self._ticks.append((tick.price, tick.timestamp, time.monotonic()))
+        self._wakeup.set()
+
+    def send_order(self, payload: dict) -> dict:
+        """注文を受け付け、kabuステーションと同じ形の応答を返す。"""
+        order_id = f"PAPER{next(self._ids):08d}"
+        order = PaperOrder(order_id, payload, time.monotonic() + self.latency)
+        if order.qty <= 0:
+            return {"Result": 1, "OrderId": None, "Message": "数量が不正です"}
+
+        with self._lock:
+            self.orders[order_id] = order
+        self._inbox.append(order)
+        self._wakeup.set()
+        return {"Result": 0, "OrderId": order_id}
+
+    def cancel_order(self, order_id: str) -> bool:
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None or order.state not in ("pending", "working"):
+                return False
+            order.state = "cancelled"
+        return True
+
+    def unrealized_pnl(self) -> float:
+        if self.position == 0 or self.last_price is None:
+            return 0.0
+        return (self.last_price - self.avg_price) * self.position * self.multiplier
+
+    def get_positions(self) -> dict:
+        with self._lock:
+            return {
+                "Position": self.position,
+                "AvgPrice": self.avg_price,
+                "RealizedPnL": self.realized_pnl,
+                "UnrealizedPnL": self.unrealized_pnl(),
+                "LastPrice": self.last_price,
+            }
+
+    def get_orders(self) -> list:
+        with self._lock:
+            return [o.to_dict() for o in self.orders.values()]
+
+    # ===== 照合処理 =====
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait(0.1)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        while self._inbox:
+            order = self._inbox.popleft()
+            if order.state == "pending":
+                self._waiting.append(order)
+
+        while self._ticks:
+            price, timestamp, arrived = self._ticks.popleft()
+            self._activate(arrived)
+            self._match(price, timestamp)
+
+    def _activate(self, now: float):
+        # レイテンシを経過した注文だけを板に載せる（受付順なので先頭から判定すればよい）
+        while self._waiting and self._waiting[0].active_at <= now:
+            order = self._waiting.popleft()
+            if order.state != "pending":
+                continue
+            order.state = "working"
+            order.active_tick = self.tick_count + 1   # この直後の _match() で数えるティック
+            seq = next(self._seq)
+            if order.ord_type == ORD_TYPE_LIMIT:
+                if order.side == SIDE_BUY:
+                    heapq.heappush(self._buy_limits, (-order.price, seq, order))
+                else:
+                    heapq.heappush(self._sell_limits, (order.price, seq, order))
+            elif order.ord_type == ORD_TYPE_STOP and order.trigger_price is not None:
+                if order.side == SIDE_BUY:
+                    heapq.heappush(self._buy_stops, (order.trigger_price, seq, order))
+                else:
+                    heapq.heappush(self._sell_stops, (-order.trigger_price, seq, order))
+            else:
+                self._market.append(order)
+
+    def _match(self, price: float, timestamp: datetime):
+        self.last_price = price
+        self.last_timestamp = timestamp
+        self.tick_count += 1
+
+        while self._market:
+            order = self._market.popleft()
+            self._fill(order, self._slipped(price, order.side), timestamp)
+
+        while self._buy_limits and self._buy_limits[0][2].state != "working":
+            heapq.heappop(self._buy_limits)
+        while self._buy_limits and price <= -self._buy_limits[0][0]:
+            _, _, order = heapq.heappop(self._buy_limits)
+            self._fill(order, self._limit_fill_price(order, price), timestamp)
+
+        while self._sell_limits and self._sell_limits[0][2].state != "working":
+            heapq.heappop(self._sell_limits)
+        while self._sell_limits and price >= self._sell_limits[0][0]:
+            _, _, order = heapq.heappop(self._sell_limits)
+            self._fill(order, self._limit_fill_price(order, price), timestamp)
+
+        while self._buy_stops and price >= self._buy_stops[0][0]:
+            _, _, order = heapq.heappop(self._buy_stops)
+            self._fill(order, self._slipped(price, order.side), timestamp)
+
+        while self._sell_stops and price <= -self._sell_stops[0][0]:
+            _, _, order = heapq.heappop(self._sell_stops)
+            self._fill(order, self._slipped(price, order.side), timestamp)
+
+    def _limit_fill_price(self, order: PaperOrder, price: float) -> float:
+        """
+        指値の約定価格。板に載っていた指値（前のティックまでに約定しなかったもの）は、
+        価格が指値を越えても指値で約定する（取引所でも待っている指値は指値でしか約定しない）。
+        板に載った直後のティックですでに指値を越えていれば、成行と同じくそのティックの価格で約定する。
+        """
+        return price if order.active_tick == self.tick_count else order.price
+
+    def _slipped(self, price: float, side: int) -> float:
+        return price + self.slippage if side == SIDE_BUY else price - self.slippage
+
+    def _fill(self, order: PaperOrder, fill_price: float, timestamp: datetime):
+        with self._lock:
+            if order.state != "working":
+                return
+            order.state = "filled"
+            order.fill_price = fill_price
+            order.fill_time = timestamp
+
+            signed_qty = order.qty if order.side == SIDE_BUY else -order.qty
+            self._apply_fill(signed_qty, fill_price)
+            self.fills.append((order.order_id, timestamp, order.side, order.qty, fill_price))
+
+    def _apply_fill(self, signed_qty: int, fill_price: float):
+        position = self.position
+        if position == 0 or (position > 0) == (signed_qty > 0):
+            # 新規・買い増し（売り増し）→ 平均建値を更新
+            new_position = position + signed_qty
+            self.avg_price = (self.avg_price * abs(position) + fill_price * abs(signed_qty)) / abs(new_position)
+            self.position = new_position
+            return
+
+        # 反対売買 → 決済分の損益を確定
+        closed = min(abs(position), abs(signed_qty))
+        direction = 1 if position > 0 else -1
+        self.realized_pnl += (fill_price - self.avg_price) * closed * direction * self.multiplier
+
+        new_position = position + signed_qty
+        if new_position == 0:
+            self.avg_price = 0.0
+        elif (new_position > 0) != (position > 0):
+            # ドテン → 残りは新規建玉
+            self.avg_price = fill_price
+        self.position = new_position
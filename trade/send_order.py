@@ -1,24 +1,35 @@
 from datetime import datetime
+from utils.contract_calendar import get_contract_calendar
+from utils.future_info_util import send_order
 from utils.symbol_resolver import get_active_term, get_symbol_code
 
 class Order:
-    def __init__(self, token):
+    def __init__(self, token, sender=None):
         self.token = token  # APIトークンを保持
+        self.sender = sender  # 注文の送信先（PaperTradingEngine.send_order など）
         self._cached_term = None  # 限月コードのキャッシュ
         self._cached_symbol = None  # 銘柄コードのキャッシュ
+        self._cached_until = None  # キャッシュを使える期限（次の限月の切り替わり）
 
     def _send_order(self, payload):
         # 実際のAPI送信処理（共通化）
         print(f"Sending order with payload: {payload}")
-        # API呼び出しの処理をここで実装
+        if self.sender is not None:
+            return self.sender(payload)
+        # 送信先の指定が無ければ kabuステーションAPI に送る（送信後に建玉・注文キャッシュも破棄される）
+        return send_order(payload, self.token)
     
     def _get_cached_symbol(self):
-        # 限月コードがキャッシュされているか確認
+        # 限月が次に切り替わる日時までは、限月を計算し直さずにキャッシュを使う
         now = datetime.now()
+        if self._cached_symbol and self._cached_until is not None and now < self._cached_until:
+            return self._cached_symbol
+
         active_term = get_active_term(now)
-        
-        if self._cached_term != active_term:
-            # 限月コードが変更された場合、再取得
+        self._cached_until = get_contract_calendar().next_change(now)
+
+        if self._cached_term != active_term or not self._cached_symbol:
+            # 限月コードが変更された場合、再取得（銘柄コードはファイルにもキャッシュされる）
             self._cached_term = active_term
             self._cached_symbol = get_symbol_code(active_term, self.token)
             if not self._cached_symbol:
@@ -46,4 +57,4 @@ class Order:
         }
 
         # 注文送信
-        self._send_order(payload)
\ No newline at end of file
+        return self._send_order(payload)
\ No newline at end of file
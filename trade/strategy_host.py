@@ -0,0 +1,212 @@
+import importlib
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.archive_catalog import OHLC_COLUMNS
+from utils.market_types import Bar
+
+DEFAULT_DEADLINE_MS = 200
+DEFAULT_WINDOW = 3          # 戦略に渡す直近の足の本数（README の on_new_minute(df) と同じ3分）
+LATENCY_SAMPLES = 1000      # パーセンタイル計算に使う直近のサンプル数
+
+
+class StrategyStats:
+    """
+    戦略ごとの判断レイテンシと、期限超過・スキップ・エラーの回数を集計するクラス。
+    レイテンシは投入から結果が返るまで（キュー待ち・受け渡しを含み、期限と同じ物差し）、
+    compute は on_new_minute の中で費やした時間。
+    """
+    __slots__ = ("calls", "deadline_misses", "skipped", "errors", "latencies", "max", "compute")
+
+    def __init__(self):
+        self.calls = 0
+        self.deadline_misses = 0
+        self.skipped = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.max = 0.0
+        self.compute = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, elapsed: float, compute: float):
+        self.calls += 1
+        self.latencies.append(elapsed)
+        self.max = max(self.max, elapsed)
+        self.compute.append(compute)
+
+    def to_dict(self) -> dict:
+        samples = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        compute = np.array(self.compute) * 1000 if self.compute else np.zeros(1)
+        return {
+            "calls": self.calls,
+            "deadline_misses": self.deadline_misses,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p99_ms": float(np.percentile(samples, 99)),
+            "max_ms": self.max * 1000,
+            "compute_p50_ms": float(np.percentile(compute, 50)),
+            "compute_p99_ms": float(np.percentile(compute, 99)),
+        }
+
+
+# プロセスプール用：ワーカー側で読み込んだ戦略モジュール
+_worker_modules = {}
+
+
+def _call_in_worker(module_name: str, df: pd.DataFrame):
+    module = _worker_modules.get(module_name)
+    if module is None:
+        module = _worker_modules[module_name] = importlib.import_module(module_name)
+    started = time.perf_counter()
+    decision = module.on_new_minute(df)
+    return decision, time.perf_counter() - started
+
+
+def _call_in_thread(func: Callable, df: pd.DataFrame):
+    started = time.perf_counter()
+    decision = func(df)
+    return decision, time.perf_counter() - started
+
+
+class StrategyHost:
+    """
+    複数の戦略モジュールに確定足を並列で配り、戦略ごとに期限とレイテンシを管理するクラス。
+
+    - 戦略モジュールは on_new_minute(df) を定義する（df は直近 window 本の足。列はCSVと同じ）
+    - on_bar() は PriceHandler.add_bar_listener に登録する。受信スレッドではキューに積むだけで、
+      配信は専用スレッドからスレッド（またはプロセス）プールに投げる
+    - deadline_ms 以内に返らなかった判断は破棄して期限超過として数える。
+      前回の呼び出しが終わっていない戦略にはその足を渡さずスキップするため、遅い戦略が
+      他の戦略や記録処理を待たせることはない
+    - on_decision(name, bar_time, decision) を渡すと、期限内に返った判断（None 以外）を受け取れる
+    """
+
+    def __init__(self, modules: list, deadline_ms: float = DEFAULT_DEADLINE_MS, window: int = DEFAULT_WINDOW,
+                 executor: str = "thread", on_decision: Optional[Callable] = None):
+        self.deadline = deadline_ms / 1000.0
+        self.window = window
+        self.on_decision = on_decision
+        self.executor_kind = executor
+
+        self.strategies = {}
+        for name in modules:
+            module = importlib.import_module(name)
+            if not hasattr(module, "on_new_minute"):
+                raise ValueError(f"戦略モジュール {name} に on_new_minute(df) がありません")
+            self.strategies[name] = module.on_new_minute
+        self.stats = {name: StrategyStats() for name in self.strategies}
+
+        workers = max(len(self.strategies), 1)
+        if executor == "process":
+            self.pool = ProcessPoolExecutor(max_workers=workers)
+        elif executor == "thread":
+            self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Strategy")
+        else:
+            raise ValueError(f"未知の executor です: {executor}")
+
+        self._bars = deque(maxlen=window)
+        self._events = queue.Queue()
+        self._running = {}          # 戦略名 → 実行中の Future
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._dispatch_loop, name="StrategyHost", daemon=True)
+        self._thread.start()
+        print(f"[INFO][strategy] {len(self.strategies)}個の戦略を起動: {', '.join(self.strategies)} "
+              f"（{self.executor_kind} 期限={self.deadline * 1000:.0f}ms）")
+
+    def on_bar(self, bar: Bar):
+        """確定足を受け取る（記録処理を止めないよう、キューに積むだけ）。"""
+        self._events.put(bar.copy())
+
+    def _frame(self) -> pd.DataFrame:
+        rows = [[
+            bar.time, bar.open, bar.high, bar.low, bar.close,
+            "dummy" if bar.is_dummy else "real", bar.contract_month
+        ] for bar in self._bars]
+        return pd.DataFrame(rows, columns=OHLC_COLUMNS)
+
+    def _dispatch_loop(self):
+        while True:
+            bar = self._events.get()
+            if bar is None:
+                return
+            self._bars.append(bar)
+            if len(self._bars) < self.window:
+                continue
+            self._dispatch(bar.time, self._frame())
+
+    def _dispatch(self, bar_time, df: pd.DataFrame):
+        submitted = {}
+        for name, func in self.strategies.items():
+            running = self._running.get(name)
+            if running is not None and not running.done():
+                self.stats[name].skipped += 1
+                continue
+            started = time.perf_counter()
+            if self.executor_kind == "process":
+                future = self.pool.submit(_call_in_worker, func.__module__, df)
+            else:
+                future = self.pool.submit(_call_in_thread, func, df)
+            # 結果が返った時点で投入からの時間を記録する（期限内・期限超過とも同じ経路）
+            future.add_done_callback(lambda f, name=name, started=started: self._record_result(name, f, started))
+            self._running[name] = future
+            submitted[future] = name
+
+        if not submitted:
+            return
+
+        done, not_done = wait(submitted, timeout=self.deadline)
+        for future in not_done:
+            name = submitted[future]
+            self.stats[name].deadline_misses += 1
+            print(f"[WARN][strategy] {name}: {bar_time} の判断が期限（{self.deadline * 1000:.0f}ms）を超えました")
+            # レイテンシは終わった時点で _record_result が記録する（判断は使わない）
+
+        for future in done:
+            name = submitted[future]
+            try:
+                decision, _ = future.result()
+            except Exception as e:
+                print(f"[ERROR][strategy] {name}: {bar_time} で例外 → {e}")
+                continue
+            if decision is not None and self.on_decision is not None:
+                self.on_decision(name, bar_time, decision)
+
+    def _record_result(self, name: str, future, started: float):
+        """
+        Future の完了時に呼ばれ、投入から結果が返るまでの時間を記録する。
+        _dispatch の wait() が返った時刻で測ると、先に終わった戦略にも遅い戦略の待ち時間が乗るため、ここで測る。
+        """
+        elapsed = time.perf_counter() - started
+        if future.cancelled():
+            return
+        try:
+            _, compute = future.result()
+        except Exception:
+            self.stats[name].errors += 1
+            return
+        self.stats[name].add(elapsed, compute)
+
+    def get_stats(self) -> dict:
+        return {name: s.to_dict() for name, s in self.stats.items()}
+
+    def print_stats(self):
+        for name, s in self.get_stats().items():
+            print(f"[INFO][strategy] {name}: 回数={s['calls']} 期限超過={s['deadline_misses']} "
+                  f"スキップ={s['skipped']} エラー={s['errors']} "
+                  f"p50={s['p50_ms']:.1f}ms p99={s['p99_ms']:.1f}ms 最大={s['max_ms']:.1f}ms "
+                  f"（うち計算 p50={s['compute_p50_ms']:.1f}ms p99={s['compute_p99_ms']:.1f}ms）")
+
+    def stop(self):
+        self._events.put(None)
+        if self._thread:
+            self._thread.join(timeout=self.deadline + 1.0)
+        self.pool.shutdown(wait=False, cancel_futures=True)
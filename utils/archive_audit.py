@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.compaction import list_ohlc_days, read_ohlc_file
+from utils.time_util import from_minute, get_trade_date, is_market_closed, to_minute
+
+MAX_LISTED = 10   # レポートに並べる時刻・区間の最大件数
+
+
+def _session_open(t: datetime) -> bool:
+    """
+    t が立会中の分か（time_util の無音時間を除き、平日に始まるセッションのみ）。
+    夜間の 0:00〜6:00 は前日17:00に始まったセッションとして扱う。
+    """
+    if is_market_closed(t):
+        return False
+    start_day = t.date() - timedelta(days=1) if t.hour < 8 else t.date()
+    return start_day.weekday() < 5
+
+
+@lru_cache(maxsize=7)
+def _expected_offsets(weekday: int) -> np.ndarray:
+    """
+    取引日の0:00を基準にした、その取引日のファイルに入るはずの分（相対分の配列）。
+    曜日ごとに同じ並びになるので、基準日（1970年1月の同じ曜日）で一度だけ time_util の判定を回す。
+    """
+    base = date(1970, 1, 5) + timedelta(days=weekday)  # 1970/1/5 は月曜
+    origin = datetime.combine(base, datetime.min.time())
+    offsets = []
+    # 取引日のファイルには最大で3日前の夜間（週末をまたぐ場合）から翌日の6:00までが入りうる
+    for offset in range(-3 * 24 * 60, 2 * 24 * 60):
+        t = origin + timedelta(minutes=offset)
+        if _session_open(t) and get_trade_date(t) == base:
+            offsets.append(offset)
+    return np.array(offsets, dtype=np.int64)
+
+
+def expected_minutes(trade_date: date) -> np.ndarray:
+    """取引日のファイルに記録されるべき分（epoch分）を時刻順に返す。"""
+    origin = to_minute(datetime.combine(trade_date, datetime.min.time()))
+    return _expected_offsets(trade_date.weekday()) + origin
+
+
+def _runs(minutes: np.ndarray) -> list:
+    """連続した分をまとめて [(開始, 終了, 本数)] にする。"""
+    if len(minutes) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(minutes) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(minutes)])) - 1
+    return [(int(minutes[s]), int(minutes[e]), int(e - s + 1)) for s, e in zip(starts, ends)]
+
+
+def _format_runs(runs: list) -> list:
+    return [f"{from_minute(s):%m/%d %H:%M}〜{from_minute(e):%H:%M}（{n}分）" for s, e, n in runs[:MAX_LISTED]]
+
+
+def scan_day(trade_date: date, path: str) -> dict:
+    """
+    1日分の1分足ファイルを検査する（ファイルの行の順序のまま判定する）。
+
+    - missing   : 立会時間の分のうち行が無いもの（セッション丸ごと無い場合は missing_sessions に数える）
+    - duplicates: 同じ時刻の行が2行目以降にあるもの
+    - unordered : 直前の行より古い時刻の行
+    - unexpected: 立会時間外、または別の取引日に属する時刻の行
+    - ohlc_errors: 高値 < max(始値,終値)、安値 > min(始値,終値)、高値 < 安値、0以下や欠損の価格
+    """
+    started = time.perf_counter()
+    try:
+        df = read_ohlc_file(path)
+    except Exception as e:
+        return {"trade_date": trade_date.isoformat(), "path": path, "error": str(e)}
+
+    times = pd.to_datetime(df["Time"]).values.astype("datetime64[m]").astype(np.int64)
+    o = df["Open"].to_numpy(dtype=np.float64)
+    h = df["High"].to_numpy(dtype=np.float64)
+    lo = df["Low"].to_numpy(dtype=np.float64)
+    c = df["Close"].to_numpy(dtype=np.float64)
+    dummy = (df["Dummy"].astype(str) == "dummy").to_numpy()
+    rows = len(times)
+
+    expected = expected_minutes(trade_date)
+    unique, counts = np.unique(times, return_counts=True)
+    duplicated = unique[counts > 1]
+    unordered = np.flatnonzero(np.diff(times) < 0) + 1
+    unexpected = np.setdiff1d(unique, expected, assume_unique=True)
+    missing = np.setdiff1d(expected, unique, assume_unique=True)
+
+    # 丸ごと欠けたセッション（休日や未起動）と、セッション途中の欠けを分ける
+    missing_runs = _runs(missing)
+    session_runs = _runs(expected)
+    whole = {(s, e) for s, e, _ in session_runs}
+    missing_sessions = [r for r in missing_runs if (r[0], r[1]) in whole]
+    gaps = [r for r in missing_runs if (r[0], r[1]) not in whole]
+
+    with np.errstate(invalid="ignore"):
+        bad = (
+            (h < np.maximum(o, c)) | (lo > np.minimum(o, c)) | (h < lo)
+            | ~np.isfinite(o) | ~np.isfinite(h) | ~np.isfinite(lo) | ~np.isfinite(c)
+            | (np.minimum(np.minimum(o, h), np.minimum(lo, c)) <= 0)
+        )
+    dummy_runs = _runs(np.sort(np.unique(times[dummy])))
+
+    return {
+        "trade_date": trade_date.isoformat(),
+        "path": path,
+        "rows": rows,
+        "expected": len(expected),
+        "missing": int(sum(n for _, _, n in gaps)),
+        "missing_sessions": len(missing_sessions),
+        "missing_ranges": _format_runs(gaps),
+        "duplicates": int((counts[counts > 1] - 1).sum()),
+        "duplicate_times": [f"{from_minute(int(m)):%m/%d %H:%M}" for m in duplicated[:MAX_LISTED]],
+        "unordered": len(unordered),
+        "unordered_rows": [int(i) + 2 for i in unordered[:MAX_LISTED]],  # ヘッダを1行目とした行番号
+        "unexpected": len(unexpected),
+        "unexpected_times": [f"{from_minute(int(m)):%m/%d %H:%M}" for m in unexpected[:MAX_LISTED]],
+        "ohlc_errors": int(bad.sum()),
+        "ohlc_error_rows": [int(i) + 2 for i in np.flatnonzero(bad)[:MAX_LISTED]],
+        "dummy_ratio": float(dummy.mean()) if rows else 0.0,
+        "longest_dummy_run": max((n for _, _, n in dummy_runs), default=0),
+        "elapsed_ms": (time.perf_counter() - started) * 1000,
+    }
+
+
+def _scan_item(item: tuple) -> dict:
+    return scan_day(*item)
+
+
+def is_clean(result: dict) -> bool:
+    return ("error" not in result and not result["missing"] and not result["duplicates"]
+            and not result["unordered"] and not result["unexpected"] and not result["ohlc_errors"])
+
+
+def audit_archive(base_dir: str = "csv", start: date = None, end: date = None, workers: int = None) -> list:
+    """
+    base_dir の1分足ファイルを取引日ごとに検査し、日付順の結果のリストを返す。
+    複数日ある場合はプロセスプールで並列に検査する（workers=1 なら同じプロセスで順に）。
+    """
+    items = [(d, p) for d, p in list_ohlc_days(base_dir).items()
+             if (start is None or d >= start) and (end is None or d <= end)]
+    if not items:
+        return []
+    workers = workers or min(len(items), os.cpu_count() or 1)
+    if workers <= 1 or len(items) == 1:
+        return [scan_day(d, p) for d, p in items]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_scan_item, items, chunksize=max(1, len(items) // (workers * 4))))
+
+
+def print_report(results: list, verbose: bool = False):
+    problems = 0
+    for r in results:
+        if "error" in r:
+            problems += 1
+            print(f"[ERROR][audit] {r['trade_date']}: 読み込み失敗 → {r['error']}")
+            continue
+        clean = is_clean(r)
+        problems += not clean
+        # セッション丸ごとの欠けは休日の可能性があるため、問題には数えずに表示だけする
+        if clean and not r["missing_sessions"] and not verbose:
+            continue
+        tag = "[INFO]" if clean else "[WARN]"
+        print(f"{tag}[audit] {r['trade_date']}: 行={r['rows']}/{r['expected']} 欠損={r['missing']}分 "
+              f"欠損セッション={r['missing_sessions']} 重複={r['duplicates']} 逆順={r['unordered']} "
+              f"時間外={r['unexpected']} OHLC不整合={r['ohlc_errors']} "
+              f"ダミー率={r['dummy_ratio']:.1%}（最長{r['longest_dummy_run']}分）")
+        for label, key in (("欠損", "missing_ranges"), ("重複", "duplicate_times"), ("逆順の行", "unordered_rows"),
+                           ("時間外", "unexpected_times"), ("OHLC不整合の行", "ohlc_error_rows")):
+            if r[key]:
+                print(f"        {label}: {', '.join(map(str, r[key]))}")
+    total_rows = sum(r.get("rows", 0) for r in results)
+    print(f"[INFO][audit] {len(results)}日 {total_rows}行を検査 問題のある日={problems}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="1分足アーカイブの欠損・重複・順序・OHLC整合性を検査する")
+    parser.add_argument("--csv-dir", default="csv")
+    parser.add_argument("--start", help="YYYYMMDD")
+    parser.add_argument("--end", help="YYYYMMDD")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", help="結果をJSONで保存するパス")
+    parser.add_argument("--verbose", action="store_true", help="問題のない日も表示する")
+    args = parser.parse_args()
+
+    parse = lambda s: datetime.strptime(s, "%Y%m%d").date() if s else None
+    started = time.perf_counter()
+    results = audit_archive(args.csv_dir, parse(args.start), parse(args.end), args.workers)
+    print_report(results, args.verbose)
+    print(f"[INFO][audit] 所要時間 {time.perf_counter() - started:.2f}秒")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
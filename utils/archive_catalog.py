@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from utils.time_util import from_minute, get_trade_date, to_minute
+from utils.compaction import COMPACT_EXT, compacted_path, has_fresh_compacted
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+OHLC_SUFFIX = "_nikkei_mini_future.csv"
+OHLC_COLUMNS = ["Time", "Open", "High", "Low", "Close", "Dummy", "ContractMonth"]
+INDEX_DIR = ".catalog"
+INDEX_EVERY = 60  # 何行ごとに時刻→バイト位置の目印を残すか
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def parse_minute(text: str) -> int:
+    """
+    OHLCWriter の時刻文字列（YYYY/MM/DD HH:MM:SS）を epoch分に変換する。
+    固定幅の場合は文字列のスライスだけで変換し、それ以外は datetime で解釈する。
+    """
+    if len(text) == 19 and text[4] == "/" and text[13] == ":":
+        d = date(int(text[0:4]), int(text[5:7]), int(text[8:10]))
+        return (d.toordinal() - _EPOCH_ORDINAL) * 1440 + int(text[11:13]) * 60 + int(text[14:16])
+    return to_minute(pd.to_datetime(text).to_pydatetime())
+
+
+class _FileIndex:
+    """
+    1ファイル分の疎な索引（INDEX_EVERY 行ごとの 時刻→バイト位置）。
+    """
+    __slots__ = ("path", "size", "rows", "marks_time", "marks_offset", "first", "last", "dirty")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = 0
+        self.rows = 0
+        self.marks_time = []
+        self.marks_offset = []
+        self.first = None
+        self.last = None
+        self.dirty = False
+
+    def add_row(self, minute: int, offset: int, end_offset: int):
+        if self.rows % INDEX_EVERY == 0:
+            self.marks_time.append(minute)
+            self.marks_offset.append(offset)
+        if self.first is None:
+            self.first = minute
+        self.last = minute if self.last is None else max(self.last, minute)
+        self.rows += 1
+        self.size = end_offset
+        self.dirty = True
+
+    def seek_offset(self, minute: int) -> Optional[int]:
+        """minute 以前から読み始められる最も後ろのバイト位置を返す。"""
+        if not self.marks_offset:
+            return None
+        pos = bisect.bisect_right(self.marks_time, minute) - 1
+        return self.marks_offset[max(pos, 0)]
+
+    def to_dict(self) -> dict:
+        return {
+            "size": self.size, "rows": self.rows, "first": self.first, "last": self.last,
+            "marks_time": self.marks_time, "marks_offset": self.marks_offset,
+        }
+
+    @classmethod
+    def from_dict(cls, path: str, data: dict) -> "_FileIndex":
+        index = cls(path)
+        index.size = data["size"]
+        index.rows = data["rows"]
+        index.first = data["first"]
+        index.last = data["last"]
+        index.marks_time = data["marks_time"]
+        index.marks_offset = data["marks_offset"]
+        return index
+
+
+class ArchiveCatalog:
+    """
+    取引日→1分足CSVファイルの対応と、ファイルごとの疎な時刻索引を管理するクラス。
+
+    - OHLCWriter が追記するたびに record() で索引を伸ばす（別プロセスの追記分は refresh() で差分だけ読む）
+    - 索引は <base_dir>/.catalog/ に保存し、次回起動時は追記分だけを走査する
+    - query(start, end, timeframe) は必要な範囲のバイトだけを読んで返す
+    """
+
+    def __init__(self, base_dir: str = "csv"):
+        self.base_dir = base_dir
+        self.index_dir = os.path.join(base_dir, INDEX_DIR)
+        self.files = {}    # trade_date(date) -> path
+        self.indexes = {}  # path -> _FileIndex
+        self._lock = threading.RLock()
+        self.refresh()
+
+    # ===== 索引の構築 =====
+
+    def _index_path(self, path: str) -> str:
+        return os.path.join(self.index_dir, os.path.basename(path) + ".json")
+
+    def _load_index(self, path: str) -> _FileIndex:
+        try:
+            with open(self._index_path(path), "r", encoding="utf-8") as f:
+                return _FileIndex.from_dict(path, json.load(f))
+        except (OSError, ValueError, KeyError):
+            return _FileIndex(path)
+
+    def refresh(self):
+        """ディレクトリの新しいファイルと、既存ファイルの追記分を索引に取り込む。"""
+        if not os.path.isdir(self.base_dir):
+            return
+        with self._lock:
+            for fname in os.listdir(self.base_dir):
+                if fname.endswith(COMPACT_EXT):
+                    fname = fname[:-len(COMPACT_EXT)] + ".csv"  # 圧縮済みの日もCSVのパスで管理する
+                if not fname.endswith(OHLC_SUFFIX) or not fname[:8].isdigit():
+                    continue
+                trade_date = datetime.strptime(fname[:8], "%Y%m%d").date()
+                path = os.path.join(self.base_dir, fname)
+                self.files[trade_date] = path
+                if not has_fresh_compacted(path):
+                    self._update_file(path)
+
+    def _update_file(self, path: str) -> _FileIndex:
+        index = self.indexes.get(path)
+        if index is None:
+            index = self.indexes[path] = self._load_index(path)
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return index
+
+        if size < index.size:
+            # ファイルが作り直された → 索引も作り直す
+            index = self.indexes[path] = _FileIndex(path)
+        if size > index.size:
+            self._scan(index, size)
+        return index
+
+    def _scan(self, index: _FileIndex, size: int):
+        with open(index.path, "rb") as f:
+            f.seek(index.size)
+            offset = index.size
+            for raw in f:
+                end = offset + len(raw)
+                if not raw.endswith(b"\n") and end >= size:
+                    break  # 書きかけの行は次回に回す
+                text = raw.decode("utf-8-sig").strip()
+                if text and not text.startswith("Time"):
+                    try:
+                        index.add_row(parse_minute(text.split(",", 1)[0]), offset, end)
+                    except ValueError:
+                        pass
+                index.size = end
+                offset = end
+        index.dirty = True
+
+    def record(self, trade_date: date, path: str, minute: int, offset: int, end_offset: int):
+        """
+        OHLCWriter から1行追記されたことを通知する。
+        索引が追いついていれば走査なしで伸ばし、ずれていれば差分を走査する。
+        """
+        with self._lock:
+            self.files[trade_date] = path
+            index = self.indexes.get(path)
+            if index is None:
+                index = self.indexes[path] = self._load_index(path)
+            if index.size == offset:
+                index.add_row(minute, offset, end_offset)
+            elif index.size < end_offset:
+                self._scan(index, end_offset)
+            if index.rows % INDEX_EVERY == 0:
+                self.save()
+
+    def save(self):
+        """変更のあった索引をディスクに保存する。"""
+        with self._lock:
+            os.makedirs(self.index_dir, exist_ok=True)
+            for path, index in self.indexes.items():
+                if not index.dirty:
+                    continue
+                tmp_path = self._index_path(path) + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(index.to_dict(), f)
+                os.replace(tmp_path, self._index_path(path))
+                index.dirty = False
+
+    # ===== 参照 =====
+
+    def trade_dates(self) -> list:
+        with self._lock:
+            return sorted(self.files)
+
+    def last_time(self) -> Optional[datetime]:
+        """全ファイルの中で最も新しい足の時刻を返す。"""
+        with self._lock:
+            for trade_date in sorted(self.files, reverse=True):
+                path = self.files[trade_date]
+                if has_fresh_compacted(path):
+                    times = pd.read_parquet(compacted_path(path), columns=["Time"])["Time"]
+                    if not times.empty:
+                        return times.max().to_pydatetime()
+                    continue
+                index = self._update_file(path)
+                if index.last is not None:
+                    return from_minute(index.last)
+        return None
+
+    def _read_compacted(self, path: str, start: datetime, end: datetime) -> dict:
+        df = pd.read_parquet(
+            compacted_path(path),
+            filters=[("Time", ">=", pd.Timestamp(start)), ("Time", "<=", pd.Timestamp(end))]
+        )
+        return {
+            "time": df["Time"].values.astype("datetime64[m]"),
+            "open": df["Open"].to_numpy(dtype=np.float64),
+            "high": df["High"].to_numpy(dtype=np.float64),
+            "low": df["Low"].to_numpy(dtype=np.float64),
+            "close": df["Close"].to_numpy(dtype=np.float64),
+            "dummy": (df["Dummy"].astype(str) == "dummy").to_numpy(),
+            "contract_month": df["ContractMonth"].astype(str).to_numpy(dtype=object),
+        }
+
+    def _read_range(self, path: str, start_min: int, end_min: int) -> dict:
+        index = self._update_file(path)
+        if index.rows == 0 or index.last < start_min or index.first > end_min:
+            return _rows_to_arrays([])
+
+        offset = index.seek_offset(start_min)
+        rows = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            remaining = index.size - offset
+            for raw in f:
+                remaining -= len(raw)
+                text = raw.decode("utf-8-sig").strip()
+                if text and not text.startswith("Time"):
+                    fields = text.split(",")
+                    minute = parse_minute(fields[0])
+                    if minute > end_min:
+                        break  # 追記は時刻順なので以降は範囲外
+                    if minute >= start_min:
+                        rows.append((minute, fields))
+                if remaining <= 0:
+                    break
+        return _rows_to_arrays(rows)
+
+    def query(self, start: datetime, end: datetime, timeframe: str = "1min",
+              as_arrays: bool = False):
+        """
+        [start, end] の足を返す。
+
+        - timeframe: "1min" 以外（"5min", "15min", "1h" など）は1分足から集約する
+        - as_arrays=True なら NumPy配列の辞書（time は datetime64[m]）、それ以外は DataFrame
+        """
+        start_min, end_min = to_minute(start), to_minute(end)
+        start = start.replace(second=0, microsecond=0, tzinfo=None)
+        end = end.replace(second=0, microsecond=0, tzinfo=None)
+
+        parts = []
+        with self._lock:
+            day = get_trade_date(start)
+            last_day = get_trade_date(end)
+            while day <= last_day:
+                path = self.files.get(day)
+                if path is None:
+                    self.refresh()
+                    path = self.files.get(day)
+                if path is not None:
+                    if has_fresh_compacted(path):
+                        parts.append(self._read_compacted(path, start, end))
+                    else:
+                        parts.append(self._read_range(path, start_min, end_min))
+                day += timedelta(days=1)
+
+        arrays = _concat_arrays(parts)
+
+        if timeframe not in ("1min", "1T", "1m"):
+            arrays = resample_arrays(arrays, timeframe)
+
+        if as_arrays:
+            return arrays
+        return arrays_to_dataframe(arrays)
+
+
+def _rows_to_arrays(rows: list) -> dict:
+    return {
+        "time": np.array([r[0] for r in rows], dtype=np.int64).astype("datetime64[m]"),
+        "open": np.array([float(r[1][1]) for r in rows], dtype=np.float64),
+        "high": np.array([float(r[1][2]) for r in rows], dtype=np.float64),
+        "low": np.array([float(r[1][3]) for r in rows], dtype=np.float64),
+        "close": np.array([float(r[1][4]) for r in rows], dtype=np.float64),
+        "dummy": np.array([r[1][5] == "dummy" for r in rows], dtype=np.bool_),
+        "contract_month": np.array([r[1][6] if len(r[1]) > 6 else "" for r in rows], dtype=object),
+    }
+
+
+def _concat_arrays(parts: list) -> dict:
+    if not parts:
+        return _rows_to_arrays([])
+    merged = {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+    order = np.argsort(merged["time"], kind="stable")
+    return {key: values[order] for key, values in merged.items()}
+
+
+def arrays_to_dataframe(arrays: dict) -> pd.DataFrame:
+    """query の配列をCSVと同じ列名のDataFrameに変換する。"""
+    return pd.DataFrame({
+        "Time": pd.to_datetime(arrays["time"]),
+        "Open": arrays["open"],
+        "High": arrays["high"],
+        "Low": arrays["low"],
+        "Close": arrays["close"],
+        "Dummy": np.where(arrays["dummy"], "dummy", "real"),
+        "ContractMonth": arrays["contract_month"],
+    })
+
+
+def resample_arrays(arrays: dict, timeframe: str) -> dict:
+    """1分足の配列を timeframe の足に集約する（Dummy は全てダミーの場合のみダミー）。"""
+    if len(arrays["time"]) == 0:
+        return arrays
+
+    df = arrays_to_dataframe(arrays).set_index("Time")
+    df["Dummy"] = arrays["dummy"]
+    agg = df.resample(timeframe, label="left", closed="left").agg({
+        "Open": "first", "High": "max", "Low": "min", "Close": "last",
+        "Dummy": "all", "ContractMonth": "last",
+    }).dropna(subset=["Open"])
+
+    return {
+        "time": agg.index.values.astype("datetime64[m]"),
+        "open": agg["Open"].to_numpy(dtype=np.float64),
+        "high": agg["High"].to_numpy(dtype=np.float64),
+        "low": agg["Low"].to_numpy(dtype=np.float64),
+        "close": agg["Close"].to_numpy(dtype=np.float64),
+        "dummy": agg["Dummy"].to_numpy(dtype=np.bool_),
+        "contract_month": agg["ContractMonth"].to_numpy(dtype=object),
+    }
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_archive_catalog(base_dir: str = "csv") -> ArchiveCatalog:
+    """base_dir ごとにプロセス内で共有する ArchiveCatalog を返す。"""
+    key = os.path.abspath(base_dir)
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = _catalogs[key] = ArchiveCatalog(base_dir)
+        return catalog
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+from datetime import datetime
+from typing import Optional
+
+from utils.lazy_import import lazy_import
+from utils.tick_archive import find_tick_source, open_tick_text
+from utils.time_util import get_trade_date
+
+pd = lazy_import("pandas")
+
+# pyarrow は読み込みが重いので、有無だけ確かめて実際に圧縮・読み込みするまで import しない
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+pq = lazy_import("pyarrow.parquet")
+
+OHLC_SUFFIX = "_nikkei_mini_future"
+TICK_SUFFIX = "_tick"
+COMPACT_EXT = ".parquet"
+COMPRESSION = "zstd"
+
+
+def compacted_path(csv_path: str) -> str:
+    """CSVファイルに対応する圧縮列指向ファイルのパスを返す。"""
+    return os.path.splitext(csv_path)[0] + COMPACT_EXT
+
+
+def has_fresh_compacted(csv_path: str) -> bool:
+    """圧縮済みファイルがあり、元のCSVより新しい（＝CSVに追記されていない）かを返す。"""
+    path = compacted_path(csv_path)
+    if not HAS_PYARROW or not os.path.isfile(path):
+        return False
+    if not os.path.isfile(csv_path):
+        return True
+    return os.path.getmtime(path) >= os.path.getmtime(csv_path)
+
+
+def _typed_ohlc(df: pd.DataFrame) -> pd.DataFrame:
+    df["Time"] = pd.to_datetime(df["Time"], format="%Y/%m/%d %H:%M:%S")
+    for col in ("Open", "High", "Low", "Close"):
+        df[col] = df[col].astype("float64")
+    df["Dummy"] = df["Dummy"].astype("category")
+    df["ContractMonth"] = df["ContractMonth"].astype(str).astype("category")
+    return df
+
+
+def _typed_ticks(df: pd.DataFrame) -> pd.DataFrame:
+    df["Time"] = pd.to_datetime(df["Time"], format="%Y/%m/%d %H:%M:%S")
+    df["Price"] = df["Price"].astype("float64")
+    if "CurrentPriceStatus" in df.columns:
+        df["CurrentPriceStatus"] = pd.to_numeric(df["CurrentPriceStatus"], errors="coerce").fillna(0).astype("int16")
+    return df
+
+
+def read_ohlc_file(csv_path: str) -> pd.DataFrame:
+    """
+    1分足ファイルを読み込む。圧縮済みファイルがあればそちらを優先する。
+    Time は datetime64 に変換済みの状態で返す。
+    """
+    if has_fresh_compacted(csv_path):
+        return pd.read_parquet(compacted_path(csv_path))
+    return _typed_ohlc(pd.read_csv(csv_path, dtype={"Dummy": str, "ContractMonth": str}))
+
+
+def read_tick_file(csv_path: str) -> pd.DataFrame:
+    """
+    ティックファイルを読み込む。圧縮済みファイルがあればそちらを優先し、
+    CSVがアーカイブ（.csv.zst / .csv.gz）に移されていればそれを読みながら伸長する。
+    """
+    if has_fresh_compacted(csv_path):
+        return pd.read_parquet(compacted_path(csv_path))
+    source = find_tick_source(csv_path)
+    if source is None:
+        raise FileNotFoundError(csv_path)
+    with open_tick_text(source) as f:
+        return _typed_ticks(pd.read_csv(f))
+
+
+def _write_verified(df: pd.DataFrame, csv_path: str) -> Optional[str]:
+    out_path = compacted_path(csv_path)
+    tmp_path = out_path + ".tmp"
+    df.to_parquet(tmp_path, compression=COMPRESSION, index=False)
+
+    # 行数を検証してから置き換える
+    written = pq.ParquetFile(tmp_path).metadata.num_rows
+    if written != len(df):
+        os.remove(tmp_path)
+        print(f"[ERROR][compaction] 行数不一致のため中止: {csv_path} csv={len(df)} parquet={written}")
+        return None
+
+    os.replace(tmp_path, out_path)
+    before = os.path.getsize(csv_path)
+    after = os.path.getsize(out_path)
+    print(f"[INFO][compaction] {os.path.basename(csv_path)} → {os.path.basename(out_path)} "
+          f"{len(df)}行 {before}→{after}バイト（{after / max(before, 1):.1%}）")
+    return out_path
+
+
+def compact_file(csv_path: str, kind: str, remove_csv: bool = False) -> Optional[str]:
+    """
+    1ファイルを圧縮列指向形式（Parquet / zstd）に変換する。
+    kind は "ohlc" または "tick"。remove_csv=True なら検証後に元のCSVを削除する。
+    """
+    if not HAS_PYARROW:
+        print("[WARN][compaction] pyarrow が無いため圧縮をスキップします")
+        return None
+    if has_fresh_compacted(csv_path):
+        return compacted_path(csv_path)
+
+    try:
+        if kind == "ohlc":
+            df = _typed_ohlc(pd.read_csv(csv_path, dtype={"Dummy": str, "ContractMonth": str}))
+        else:
+            df = _typed_ticks(pd.read_csv(csv_path))
+    except Exception as e:
+        print(f"[ERROR][compaction] 読み込み失敗: {csv_path} → {e}")
+        return None
+
+    out_path = _write_verified(df, csv_path)
+    if out_path and remove_csv:
+        os.remove(csv_path)
+    return out_path
+
+
+def compact_closed_days(base_dir: str = "csv", tick_dir: str = "tick_csv",
+                        now: Optional[datetime] = None, remove_csv: bool = False) -> list:
+    """
+    取引が終わった日（現在の取引日より前）の1分足・ティックファイルをまとめて圧縮する。
+    finalize_ohlc() の後に呼び出す想定。
+    """
+    now = now or datetime.now()
+    current_trade_date = get_trade_date(now)
+    today = now.date()
+    done = []
+
+    targets = []
+    if os.path.isdir(base_dir):
+        for fname in sorted(os.listdir(base_dir)):
+            if fname.endswith(OHLC_SUFFIX + ".csv") and fname[:8].isdigit():
+                if datetime.strptime(fname[:8], "%Y%m%d").date() < current_trade_date:
+                    targets.append((os.path.join(base_dir, fname), "ohlc"))
+    if os.path.isdir(tick_dir):
+        for fname in sorted(os.listdir(tick_dir)):
+            # ティックファイルは暦日ごとなので、当日より前なら閉じている
+            if fname.endswith(TICK_SUFFIX + ".csv") and fname[:8].isdigit():
+                if datetime.strptime(fname[:8], "%Y%m%d").date() < today:
+                    targets.append((os.path.join(tick_dir, fname), "tick"))
+
+    for csv_path, kind in targets:
+        out_path = compact_file(csv_path, kind, remove_csv=remove_csv)
+        if out_path:
+            done.append(out_path)
+    return done
+
+
+def list_ohlc_days(base_dir: str = "csv") -> dict:
+    """
+    取引日 → 1分足ファイルのパス（CSVの場所。圧縮済みのみの日も含む）を返す。
+    read_ohlc_file() に渡せば圧縮済みの方が優先して読まれる。
+    """
+    days = {}
+    if not os.path.isdir(base_dir):
+        return days
+    for fname in os.listdir(base_dir):
+        stem, ext = os.path.splitext(fname)
+        if stem.endswith(OHLC_SUFFIX) and stem[:8].isdigit() and ext in (".csv", COMPACT_EXT):
+            trade_date = datetime.strptime(stem[:8], "%Y%m%d").date()
+            days[trade_date] = os.path.join(base_dir, stem + ".csv")
+    return dict(sorted(days.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="取引終了日のCSVを列指向形式に圧縮する")
+    parser.add_argument("--csv-dir", default="csv")
+    parser.add_argument("--tick-dir", default="tick_csv")
+    parser.add_argument("--remove-csv", action="store_true", help="検証後に元のCSVを削除する")
+    args = parser.parse_args()
+    done = compact_closed_days(args.csv_dir, args.tick_dir, remove_csv=args.remove_csv)
+    print(f"[INFO] 圧縮済み: {len(done)}ファイル")
+
+
+if __name__ == "__main__":
+    main()
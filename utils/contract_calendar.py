@@ -0,0 +1,181 @@
+import argparse
+import bisect
+import threading
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Optional
+
+from utils.time_util import to_minute
+
+FIRST_YEAR = 2000
+LAST_YEAR = 2099
+BACK_MONTH_START = dtime(8, 45)    # 第2木曜の日中は期先を返す（get_active_term の仕様）
+BACK_MONTH_END = dtime(15, 45)     # この時刻ちょうどまでを含む
+
+_US_PER_MINUTE = 60_000_000
+
+
+def sq_date(term: int) -> date:
+    """限月（YYYYMM）のSQ日（第2金曜）を返す。"""
+    first = date(term // 100, term % 100, 1)
+    return first + timedelta(days=(4 - first.weekday()) % 7 + 7)
+
+
+def next_term(term: int) -> int:
+    """次の限月（3か月後）。"""
+    year, month = divmod(term, 100)
+    month += 3
+    if month > 12:
+        year, month = year + 1, month - 12
+    return year * 100 + month
+
+
+def time_key(dt: datetime) -> int:
+    """datetime を epochマイクロ秒（tz は無視して時刻の数字のまま）にする。表の検索キー。"""
+    return to_minute(dt) * _US_PER_MINUTE + dt.second * 1_000_000 + dt.microsecond
+
+
+def term_by_rule(now: datetime) -> int:
+    """
+    暦の計算だけで有効な限月を求める（表の範囲外と、表の検証に使う）。
+    - 通常：3の倍数月に切り上げた期近
+    - 第2金曜以降：期近を+3ヶ月に交代
+    - 第2木曜の 8:45〜15:45：期先（期近+6ヶ月）
+    """
+    term = now.year * 100 + ((now.month - 1) // 3 + 1) * 3
+    sq = sq_date(term)
+    if now.date() >= sq:
+        return next_term(term)
+    if now.date() == sq - timedelta(days=1) and BACK_MONTH_START <= now.time() <= BACK_MONTH_END:
+        return next_term(next_term(term))
+    return term
+
+
+class ContractCalendar:
+    """
+    限月の切り替わりをあらかじめ並べた表（FIRST_YEAR〜LAST_YEAR）。
+
+    - 切り替わりは限月ごとに3回：第2木曜 8:45（期先へ）、第2木曜 15:45 の直後（期近へ戻る）、第2金曜 0:00（次の限月へ）
+    - 時刻から限月を bisect で引く。直前に引いた区間を覚えておくため、ティックごとの検索は
+      区間の境目をまたいだときだけになる
+    - 表の範囲外の時刻は term_by_rule() で計算する
+    """
+
+    def __init__(self, first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR):
+        self.first_year = first_year
+        self.last_year = last_year
+        self.keys = []      # 区間の開始（epochマイクロ秒）
+        self.terms = []     # その区間の限月
+        self.starts = []    # 区間の開始（datetime。表示と next_change 用）
+
+        self._append(datetime(first_year, 1, 1), first_year * 100 + 3)
+        term = first_year * 100 + 3
+        while term // 100 <= last_year:
+            window = self.roll_window(term)
+            self._append(window["back_month_start"], window["back_month"])
+            self._append(window["back_month_end"], term)
+            self._append(window["roll_at"], window["next_term"])
+            term = next_term(term)
+        # 最後の区間は翌年の1月1日まで（そこから先は計算で求める）
+        self._end_key = time_key(datetime(last_year + 1, 1, 1))
+        self._cached = (self.keys[0], self.keys[1], self.terms[0])
+
+    def _append(self, start: datetime, term: int):
+        self.keys.append(time_key(start))
+        self.terms.append(term)
+        self.starts.append(start)
+
+    @staticmethod
+    def roll_window(term: int) -> dict:
+        """限月 term の交代の日時（第2木曜の期先の時間帯と、第2金曜の交代）。"""
+        sq = sq_date(term)
+        thursday = sq - timedelta(days=1)
+        return {
+            "term": term,
+            "sq_date": sq,
+            "back_month": next_term(next_term(term)),
+            "back_month_start": datetime.combine(thursday, BACK_MONTH_START),
+            # 15:45:00 ちょうどまでが期先なので、その1マイクロ秒後から期近に戻る
+            "back_month_end": datetime.combine(thursday, BACK_MONTH_END) + timedelta(microseconds=1),
+            "next_term": next_term(term),
+            "roll_at": datetime.combine(sq, dtime(0, 0)),
+        }
+
+    def term_at_key(self, key: int) -> Optional[int]:
+        """検索キー（time_key）の限月。表の範囲外なら None。"""
+        lo, hi, term = self._cached
+        if lo <= key < hi:
+            return term
+        if key < self.keys[0] or key >= self._end_key:
+            return None
+        i = bisect.bisect_right(self.keys, key) - 1
+        hi = self.keys[i + 1] if i + 1 < len(self.keys) else self._end_key
+        self._cached = (self.keys[i], hi, self.terms[i])
+        return self.terms[i]
+
+    def term_at(self, now: datetime) -> int:
+        """now に有効な限月（YYYYMM）。"""
+        term = self.term_at_key(time_key(now))
+        return term if term is not None else term_by_rule(now)
+
+    def term_for_tick(self, tick) -> int:
+        """ティック（utils/market_types.py の Tick）の時刻に有効な限月。datetime を作らずに引く。"""
+        term = self.term_at_key(tick.minute * _US_PER_MINUTE + tick.second * 1_000_000 + tick.timestamp.microsecond)
+        return term if term is not None else term_by_rule(tick.timestamp)
+
+    def next_change(self, now: datetime) -> Optional[datetime]:
+        """now より後で限月が次に切り替わる日時。表の範囲外なら None。"""
+        i = bisect.bisect_right(self.keys, time_key(now))
+        return self.starts[i] if 0 < i < len(self.starts) else None
+
+    def print_year(self, year: int):
+        for start, term in zip(self.starts, self.terms):
+            if start.year == year:
+                print(f"{start:%Y/%m/%d %H:%M:%S.%f} 〜 {term}")
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def get_contract_calendar() -> ContractCalendar:
+    """プロセス内で共有する ContractCalendar を返す（初回呼び出し時に表を作る）。"""
+    global _calendar
+    if _calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                _calendar = ContractCalendar()
+    return _calendar
+
+
+def verify(calendar: ContractCalendar) -> int:
+    """切り替わりの前後と各日の毎時で、表と term_by_rule() が一致するかを確かめる。不一致の数を返す。"""
+    mismatches = 0
+    checks = []
+    for start in calendar.starts[1:]:
+        checks += [start - timedelta(microseconds=1), start, start + timedelta(microseconds=1)]
+    day = datetime(calendar.first_year, 1, 1)
+    while day.year <= calendar.last_year:
+        checks += [day + timedelta(hours=h, minutes=30) for h in range(24)]
+        day += timedelta(days=1)
+    for t in checks:
+        if calendar.term_at(t) != term_by_rule(t):
+            mismatches += 1
+            print(f"[ERROR][calendar] {t}: 表={calendar.term_at(t)} 計算={term_by_rule(t)}")
+    print(f"[INFO][calendar] {len(checks)}時点を確認 不一致={mismatches}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="限月の切り替わり表を表示・検証する")
+    parser.add_argument("--year", type=int, default=datetime.now().year)
+    parser.add_argument("--verify", action="store_true", help="全期間で計算結果と一致するかを確かめる")
+    args = parser.parse_args()
+
+    calendar = get_contract_calendar()
+    calendar.print_year(args.year)
+    if args.verify:
+        raise SystemExit(1 if verify(calendar) else 0)
+
+
+if __name__ == "__main__":
+    main()
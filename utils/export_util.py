@@ -1,10 +1,13 @@
-
+from __future__ import annotations
 import os
 import csv
 from datetime import timedelta
-import pandas as pd
 from typing import Optional
 from datetime import datetime
+from utils.archive_catalog import get_archive_catalog
+from utils.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
 
 def export_connection_info(symbol_code: str, exchange_code: int, token: str, output_file: str = "connection_info.csv"):
     """
@@ -74,50 +77,30 @@ def export_latest_minutes_to_csv(base_dir: str, minutes: int = 3, output_file: s
 
 def export_latest_minutes_to_pd(base_dir: str, minutes: int = 3, prev_last_line: str = "") -> tuple[str, pd.DataFrame]:
     """
-    ディレクトリ内のCSVファイルから、最新2つを読み込み、N分間のデータを抽出して出力。
+    アーカイブ索引（ArchiveCatalog）から最新N分のデータを取得する。
+    ディレクトリやファイル全体を毎回読み直さず、末尾付近のバイトだけを読む。
     戻り値は (最終行の文字列, 最新N分のDataFrame)。
     """
     try:
-        files = [
-            f for f in os.listdir(base_dir)
-            if f.endswith("_nikkei_mini_future.csv") and f[:8].isdigit()
-        ]
+        catalog = get_archive_catalog(base_dir)
+        latest_time = catalog.last_time()
 
-        if len(files) < 1:
+        if latest_time is None:
             print("[警告] 対象CSVファイルが見つかりませんでした")
             return prev_last_line, pd.DataFrame()
 
-        files_sorted = sorted(files, reverse=True)
-        target_files = files_sorted[:2]
-
-        combined_df = pd.DataFrame()
-
-        for fname in reversed(target_files):
-            path = os.path.join(base_dir, fname)
-            try:
-                temp_df = pd.read_csv(path)
-                temp_df["Time"] = pd.to_datetime(temp_df["Time"])
-                combined_df = pd.concat([combined_df, temp_df], ignore_index=True)
-            except Exception as e:
-                print(f"[警告] {fname} の読み込みに失敗: {e}")
+        start_time = latest_time - timedelta(minutes=minutes - 1)
+        latest_df = catalog.query(start_time, latest_time)
 
-        if combined_df.empty:
+        if latest_df.empty:
             print("[警告] ファイル読み込みに失敗しました")
             return prev_last_line, pd.DataFrame()
 
-        latest_time = combined_df["Time"].max()
-        start_time = latest_time - timedelta(minutes=minutes - 1)
-        latest_df = combined_df[combined_df["Time"] >= start_time].copy()
-        latest_df.sort_values("Time", inplace=True)
-
         # 日付フォーマットの変換（表示用）
         latest_df["Time"] = latest_df["Time"].dt.strftime("%Y/%m/%d %H:%M:%S")
 
         # 最終行の取得（今回は必ず df を返す）
-        if not latest_df.empty:
-            last_row_str = ",".join(map(str, latest_df.iloc[-1].values))
-        else:
-            last_row_str = prev_last_line
+        last_row_str = ",".join(map(str, latest_df.iloc[-1].values))
 
         return last_row_str, latest_df
 
@@ -126,13 +109,7 @@ def export_latest_minutes_to_pd(base_dir: str, minutes: int = 3, prev_last_line:
         return prev_last_line, pd.DataFrame()
 
 def get_last_ohlc_time_from_csv(base_dir: str) -> Optional[datetime]:
-    files = sorted(
-        [f for f in os.listdir(base_dir) if f.endswith("_nikkei_mini_future.csv")],
-        reverse=True
-    )
-    for fname in files:
-        df = pd.read_csv(os.path.join(base_dir, fname))
-        if not df.empty and "Time" in df.columns:
-            df["Time"] = pd.to_datetime(df["Time"])
-            return df["Time"].max().replace(second=0, microsecond=0)
-    return None
\ No newline at end of file
+    """
+    base_dir 内の1分足ファイルで最も新しい足の時刻を返す（索引を使うためファイル全体は読まない）。
+    """
+    return get_archive_catalog(base_dir).last_time()
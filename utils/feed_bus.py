@@ -0,0 +1,467 @@
+import argparse
+import json
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Iterator
+
+from utils.market_types import Bar, Tick
+
+DEFAULT_SOCKET_PATH = "/tmp/pfr_feed.sock"
+
+# トピック（購読時は下位ビットのマスクで指定する）
+TOPIC_TICK = 1
+TOPIC_BAR = 2
+TOPIC_STATUS = 4
+TOPIC_NAMES = {"tick": TOPIC_TICK, "bar": TOPIC_BAR, "status": TOPIC_STATUS}
+
+# フレーム：トピック(1) + ペイロード長(4) + ペイロード
+FRAME_HEADER = struct.Struct("<BI")
+TICK_PAYLOAD = struct.Struct("<qdh")        # epochミリ秒, 価格, 現値ステータス
+BAR_PAYLOAD = struct.Struct("<qdddd?")      # epoch分, 始値, 高値, 安値, 終値, ダミー
+# ステータスは UTF-8 の JSON
+
+DEFAULT_MAX_BUFFER = 1024 * 1024    # 購読者ごとの未送信データの上限（バイト）
+SEND_BATCH = 256 * 1024             # 1回の send にまとめる最大バイト数
+
+
+def encode_tick(tick: Tick) -> bytes:
+    price = tick.price if tick.price is not None else float("nan")
+    payload = TICK_PAYLOAD.pack(tick.epoch_ms, price, tick.status or 0)
+    return FRAME_HEADER.pack(TOPIC_TICK, len(payload)) + payload
+
+
+def encode_bar(bar: Bar) -> bytes:
+    payload = BAR_PAYLOAD.pack(bar.minute, bar.open, bar.high, bar.low, bar.close, bool(bar.is_dummy))
+    return FRAME_HEADER.pack(TOPIC_BAR, len(payload)) + payload
+
+
+def encode_status(event: dict) -> bytes:
+    payload = json.dumps(event, ensure_ascii=False, default=str).encode("utf-8")
+    return FRAME_HEADER.pack(TOPIC_STATUS, len(payload)) + payload
+
+
+def decode_payload(topic: int, payload: bytes):
+    """フレームのペイロードを (tick: dict / bar: dict / status: dict) に戻す。"""
+    if topic == TOPIC_TICK:
+        time_ms, price, status = TICK_PAYLOAD.unpack(payload)
+        return {"time_ms": time_ms, "price": price, "status": status}
+    if topic == TOPIC_BAR:
+        minute, o, h, l, c, dummy = BAR_PAYLOAD.unpack(payload)
+        return {"time": minute, "open": o, "high": h, "low": l, "close": c, "is_dummy": dummy}
+    return json.loads(payload.decode("utf-8"))
+
+
+class _Subscriber:
+    __slots__ = ("sock", "mask", "queue", "queued_bytes", "pending", "want_write", "sent_frames", "conflated",
+                 "name")
+
+    def __init__(self, sock: socket.socket, name: str):
+        self.sock = sock
+        self.name = name
+        self.mask = None          # 購読マスクを受け取るまでは何も送らない
+        self.queue = deque()      # (ティックのみか, バイト列, 件数, 最後のティック)
+        self.queued_bytes = 0
+        self.pending = b""        # 送りかけのデータ
+        self.want_write = False
+        self.sent_frames = 0
+        self.conflated = 0
+
+
+class FeedBusServer:
+    """
+    ティック・足・ステータスを Unix ドメインソケットで複数プロセスに配る配信サーバー。
+
+    - publish_*() は呼び出し元スレッドでフレームを1回だけエンコードしてキューに積むだけで、
+      送信は専用の I/O スレッドがノンブロッキングで行う（記録処理を購読者に待たせない）
+    - 購読者は接続直後に1バイトのトピックマスクを送り、該当トピックだけを受け取る
+    - 未送信データが max_buffer を超えた購読者は、policy="conflate" なら溜まったティックを
+      最新の1件に間引き（足とステータスは残す）、それでも max_buffer の4倍を超えたら切断する。
+      policy="disconnect" なら max_buffer を超えた時点で切断する
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET_PATH, max_buffer: int = DEFAULT_MAX_BUFFER,
+                 policy: str = "conflate"):
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("この環境は Unix ドメインソケットに対応していません")
+        if policy not in ("conflate", "disconnect"):
+            raise ValueError(f"未知の policy です: {policy}")
+
+        self.path = path
+        self.max_buffer = max_buffer
+        self.policy = policy
+
+        self._inbox = deque()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._wake_pending = False
+        self._selector = selectors.DefaultSelector()
+        self._subscribers = {}
+        self._running = False
+        self._thread = None
+        self._seq = 0
+        self._last_status = None
+
+        self.published = 0
+        self.disconnected_slow = 0
+
+    # ===== 公開側（任意のスレッドから呼べる） =====
+
+    def publish_frame(self, topic: int, frame: bytes):
+        self._inbox.append((topic, frame))
+        self.published += 1
+        if not self._wake_pending:
+            self._wake_pending = True
+            try:
+                self._wake_w.send(b"\0")
+            except (BlockingIOError, OSError):
+                pass
+
+    def on_tick(self, tick: Tick):
+        """PriceHandler.add_tick_listener に登録する。現値ステータスが変わったらステータスも配信する。"""
+        self.publish_frame(TOPIC_TICK, encode_tick(tick))
+        if tick.status != self._last_status:
+            self._last_status = tick.status
+            self.publish_status({"event": "price_status", "status": tick.status, "time": tick.timestamp})
+
+    def on_bar(self, bar: Bar):
+        """PriceHandler.add_bar_listener に登録する。"""
+        self.publish_frame(TOPIC_BAR, encode_bar(bar))
+
+    def publish_status(self, event: dict):
+        self.publish_frame(TOPIC_STATUS, encode_status(event))
+
+    # ===== I/O スレッド =====
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.path)
+        self._listener.listen(128)
+        self._listener.setblocking(False)
+        self._selector.register(self._listener, selectors.EVENT_READ, "accept")
+        self._selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="FeedBusServer", daemon=True)
+        self._thread.start()
+        print(f"[INFO][feed_bus] 配信開始: {self.path} policy={self.policy}")
+
+    def _run(self):
+        while self._running:
+            for key, events in self._selector.select(timeout=0.5):
+                if key.data == "accept":
+                    self._accept()
+                elif key.data == "wake":
+                    self._drain_wake()
+                else:
+                    sub = key.data
+                    if events & selectors.EVENT_READ:
+                        self._read_mask(sub)
+                    if events & selectors.EVENT_WRITE and sub.sock.fileno() != -1:
+                        self._flush(sub)
+            self._dispatch()
+
+    def _accept(self):
+        try:
+            sock, _ = self._listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1024 * 1024)
+        self._seq += 1
+        sub = _Subscriber(sock, f"sub{self._seq}")
+        self._subscribers[sock.fileno()] = sub
+        self._selector.register(sock, selectors.EVENT_READ, sub)
+
+    def _drain_wake(self):
+        self._wake_pending = False
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _read_mask(self, sub: _Subscriber):
+        try:
+            data = sub.sock.recv(64)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(sub, "切断")
+            return
+        # 最後に受け取ったバイトを購読マスクとする（接続中に変更も可能）
+        sub.mask = data[-1]
+
+    def _dispatch(self):
+        if not self._inbox:
+            return
+        frames = []
+        while self._inbox:
+            frames.append(self._inbox.popleft())
+
+        # 同じマスクの購読者には同じバイト列を送るため、マスクごとに1回だけ連結する
+        chunks = {}
+        for sub in list(self._subscribers.values()):
+            if not sub.mask:
+                continue
+            chunk = chunks.get(sub.mask)
+            if chunk is None:
+                chunk = chunks[sub.mask] = self._build_chunk(frames, sub.mask)
+            if chunk is False:
+                continue
+            sub.queue.append(chunk)
+            sub.queued_bytes += len(chunk[1])
+            if sub.queued_bytes > self.max_buffer and not self._handle_slow(sub):
+                continue
+            self._flush(sub)
+
+    @staticmethod
+    def _build_chunk(frames: list, mask: int):
+        """
+        マスクに合うフレームを連結して (ティックのみか, バイト列, 件数, 最後のティック) を返す。
+        該当フレームが無ければ False。
+        """
+        parts = []
+        tick_only = True
+        last_tick = None
+        for topic, frame in frames:
+            if mask & topic:
+                parts.append(frame)
+                if topic == TOPIC_TICK:
+                    last_tick = frame
+                else:
+                    tick_only = False
+        if not parts:
+            return False
+        return tick_only, b"".join(parts), len(parts), last_tick
+
+    def _handle_slow(self, sub: _Subscriber) -> bool:
+        """溜まりすぎた購読者を間引くか切断する。切断したら False を返す。"""
+        if self.policy == "conflate":
+            # ティックだけの塊は捨てて最新のティック1件に置き換える（足・ステータスを含む塊は残す）
+            kept = deque()
+            dropped = 0
+            last_tick = None
+            for chunk in sub.queue:
+                if chunk[0]:
+                    dropped += chunk[2]
+                    last_tick = chunk[3]
+                else:
+                    kept.append(chunk)
+            if last_tick is not None:
+                kept.append((True, last_tick, 1, last_tick))
+                dropped -= 1
+            sub.conflated += dropped
+            sub.queue = kept
+            sub.queued_bytes = sum(len(chunk[1]) for chunk in kept)
+            if sub.queued_bytes <= self.max_buffer * 4:
+                return True
+
+        self.disconnected_slow += 1
+        self._drop(sub, f"受信が遅いため切断（未送信 {sub.queued_bytes}バイト）")
+        return False
+
+    def _flush(self, sub: _Subscriber):
+        while True:
+            if not sub.pending:
+                if not sub.queue:
+                    break
+                parts = []
+                size = 0
+                while sub.queue and size < SEND_BATCH:
+                    _, data, count, _ = sub.queue.popleft()
+                    parts.append(data)
+                    size += len(data)
+                    sub.sent_frames += count
+                sub.queued_bytes -= size
+                sub.pending = parts[0] if len(parts) == 1 else b"".join(parts)
+            try:
+                sent = sub.sock.send(sub.pending)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self._drop(sub, "送信エラー")
+                return
+            sub.pending = sub.pending[sent:]
+            if sub.pending:
+                break
+
+        # 送り切れなかった場合だけ書き込み可能の通知を待つ
+        want_write = bool(sub.pending or sub.queue)
+        if want_write != sub.want_write:
+            sub.want_write = want_write
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if want_write else 0)
+            try:
+                self._selector.modify(sub.sock, events, sub)
+            except (KeyError, ValueError):
+                pass
+
+    def _drop(self, sub: _Subscriber, reason: str):
+        fileno = sub.sock.fileno()
+        if fileno == -1:
+            return
+        print(f"[INFO][feed_bus] {sub.name}: {reason}（送信 {sub.sent_frames}件 間引き {sub.conflated}件）")
+        try:
+            self._selector.unregister(sub.sock)
+        except (KeyError, ValueError):
+            pass
+        self._subscribers.pop(fileno, None)
+        sub.sock.close()
+
+    def get_stats(self) -> dict:
+        subs = list(self._subscribers.values())
+        return {
+            "published": self.published,
+            "subscribers": len(subs),
+            "queued_bytes": sum(s.queued_bytes for s in subs),
+            "conflated": sum(s.conflated for s in subs),
+            "disconnected_slow": self.disconnected_slow,
+        }
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        for sub in list(self._subscribers.values()):
+            self._drop(sub, "サーバー停止")
+        self._selector.close()
+        self._listener.close()
+        self._wake_r.close()
+        self._wake_w.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class FeedSubscriber:
+    """
+    FeedBusServer を購読するクライアント。
+
+    sub = FeedSubscriber(topics=("bar", "status"))
+    for topic, message in sub:
+        ...
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET_PATH, topics=("tick", "bar", "status"),
+                 recv_size: int = 256 * 1024):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)
+        self.sock.connect(path)
+        mask = 0
+        for name in topics:
+            mask |= TOPIC_NAMES[name]
+        self.sock.sendall(bytes([mask]))
+        self.recv_size = recv_size
+        self._buffer = bytearray()
+
+    def iter_frames(self) -> Iterator[tuple[int, bytes]]:
+        """(トピック, ペイロード) をデコードせずに返す（件数を数えるだけなら速い）。"""
+        header_size = FRAME_HEADER.size
+        while True:
+            data = self.sock.recv(self.recv_size)
+            if not data:
+                return
+            buf = self._buffer
+            buf += data
+            pos = 0
+            end = len(buf)
+            while end - pos >= header_size:
+                topic, length = FRAME_HEADER.unpack_from(buf, pos)
+                if end - pos - header_size < length:
+                    break
+                start = pos + header_size
+                yield topic, bytes(buf[start:start + length])
+                pos = start + length
+            del buf[:pos]
+
+    def __iter__(self):
+        for topic, payload in self.iter_frames():
+            yield topic, decode_payload(topic, payload)
+
+    def close(self):
+        self.sock.close()
+
+
+def _bench_subscriber(path: str, topics: tuple, slow: float, result_queue):
+    sub = FeedSubscriber(path, topics)
+    count = 0
+    started = None
+    for _ in sub.iter_frames():
+        if started is None:
+            started = time.perf_counter()
+        count += 1
+        if slow and count % 100 == 0:
+            time.sleep(slow)
+    elapsed = time.perf_counter() - started if started else 0.0
+    result_queue.put((count, elapsed))
+
+
+def run_benchmark(subscribers: int = 16, messages: int = 200_000, slow_subscribers: int = 0,
+                  path: str = "/tmp/pfr_feed_bench.sock", policy: str = "conflate"):
+    """
+    購読者プロセスを subscribers 個（うち slow_subscribers 個は意図的に遅い）起動し、
+    ティックを messages 件配信して、公開側と受信側のスループットを表示する。
+    """
+    import multiprocessing as mp
+
+    server = FeedBusServer(path, policy=policy)
+    server.start()
+    result_queue = mp.Queue()
+    procs = []
+    for i in range(subscribers):
+        slow = 0.005 if i < slow_subscribers else 0.0   # 遅い購読者は最大2万件/秒程度しか読まない
+        proc = mp.Process(target=_bench_subscriber, args=(path, ("tick", "bar"), slow, result_queue), daemon=True)
+        proc.start()
+        procs.append(proc)
+
+    while len(server._subscribers) < subscribers or any(s.mask is None for s in server._subscribers.values()):
+        time.sleep(0.01)
+
+    now = datetime.now()
+    started = time.perf_counter()
+    for i in range(messages):
+        server.on_tick(Tick(38000.0 + (i % 100) * 5, now, 1))
+    publish_elapsed = time.perf_counter() - started
+
+    # 全購読者へ送り終わるまで（最大10秒）待ってから切断して集計する
+    deadline = time.perf_counter() + 10.0
+    while time.perf_counter() < deadline and (
+            server._inbox or any(s.queue or s.pending for s in list(server._subscribers.values()))):
+        time.sleep(0.01)
+    total_elapsed = time.perf_counter() - started
+    stats = server.get_stats()
+    server.stop()
+
+    results = [result_queue.get(timeout=30) for _ in procs]
+    for proc in procs:
+        proc.join(timeout=5)
+
+    delivered = sum(count for count, _ in results)
+    print(f"[BENCH] 購読者={subscribers}（遅い購読者={slow_subscribers}） 配信={messages}件 policy={policy}")
+    print(f"[BENCH] 公開側: {messages / publish_elapsed:,.0f}件/秒（{publish_elapsed * 1e6 / messages:.2f}µs/件）")
+    print(f"[BENCH] 全体: 受信合計={delivered:,}件 {delivered / total_elapsed:,.0f}件/秒（{total_elapsed:.2f}秒）")
+    print(f"[BENCH] 間引き={stats['conflated']}件 遅延切断={stats['disconnected_slow']}件")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unix ドメインソケット配信のスループット計測")
+    parser.add_argument("--subscribers", type=int, default=16)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--slow-subscribers", type=int, default=0)
+    parser.add_argument("--policy", choices=["conflate", "disconnect"], default="conflate")
+    parser.add_argument("--path", default="/tmp/pfr_feed_bench.sock")
+    args = parser.parse_args()
+    run_benchmark(args.subscribers, args.messages, args.slow_subscribers, args.path, args.policy)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,17 @@
 import os
-from config.settings import API_BASE_URL, get_api_password
 import json
-import requests
-import pandas as pd
+from utils.rest_client import get_rest_client
+from utils.position_cache import TradeStateCache
 from datetime import timedelta, datetime
 from typing import Optional
+from utils.lazy_import import lazy_import
 
-def get_token() -> str:
-    """APIトークンを取得する"""
-    url = f"{API_BASE_URL}/token"
-    headers = {"Content-Type": "application/json"}
-    payload = json.dumps({"APIPassword": get_api_password()})
+pd = lazy_import("pandas")
 
+def get_token() -> str:
+    """APIトークンを取得する（共有RESTクライアントにも保持される）"""
     try:
-        response = requests.post(url, headers=headers, data=payload)
-        response.raise_for_status()
-        return response.json()["Token"]
+        return get_rest_client().refresh_token(force=True)
     except Exception as e:
         print(f"[ERROR] トークン取得失敗: {e}")
         return None
@@ -49,8 +45,6 @@ def get_token() -> str:
 
 def register_symbol(symbol_code: str, exchange_code: int, token: str) -> bool:
     """銘柄をKabuステーションに登録"""
-    url = f"{API_BASE_URL}/register"
-    headers = {"Content-Type": "application/json", "X-API-KEY": token}
     payload = {
         "Symbols": [
             {"Symbol": symbol_code, "Exchange": exchange_code}
@@ -58,7 +52,7 @@ def register_symbol(symbol_code: str, exchange_code: int, token: str) -> bool:
     }
 
     try:
-        response = requests.put(url, headers=headers, data=json.dumps(payload))
+        response = get_rest_client().put("/register", token=token, data=json.dumps(payload))
         response.raise_for_status()
         print("[OK] 銘柄登録成功:", response.json())
         return True
@@ -68,12 +62,7 @@ def register_symbol(symbol_code: str, exchange_code: int, token: str) -> bool:
 
 def get_positions(token):
     """保有情報を取得"""
-    url = f"{API_BASE_URL}/positions"
-    headers = {
-        'Content-Type': 'application/json',
-        'X-API-KEY': token
-    }
-    response = requests.get(url, headers=headers)
+    response = get_rest_client().get("/positions", token=token)
     return response.json()
 
     # 実行例
@@ -96,12 +85,7 @@ def get_positions(token):
 
 def get_orders(token):
     """注文情報を取得"""
-    url = f"{API_BASE_URL}/orders"
-    headers = {
-        'Content-Type': 'application/json',
-        'X-API-KEY': token
-    }
-    response = requests.get(url, headers=headers)
+    response = get_rest_client().get("/orders", token=token)
     if response.status_code == 200:
         return response.json()
     else:
@@ -173,15 +157,34 @@ def json_to_dataframe(json_list):
 
 def get_future_Trade_Limit(token):
     """先物の取引余力を取得"""
-    url = f"{API_BASE_URL}/wallet/future"
-    headers = {
-        'Content-Type': 'application/json',
-        'X-API-KEY': token
-    }
-    response = requests.get(url, headers=headers)
+    response = get_rest_client().get("/wallet/future", token=token)
     response.raise_for_status()
     return response.json()
 
+def send_order(payload: dict, token: str = None) -> dict:
+    """
+    先物の注文を送信する（/sendorder/future）。
+    注文の二重送信を避けるため、この呼び出しはリトライしない。
+    """
+    try:
+        response = get_rest_client().post("/sendorder/future", token=token, data=json.dumps(payload))
+        response.raise_for_status()
+        return response.json()
+    finally:
+        # 自分の注文で建玉・注文状態が変わるため、次回参照時に取り直す
+        get_trade_state_cache().invalidate()
+
+_trade_state_cache = None
+
+def get_trade_state_cache() -> TradeStateCache:
+    """
+    has_position / no_positions / no_active_orders が参照する建玉・注文キャッシュを返す。
+    """
+    global _trade_state_cache
+    if _trade_state_cache is None:
+        _trade_state_cache = TradeStateCache(get_positions, get_orders, ttl=1.0)
+    return _trade_state_cache
+
 def has_position(side: int, token: str) -> bool:
     """
     指定された売買区分（1=買い, 2=売り）で建玉が存在するかどうかを判定する。
@@ -194,7 +197,7 @@ def has_position(side: int, token: str) -> bool:
         bool: 指定区分で建玉がある場合は True、なければ False
     """
     try:
-        positions = get_positions(token)
+        positions = get_trade_state_cache().get_positions(token)
         for pos in positions:
             if pos.get("Side") == side and pos.get("LeavesQty", 0) > 0:
                 return True
@@ -256,7 +259,7 @@ def no_active_orders(token: str) -> bool:
     5	終了（発注エラー・取消済・全約定・失効・期限切れ）
     """
     try:
-        orders = get_orders(token)
+        orders = get_trade_state_cache().get_orders(token)
         for order in orders:
             state = order.get("State")  # または order.get("OrderState")
             if state in [1, 2, 3, 4]:
@@ -276,10 +279,8 @@ def no_active_orders(token: str) -> bool:
     #        print("現在発注中の注文があります")
 
 def get_cb_info(symbol: str, exchange: int, api_key: str):
-    url = f"http://localhost:18080/kabusapi/board/{symbol}@{exchange}"
-    headers = {"X-API-KEY": api_key}
     try:
-        response = requests.get(url, headers=headers)
+        response = get_rest_client().get(f"/board/{symbol}@{exchange}", token=api_key)
         if response.ok:
             data = response.json()
             return {
@@ -0,0 +1,29 @@
+import importlib
+import sys
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """
+    属性に初めて触れたときに本物のモジュールを import する代理オブジェクト。
+    読み込み後は本物の属性を自分に写すので、2回目以降の属性参照は通常のモジュールと同じ速さになる。
+    """
+
+    def __getattr__(self, attr):
+        # import_module はモジュールごとのロックで守られるため、複数スレッドから同時に触れても1回だけ読み込まれる
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    pandas・numpy・requests などの重いモジュールを、使うまで読み込まない形で返す。
+    すでに読み込まれていれば本物をそのまま返す。
+
+        pd = lazy_import("pandas")   # import pandas as pd の代わり
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return _LazyModule(name)
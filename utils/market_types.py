@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from utils.time_util import from_minute, to_minute
+
+
+class Tick:
+    """
+    受信した1件のティック。
+
+    minute は epoch分（整数）で、分の切り替え判定は datetime.replace を使わずにこの整数で行う。
+    timestamp は受信した時刻そのまま（tz 付きの場合もある）。
+    """
+    __slots__ = ("price", "timestamp", "status", "minute", "second")
+
+    def __init__(self, price: float, timestamp: datetime, status=None):
+        self.price = price
+        self.timestamp = timestamp
+        self.status = status
+        self.minute = to_minute(timestamp)
+        self.second = timestamp.second
+
+    @property
+    def epoch_ms(self) -> int:
+        """取引所時刻（naive）を UTC とみなした epochミリ秒（utils/tick_binary.py と同じ基準）。"""
+        return (self.minute * 60 + self.second) * 1000 + self.timestamp.microsecond // 1000
+
+    def __repr__(self):
+        return f"Tick(price={self.price}, timestamp={self.timestamp}, status={self.status})"
+
+
+class Bar:
+    """
+    1本の足。OHLCBuilder が分ごとに1つ作り、同じ分の間は値を書き換えて使い回す。
+
+    minute は epoch分（整数）。datetime が必要な箇所（CSV出力など）だけ time プロパティで変換する。
+    """
+    __slots__ = ("minute", "open", "high", "low", "close", "is_dummy", "contract_month")
+
+    def __init__(self, minute: int, open_: float, high: float, low: float, close: float,
+                 is_dummy: bool = False, contract_month=None):
+        self.minute = minute
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.is_dummy = is_dummy
+        self.contract_month = contract_month
+
+    @classmethod
+    def flat(cls, minute: int, price: float, is_dummy: bool = False, contract_month=None) -> "Bar":
+        """始値・高値・安値・終値が同じ足（新しい分の最初のティックやダミー補完）を作る。"""
+        return cls(minute, price, price, price, price, is_dummy, contract_month)
+
+    @property
+    def time(self) -> datetime:
+        return from_minute(self.minute)
+
+    def update(self, price: float):
+        """同じ分のティックで高値・安値・終値を更新する。"""
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+
+    def extend(self, price: float):
+        """遅れて届いた同じ分のティックで高値・安値だけを広げる（終値は時刻の新しいティックのまま）。"""
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+
+    def copy(self) -> "Bar":
+        return Bar(self.minute, self.open, self.high, self.low, self.close, self.is_dummy, self.contract_month)
+
+    def to_dict(self) -> dict:
+        """以前の辞書形式（ログ出力や外部の戦略向け）。"""
+        return {
+            "time": self.time,
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "is_dummy": self.is_dummy,
+            "contract_month": self.contract_month,
+        }
+
+    def __repr__(self):
+        kind = "dummy" if self.is_dummy else "real"
+        return (f"Bar({self.time:%Y/%m/%d %H:%M} O={self.open} H={self.high} L={self.low} C={self.close} "
+                f"{kind} {self.contract_month})")
@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class _Flight:
+    """
+    実行中のREST呼び出し1回分。待機中のスレッドと結果を共有する。
+    """
+    __slots__ = ("done", "value", "ok", "generation")
+
+    def __init__(self, generation: int):
+        self.done = threading.Event()
+        self.value = None
+        self.ok = False
+        self.generation = generation
+
+
+class _CachedEntry:
+    """
+    1種類のREST結果（建玉 or 注文）のキャッシュと取得中の呼び出し。
+    """
+    __slots__ = ("value", "fetched_at", "inflight", "generation", "hits", "misses", "coalesced", "errors")
+
+    def __init__(self):
+        self.value = None
+        self.fetched_at = None
+        self.inflight = None  # 取得中なら _Flight
+        self.generation = 0   # invalidate() のたびに進める
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+
+class TradeStateCache:
+    """
+    建玉・注文一覧をTTL付きでメモリに保持するキャッシュ。
+
+    - TTL内の参照はRESTを呼ばずにメモリから返す
+    - 同時に複数スレッドから期限切れの参照が来ても、REST呼び出しは1回にまとめる
+    - 自分で注文を出した直後は invalidate() で次回の参照を強制的に再取得させる
+    - ヒット率と最終取得からの経過時間（鮮度）を get_stats() / print_stats() で確認できる
+    """
+
+    def __init__(self, fetch_positions: Callable, fetch_orders: Callable, ttl: float = 1.0):
+        self.ttl = ttl
+        self._fetchers = {"positions": fetch_positions, "orders": fetch_orders}
+        self._entries = {"positions": _CachedEntry(), "orders": _CachedEntry()}
+        self._lock = threading.Lock()
+
+    def get_positions(self, token: str) -> list:
+        return self._get("positions", token)
+
+    def get_orders(self, token: str) -> list:
+        return self._get("orders", token)
+
+    def _get(self, kind: str, token: str):
+        entry = self._entries[kind]
+
+        with self._lock:
+            now = time.monotonic()
+            if entry.fetched_at is not None and now - entry.fetched_at < self.ttl:
+                entry.hits += 1
+                return entry.value
+
+            flight = entry.inflight
+            if flight is None:
+                entry.misses += 1
+                flight = entry.inflight = _Flight(entry.generation)
+                owner = True
+            else:
+                entry.coalesced += 1
+                owner = False
+
+        if not owner:
+            # 他スレッドの取得結果を待って共有する
+            flight.done.wait()
+            if not flight.ok:
+                raise RuntimeError(f"{kind} の取得に失敗しました")
+            return flight.value
+
+        try:
+            flight.value = self._fetchers[kind](token)
+            flight.ok = True
+        except Exception:
+            with self._lock:
+                entry.errors += 1
+            raise
+        finally:
+            with self._lock:
+                # 取得中に invalidate された結果は、呼び出し元には返すがキャッシュしない
+                if flight.ok and flight.generation == entry.generation:
+                    entry.value = flight.value
+                    entry.fetched_at = time.monotonic()
+                if entry.inflight is flight:
+                    entry.inflight = None
+            flight.done.set()
+        return flight.value
+
+    def invalidate(self, kind: Optional[str] = None):
+        """
+        キャッシュを無効化する。注文送信・取消の直後に呼ぶ。
+        kind を省略すると建玉・注文の両方を無効化する。
+        """
+        with self._lock:
+            for name, entry in self._entries.items():
+                if kind is None or name == kind:
+                    entry.fetched_at = None
+                    entry.generation += 1
+                    entry.inflight = None  # 無効化前に始まった取得には相乗りさせない
+
+    def get_stats(self) -> dict:
+        """種類ごとのヒット率・取得回数・鮮度（秒）を返す。"""
+        now = time.monotonic()
+        stats = {}
+        with self._lock:
+            for name, entry in self._entries.items():
+                lookups = entry.hits + entry.misses + entry.coalesced
+                stats[name] = {
+                    "hits": entry.hits,
+                    "misses": entry.misses,
+                    "coalesced": entry.coalesced,
+                    "errors": entry.errors,
+                    "hit_rate": (entry.hits + entry.coalesced) / lookups if lookups else 0.0,
+                    "staleness_sec": now - entry.fetched_at if entry.fetched_at is not None else None,
+                }
+        return stats
+
+    def print_stats(self):
+        """参照のあった種類ごとに、ヒット率・REST取得回数・鮮度を表示する（終了時に PFR_main から呼ぶ）。"""
+        for name, s in self.get_stats().items():
+            lookups = s["hits"] + s["misses"] + s["coalesced"]
+            if not lookups:
+                continue
+            staleness = f"{s['staleness_sec']:.1f}秒" if s["staleness_sec"] is not None else "-"
+            print(f"[INFO][trade_cache] {name}: 参照={lookups} ヒット率={s['hit_rate']:.0%} "
+                  f"（ヒット={s['hits']} 相乗り={s['coalesced']} 取得={s['misses']} エラー={s['errors']}） "
+                  f"最終取得から={staleness}")
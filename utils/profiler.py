@@ -0,0 +1,251 @@
+import cProfile
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+DEFAULT_OUTPUT_DIR = "profile"
+DEFAULT_WINDOW_SEC = 30
+DEFAULT_INTERVAL_MS = 5      # サンプリング間隔（200Hz。受信スレッドへの影響は数%以内）
+TRACEMALLOC_DEPTH = 8        # 割り当て箇所ごとに保持するスタックの深さ
+TOP_ALLOCATIONS = 30
+ENV_VAR = "PFR_PROFILE"      # 例: PFR_PROFILE=sample / PFR_PROFILE=cprofile:60
+PROFILE_MODES = ("sample", "cprofile")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    別スレッドから一定間隔で全スレッドのスタックを読み取り、折り畳み形式（collapsed stack）で集計する。
+
+    対象のコードには手を入れず、トレース関数も設定しないため、有効にしたまま運用しても負荷は小さい。
+    集計結果は「スレッド名;呼び出し元;...;呼び出し先 回数」の行で、flamegraph.pl や speedscope にそのまま渡せる。
+    """
+
+    def __init__(self, interval_ms: float = DEFAULT_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="Profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, f"thread-{ident}")
+                if name.startswith("Profile"):
+                    continue  # 計測側のスレッド（Profiler / ProfileWindow）は除く
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(name)
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.stacks
+
+    def write_collapsed(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class _ThreadProfiles:
+    """
+    cProfile はスレッドごとにしか計測できないため、対象メソッドを包んで呼び出したスレッドごとに計測する。
+    """
+
+    def __init__(self, obj, attr: str):
+        self.obj = obj
+        self.attr = attr
+        self.profiles = {}
+        self._lock = threading.Lock()
+        original = getattr(obj, attr)
+
+        def wrapped(*args, **kwargs):
+            ident = threading.get_ident()
+            profile = self.profiles.get(ident)
+            if profile is None:
+                with self._lock:
+                    profile = self.profiles.setdefault(ident, cProfile.Profile())
+            return profile.runcall(original, *args, **kwargs)
+
+        setattr(obj, attr, wrapped)
+
+    def restore(self) -> Optional[pstats.Stats]:
+        # インスタンス属性を消せばクラスのメソッドに戻る
+        delattr(self.obj, self.attr)
+        stats = None
+        for profile in self.profiles.values():
+            profile.create_stats()
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        return stats
+
+
+class ProfileWindow:
+    """
+    指定秒数だけプロファイルを取り、終わったら output_dir に結果を書き出す。
+
+    - mode="sample"  : SamplingProfiler による全スレッドの折り畳みスタック（*_stacks.txt）
+    - mode="cprofile": targets に渡したメソッド（既定は handle_tick）の cProfile（*_cprofile.pstats / .txt）
+    - どちらのモードでも tracemalloc を有効にし、期間中に増えた割り当てを本リポジトリ内の
+      ソース行ごとに上位 TOP_ALLOCATIONS 件まとめる（*_alloc.txt）
+    """
+
+    def __init__(self, output_dir: str = DEFAULT_OUTPUT_DIR, mode: str = "sample",
+                 interval_ms: float = DEFAULT_INTERVAL_MS, targets: Optional[list] = None):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"未知のプロファイルモードです: {mode}")
+        self.output_dir = output_dir
+        self.mode = mode
+        self.interval_ms = interval_ms
+        self.targets = targets or []
+        self._lock = threading.Lock()
+        self._active = False
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    def start(self, seconds: float = DEFAULT_WINDOW_SEC) -> bool:
+        """計測を始める。すでに計測中なら何もせず False を返す（シグナルハンドラからも呼べる）。"""
+        with self._lock:
+            if self._active:
+                print("[WARN][profile] すでにプロファイル中のため、要求を無視しました")
+                return False
+            self._active = True
+        threading.Thread(target=self._run, args=(seconds,), name="ProfileWindow", daemon=True).start()
+        return True
+
+    def _run(self, seconds: float):
+        started_at = datetime.now()
+        print(f"[INFO][profile] {self.mode} で {seconds:.0f}秒間プロファイルします")
+
+        own_tracemalloc = not tracemalloc.is_tracing()
+        if own_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_DEPTH)
+        before = tracemalloc.take_snapshot()
+
+        sampler = None
+        wrappers = []
+        if self.mode == "sample":
+            sampler = SamplingProfiler(self.interval_ms)
+            sampler.start()
+        else:
+            wrappers = [_ThreadProfiles(obj, attr) for obj, attr in self.targets]
+
+        try:
+            time.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            self._write(started_at, sampler, wrappers, before, after)
+        finally:
+            if sampler is not None:
+                sampler.stop()
+            if own_tracemalloc:
+                tracemalloc.stop()
+            with self._lock:
+                self._active = False
+
+    def _write(self, started_at: datetime, sampler, wrappers: list, before, after):
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, started_at.strftime("%Y%m%d_%H%M%S"))
+        written = []
+        if sampler is not None:
+            sampler.stop()
+            sampler.write_collapsed(prefix + "_stacks.txt")
+            written.append(prefix + "_stacks.txt")
+            print(f"[INFO][profile] サンプル数={sampler.samples} スタック種類={len(sampler.stacks)}")
+        for wrapper in wrappers:
+            stats = wrapper.restore()
+            if stats is None:
+                print(f"[WARN][profile] {wrapper.attr} は期間中に呼ばれませんでした")
+                continue
+            stats.dump_stats(prefix + "_cprofile.pstats")
+            with open(prefix + "_cprofile.txt", "w", encoding="utf-8") as f:
+                pstats.Stats(prefix + "_cprofile.pstats", stream=f).sort_stats("cumulative").print_stats(40)
+            written += [prefix + "_cprofile.pstats", prefix + "_cprofile.txt"]
+
+        write_allocation_report(prefix + "_alloc.txt", before, after)
+        written.append(prefix + "_alloc.txt")
+        print(f"[INFO][profile] 出力: {', '.join(written)}")
+
+
+def write_allocation_report(path: str, before, after, top: int = TOP_ALLOCATIONS):
+    """
+    2つの tracemalloc スナップショットの差を、本リポジトリ内のソース行ごとに書き出す。
+    pandas などのライブラリ内部での割り当ては、それを呼んだ本リポジトリの行に計上する。
+    """
+    only_repo = [tracemalloc.Filter(True, os.path.join(BASE_DIR, "*"), all_frames=True)]
+    diff = after.filter_traces(only_repo).compare_to(before.filter_traces(only_repo), "traceback")
+
+    sites = {}
+    for stat in diff:
+        # フレームは古い順に並ぶので、末尾から最初に見つかった本リポジトリの行を割り当て箇所とする
+        frame = next((f for f in reversed(stat.traceback) if f.filename.startswith(BASE_DIR)), stat.traceback[-1])
+        key = (os.path.relpath(frame.filename, BASE_DIR), frame.lineno)
+        size_diff, count_diff, size = sites.get(key, (0, 0, 0))
+        sites[key] = (size_diff + stat.size_diff, count_diff + stat.count_diff, size + stat.size)
+
+    ranked = sorted(sites.items(), key=lambda item: abs(item[1][0]), reverse=True)[:top]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# 期間中に増えた割り当て（上位{top}件、{BASE_DIR} 配下の呼び出し元ごと）\n")
+        for (name, lineno), (size_diff, count_diff, size) in ranked:
+            f.write(f"{name}:{lineno}  増加={size_diff / 1024:+.1f}KiB ({count_diff:+d}個)  現在={size / 1024:.1f}KiB\n")
+
+
+def parse_env(value: Optional[str]):
+    """
+    PFR_PROFILE の値（"sample" / "cprofile" / "sample:60" など）を (mode, 秒数) にする。
+    解釈できない値（"samples" など）は警告を出して None を返す（起動直後のプロファイルはしない）。
+    打ち間違いで ProfileWindow が例外を出し、記録が始まらなくなるのを防ぐ。
+    """
+    if not value:
+        return None
+    mode, _, seconds = value.partition(":")
+    mode = mode or "sample"
+    try:
+        window_sec = float(seconds) if seconds else DEFAULT_WINDOW_SEC
+    except ValueError:
+        window_sec = None
+    if mode not in PROFILE_MODES or window_sec is None or window_sec <= 0:
+        print(f"[WARN][profiler] {ENV_VAR}={value} は解釈できないため無視します"
+              f"（モードは {' / '.join(PROFILE_MODES)}、秒数は正の数。例: sample:60）")
+        return None
+    return mode, window_sec
+
+
+def install_signal_trigger(window: ProfileWindow, seconds: float = DEFAULT_WINDOW_SEC) -> Optional[str]:
+    """
+    シグナルでプロファイルを開始できるようにする（メインスレッドから呼ぶ）。
+    Linux/macOS は SIGUSR1、Windows はコンソールの Ctrl+Break（SIGBREAK）。
+    """
+    signum = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+    if signum is None:
+        return None
+    signal.signal(signum, lambda *_: window.start(seconds))
+    return signal.Signals(signum).name
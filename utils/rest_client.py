@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Optional
+
+from config.settings import API_BASE_URL, get_api_password
+from utils.lazy_import import lazy_import
+
+requests = lazy_import("requests")
+
+# dummy_tick_server/mock_kabu_server.py が全ての応答に付けるヘッダー（本番と同じポートで動くため、応答で見分ける）
+MOCK_SERVER_HEADER = "X-Mock-Kabu"
+
+# エンドポイントごとのタイムアウト（接続, 読み込み）秒
+DEFAULT_TIMEOUT = (1.0, 5.0)
+ENDPOINT_TIMEOUTS = {
+    "token": (1.0, 5.0),
+    "register": (1.0, 5.0),
+    "symbolname": (1.0, 5.0),
+    "positions": (1.0, 3.0),
+    "orders": (1.0, 3.0),
+    "wallet": (1.0, 3.0),
+    "board": (1.0, 2.0),
+    "sendorder": (0.5, 2.0),
+}
+
+
+class EndpointStats:
+    """
+    エンドポイントごとの呼び出し回数・エラー数・レイテンシを集計するクラス。
+    """
+    __slots__ = ("count", "errors", "total", "min", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, elapsed: float, ok: bool):
+        self.count += 1
+        if not ok:
+            self.errors += 1
+        self.total += elapsed
+        self.last = elapsed
+        self.max = max(self.max, elapsed)
+        self.min = elapsed if self.min is None else min(self.min, elapsed)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "min_ms": (self.min or 0.0) * 1000,
+            "max_ms": self.max * 1000,
+            "last_ms": self.last * 1000,
+        }
+
+
+class KabuRestClient:
+    """
+    kabuステーションREST API用の共有クライアント。
+
+    - requests.Session によるコネクションプールとキープアライブ
+    - エンドポイントごとのタイムアウト
+    - 接続エラー・5xx はバックオフ付きでリトライ（注文送信はリトライしない）
+    - 401 を受けたらトークンを取り直して1回だけ再送
+    - エンドポイントごとのレイテンシ統計
+    """
+
+    def __init__(self, base_url: str = API_BASE_URL, pool_size: int = 4, retries: int = 3, backoff: float = 0.2):
+        self.base_url = base_url.rstrip("/")
+        self.token = None
+        self.stats = {}
+        self._token_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        # requests は最初のクライアント生成時に読み込む（ダミーモードでは読み込まない）
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            backoff_factor=backoff,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "PUT"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    @staticmethod
+    def _endpoint_name(path: str) -> str:
+        return path.strip("/").split("/")[0]
+
+    def _record(self, endpoint: str, elapsed: float, ok: bool):
+        with self._stats_lock:
+            stats = self.stats.get(endpoint)
+            if stats is None:
+                stats = self.stats[endpoint] = EndpointStats()
+            stats.add(elapsed, ok)
+
+    def request(self, method: str, path: str, token: Optional[str] = None, auth: bool = True, **kwargs) -> requests.Response:
+        """
+        API_BASE_URL からの相対パスにリクエストを送る。
+        auth=True の場合は X-API-KEY（token 指定がなければ保持中のトークン）を付与し、
+        401 ならトークンを更新して再送する。
+        """
+        endpoint = self._endpoint_name(path)
+        kwargs.setdefault("timeout", ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+        url = f"{self.base_url}/{path.lstrip('/')}"
+
+        extra_headers = kwargs.pop("headers", None) or {}
+        for attempt in range(2):
+            headers = dict(extra_headers)
+            if auth:
+                headers["X-API-KEY"] = token or self.token or self.refresh_token()
+
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, headers=headers, **kwargs)
+            except requests.RequestException:
+                self._record(endpoint, time.perf_counter() - started, False)
+                raise
+            self._record(endpoint, time.perf_counter() - started, response.ok)
+
+            if auth and response.status_code == 401 and attempt == 0:
+                print(f"[WARN] {endpoint} で認証エラー → トークンを再取得します")
+                self.refresh_token(force=True)
+                token = None
+                continue
+            return response
+        return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    def set_token(self, token: Optional[str]):
+        self.token = token
+
+    def refresh_token(self, force: bool = False) -> Optional[str]:
+        """
+        トークンを取得してクライアントに保持する。
+        複数スレッドから同時に呼ばれても取得は1回にまとめる。
+        """
+        current = self.token
+        with self._token_lock:
+            if self.token and not force:
+                return self.token
+            if force and self.token != current:
+                return self.token  # 他スレッドが更新済み
+
+            response = self.post(
+                "/token", auth=False,
+                data=json.dumps({"APIPassword": get_api_password()})
+            )
+            response.raise_for_status()
+            self.token = response.json()["Token"]
+            return self.token
+
+    def get_stats(self) -> dict:
+        """エンドポイントごとのレイテンシ統計を返す。"""
+        with self._stats_lock:
+            return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+    def print_stats(self):
+        for name, s in sorted(self.get_stats().items()):
+            print(f"[INFO][REST] {name}: 回数={s['count']} エラー={s['errors']} "
+                  f"平均={s['avg_ms']:.1f}ms 最小={s['min_ms']:.1f}ms 最大={s['max_ms']:.1f}ms")
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_rest_client() -> KabuRestClient:
+    """プロセス内で共有する KabuRestClient を返す。"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = KabuRestClient()
+    return _client
@@ -0,0 +1,185 @@
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import numpy as np
+
+from utils.market_types import Bar, Tick
+
+DEFAULT_FEED_NAME = "pfr_feed"
+DEFAULT_CAPACITY = 1024   # 保持する直近の足の本数
+
+# 共有メモリのレイアウト：ヘッダー1件 + 足のリングバッファ capacity 件
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("seq", "<u8"),            # 奇数の間は書き込み中（seqlock）
+    ("capacity", "<u8"),
+    ("bar_total", "<u8"),      # これまでに書いた足の総数（次に書く位置 = bar_total % capacity）
+    ("tick_count", "<u8"),
+    ("tick_time_ms", "<i8"),
+    ("tick_price", "<f8"),
+    ("tick_status", "<i8"),
+])
+BAR_DTYPE = np.dtype([
+    ("time", "<i8"),           # epoch分
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("dummy", "?"),
+])
+FEED_MAGIC = b"PFRFEED1"
+
+
+def _views(buf, capacity: int) -> tuple[np.ndarray, np.ndarray]:
+    header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=buf)
+    bars = np.ndarray((capacity,), dtype=BAR_DTYPE, buffer=buf, offset=HEADER_DTYPE.itemsize)
+    return header, bars
+
+
+class ShmFeedPublisher:
+    """
+    最新のティックと直近の足を名前付き共有メモリに公開するクラス（書き込みは1プロセスのみ）。
+
+    書き込みの前後でシーケンス番号を1ずつ増やす seqlock 方式のため、読み出し側はロックを取らずに
+    「シーケンスが偶数で、読む前後で変わっていない」ことを確かめるだけで一貫したスナップショットを得られる。
+    PriceHandler の add_tick_listener / add_bar_listener に on_tick / on_bar を登録して使う。
+    受信スレッドとメインスレッドの両方から書かれるため、書き込み側どうしだけはロックで直列化する。
+    """
+
+    def __init__(self, name: str = DEFAULT_FEED_NAME, capacity: int = DEFAULT_CAPACITY):
+        self.name = name
+        self.capacity = capacity
+        size = HEADER_DTYPE.itemsize + BAR_DTYPE.itemsize * capacity
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # 前回の異常終了で残った領域は作り直す
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.header, self.bars = _views(self.shm.buf, capacity)
+        self.header[0] = (FEED_MAGIC, 0, capacity, 0, 0, 0, 0.0, 0)
+        self._lock = threading.Lock()
+
+    def on_tick(self, tick: Tick):
+        time_ms = tick.epoch_ms
+        h = self.header
+        with self._lock:
+            h["seq"] += 1
+            h["tick_time_ms"] = time_ms
+            h["tick_price"] = tick.price if tick.price is not None else np.nan
+            h["tick_status"] = tick.status or 0
+            h["tick_count"] += 1
+            h["seq"] += 1
+
+    def on_bar(self, bar: Bar):
+        record = (bar.minute, bar.open, bar.high, bar.low, bar.close, bool(bar.is_dummy))
+        h = self.header
+        with self._lock:
+            total = int(h["bar_total"][0])
+            h["seq"] += 1
+            self.bars[total % self.capacity] = record
+            h["bar_total"] = total + 1
+            h["seq"] += 1
+
+    def close(self):
+        self.header = None
+        self.bars = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.12 以前は接続しただけで resource_tracker に登録され、終了時に削除されてしまうため、
+        # 接続の間だけ登録を止める（fork した子プロセスでも公開側の登録を消さないよう unregister は使わない）
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class ShmFeedReader:
+    """
+    ShmFeedPublisher が公開した共有メモリを読み出すクラス（別プロセスから何個でも接続できる）。
+
+    reader = ShmFeedReader()
+    snap = reader.snapshot(bars=3)
+    while True:
+        snap = reader.wait_next(snap["seq"], timeout=5.0)
+    """
+
+    def __init__(self, name: str = DEFAULT_FEED_NAME):
+        self.shm = _attach(name)
+        header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        if header["magic"][0] != FEED_MAGIC:
+            self.shm.close()
+            raise ValueError(f"共有メモリ {name} はフィード形式ではありません")
+        self.capacity = int(header["capacity"][0])
+        self.header, self.bars = _views(self.shm.buf, self.capacity)
+
+    def sequence(self) -> int:
+        return int(self.header["seq"][0])
+
+    def snapshot(self, bars: Optional[int] = None, spin: int = 1000) -> Optional[dict]:
+        """
+        一貫したスナップショットを返す。書き込みと競合した場合は読み直す（spin 回まで）。
+        bars は返す足の本数（省略時はバッファにある全部。古い順）。
+        """
+        for _ in range(spin):
+            seq_before = int(self.header["seq"][0])
+            if seq_before & 1:
+                continue
+            header = self.header[0].copy()
+            total = int(header["bar_total"])
+            count = min(total, self.capacity, bars if bars is not None else self.capacity)
+            positions = np.arange(total - count, total) % self.capacity
+            recent = self.bars[positions]  # ファンシーインデックスなのでコピーになる
+            if int(self.header["seq"][0]) != seq_before:
+                continue
+
+            return {
+                "seq": seq_before,
+                "tick": {
+                    "time": np.datetime64(int(header["tick_time_ms"]), "ms"),
+                    "price": float(header["tick_price"]),
+                    "status": int(header["tick_status"]),
+                    "count": int(header["tick_count"]),
+                },
+                "bar_total": total,
+                "bars": recent,
+            }
+        return None
+
+    def wait_next(self, last_seq: int, timeout: Optional[float] = None, bars: Optional[int] = None,
+                  poll_interval: float = 0.0005) -> Optional[dict]:
+        """
+        シーケンスが last_seq から進むまで待ち、新しいスナップショットを返す（タイムアウト時は None）。
+        最初は短く回り、その後は poll_interval 間隔で確認する。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        spins = 0
+        while True:
+            seq = int(self.header["seq"][0])
+            if seq != last_seq and not seq & 1:
+                snap = self.snapshot(bars)
+                if snap is not None:
+                    return snap
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            spins += 1
+            if spins > 200:
+                time.sleep(poll_interval)
+
+    def close(self):
+        self.header = None
+        self.bars = None
+        self.shm.close()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# 起動直後に読み込まれていてはいけない重いモジュール（最初に使う処理まで遅らせている）
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "requests", "websocket", "websockets")
+
+# 子プロセスで PFR_main を読み込み、時間と読み込まれた重いモジュールを JSON で返す
+_CHILD_CODE = """
+import json, sys, time
+started = time.perf_counter()
+import PFR_main
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({"import_ms": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def _top_level(names) -> dict:
+    """モジュール名をトップレベルのパッケージごとにまとめて {パッケージ: モジュール数} にする。"""
+    counts = {}
+    for name in names:
+        top = name.split(".")[0]
+        counts[top] = counts.get(top, 0) + 1
+    return counts
+
+
+class StartupProfile:
+    """
+    起動にかかる時間を段階ごとに記録する（PFR_main の --startup-profile）。
+    mark() を呼ぶたびに、前の mark() からの経過時間とその間に新しく読み込まれたモジュールを記録する。
+    無効のときは何もしない。
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.phases = []            # (名前, ミリ秒, {パッケージ: 新しく読み込んだモジュール数})
+        self._last = self.started
+        self._known = set(sys.modules) if enabled else set()
+        self._first_tick = False
+
+    def mark(self, name: str):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        loaded = set(sys.modules)
+        self.phases.append((name, (now - self._last) * 1000, _top_level(loaded - self._known)))
+        self._known = loaded
+        self._last = now
+
+    def on_tick(self, tick):
+        """最初のティックを受け取るまでの時間を表示する（PriceHandler のティックリスナー）。"""
+        if self._first_tick:
+            return
+        self._first_tick = True
+        print(f"[INFO][startup] 最初のティックまで {(time.perf_counter() - self.started) * 1000:.0f}ms")
+
+    def report(self, top: int = 5):
+        if not self.enabled:
+            return
+        total = (self._last - self.started) * 1000
+        print(f"[INFO][startup] 起動から受信開始まで {total:.0f}ms（Python本体の起動は含まない）")
+        for name, ms, packages in self.phases:
+            heavy = sorted(packages.items(), key=lambda item: -item[1])[:top]
+            detail = " ".join(f"{pkg}({n})" for pkg, n in heavy)
+            print(f"[INFO][startup] {ms:8.1f}ms  {name}（読み込み: {detail or '-'}）")
+        loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+        if loaded:
+            print(f"[INFO][startup] 受信開始までに読み込まれた重いモジュール: {', '.join(loaded)}")
+
+
+def measure_import(runs: int = 5, cwd: str = None) -> dict:
+    """
+    新しい Python プロセスで PFR_main を読み込む時間を runs 回測り、中央値と読み込まれた重いモジュールを返す。
+    """
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    heavy = set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _CHILD_CODE], cwd=cwd, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result["import_ms"])
+        heavy.update(result["heavy"])
+    return {"median_ms": statistics.median(times), "max_ms": max(times), "heavy": sorted(heavy)}
+
+
+def check_budget(budget_ms: float, runs: int = 5) -> bool:
+    """
+    PFR_main の読み込み時間が予算内で、重いモジュールを読み込んでいないかを確かめる。
+    """
+    result = measure_import(runs)
+    ok = result["median_ms"] <= budget_ms and not result["heavy"]
+    tag = "[INFO]" if ok else "[ERROR]"
+    print(f"{tag}[startup] PFR_main の読み込み 中央値={result['median_ms']:.1f}ms 最大={result['max_ms']:.1f}ms "
+          f"（予算 {budget_ms:.0f}ms、{runs}回）")
+    if result["heavy"]:
+        print(f"[ERROR][startup] 起動時に重いモジュールが読み込まれています: {', '.join(result['heavy'])}")
+    return ok
+
+
+def main():
+    from config.settings import STARTUP_BUDGET_MS
+
+    parser = argparse.ArgumentParser(description="PFR_main の起動時間が予算内かを確かめる")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    sys.exit(0 if check_budget(args.budget_ms, args.runs) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,128 @@
-import requests
+import json
+import os
+import threading
+from typing import Optional
+
 from config.settings import API_BASE_URL, FUTURE_CODE
-from datetime import datetime, timedelta, time as dtime
+from utils.contract_calendar import get_contract_calendar, sq_date
+from utils.rest_client import MOCK_SERVER_HEADER, get_rest_client
+from datetime import datetime
 
-# 銘柄コードキャッシュ
-_symbol_cache = {}
+SYMBOL_CACHE_PATH = os.path.join("cache", "symbol_codes.json")
 
-def get_active_term(now: datetime) -> int:
+
+class SymbolCodeCache:
     """
-    現在時刻に基づいて、有効な限月（YYYYMM形式）を返す。
-    仕様：
-    - 通常：3の倍数月に切り上げた期近
-    - 第2金曜以降：期近を+3ヶ月に交代
-    - 第2木曜の 8:45〜15:45：期先（期近+3ヶ月）を返す
+    限月 → 銘柄コードのキャッシュ。ファイルに保存し、再起動後も /symbolname/future を呼ばずに使う。
+
+    - FUTURE_CODE か接続先（API_BASE_URL）が変わったら全て捨てる
+    - モックサーバー（dummy_tick_server/mock_kabu_server.py）の応答はファイルに保存しない。
+      本番と同じポートで動くため、架空の銘柄コードが本番の実行に残らないようにする
+    - 限月の切り替わり（ContractCalendar.next_change）を過ぎるたびに、SQ日を迎えた限月を捨てる
     """
 
-    year = now.year
-    month = now.month
+    def __init__(self, path: str = SYMBOL_CACHE_PATH, future_code: str = FUTURE_CODE, api_base_url: str = API_BASE_URL):
+        self.path = path
+        self.future_code = future_code
+        self.api_base_url = api_base_url
+        self.codes = {}
+        self.persist = True         # モックの応答を受け取ったら False（以後ファイルに書かない）
+        self._valid_until = None    # 次に古い限月を捨てる日時
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("future_code") == self.future_code and data.get("api_base_url") == self.api_base_url:
+            self.codes = {int(term): code for term, code in data.get("codes", {}).items()}
+
+    def _save(self):
+        if not self.persist:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"future_code": self.future_code, "api_base_url": self.api_base_url,
+                       "codes": {str(t): c for t, c in self.codes.items()}}, f)
+        os.replace(tmp_path, self.path)
 
-    # --- 3の倍数月に切り上げ（期近） ---
-    future_month = ((month - 1) // 3 + 1) * 3
-    if future_month > 12:
-        future_month -= 12
-        year += 1
+    def _expire(self, now: datetime):
+        """SQ日を迎えた限月を捨て、次の切り替わりの日時を覚えておく。"""
+        expired = [term for term in self.codes if sq_date(term) <= now.date()]
+        for term in expired:
+            del self.codes[term]
+        if expired:
+            print(f"[INFO] 満期を迎えた限月の銘柄コードを削除しました: {sorted(expired)}")
+            self._save()
+        self._valid_until = get_contract_calendar().next_change(now)
 
-    base_term_year = year
-    base_term_month = future_month
+    def get(self, term: int, now: Optional[datetime] = None) -> Optional[str]:
+        now = now or datetime.now()
+        with self._lock:
+            if self._valid_until is None or now >= self._valid_until:
+                self._expire(now)
+            return self.codes.get(term)
 
-    # --- 該当月の第2金曜と第2木曜を計算 ---
-    if future_month in [3, 6, 9, 12]:
-        first_day = datetime(base_term_year, base_term_month, 1)
-        weekday = first_day.weekday()  # 月曜=0, 金曜=4
+    def put(self, term: int, code: str, persist: bool = True):
+        """persist=False（モックの応答）ならメモリにだけ置き、以後このプロセスではファイルに書かない。"""
+        with self._lock:
+            if not persist and self.persist:
+                self.persist = False
+                print("[INFO] モックサーバーの応答のため、銘柄コードをファイルに保存しません")
+            self.codes[term] = code
+            self._save()
 
-        days_to_second_friday = ((4 - weekday) % 7) + 7
-        second_friday = first_day + timedelta(days=days_to_second_friday)
-        second_thursday = second_friday - timedelta(days=1)
 
-        # 日時ベースの比較のため date() を分離
-        now_date = now.date()
-        now_time = now.time()
+_symbol_cache = None
+_symbol_cache_lock = threading.Lock()
 
-        # SQの金曜以降 → +3ヶ月（期近交代）
-        if now_date >= second_friday.date():
-            base_term_month += 3
-            if base_term_month > 12:
-                base_term_month -= 12
-                base_term_year += 1
 
-        # 第2木曜かつ 8:45〜15:45 の間 → 期先（+6ヶ月）
-        elif now_date == second_thursday.date():
-            if dtime(8, 45) <= now_time <= dtime(15, 45):
-                base_term_month += 6
-                if base_term_month > 12:
-                    base_term_month -= 12
-                    base_term_year += 1
+def get_symbol_cache() -> SymbolCodeCache:
+    """プロセス内で共有する SymbolCodeCache を返す。"""
+    global _symbol_cache
+    if _symbol_cache is None:
+        with _symbol_cache_lock:
+            if _symbol_cache is None:
+                _symbol_cache = SymbolCodeCache()
+    return _symbol_cache
 
-    return base_term_year * 100 + base_term_month
+
+def get_active_term(now: datetime) -> int:
+    """
+    現在時刻に基づいて、有効な限月（YYYYMM形式）を返す。
+    仕様：
+    - 通常：3の倍数月に切り上げた期近
+    - 第2金曜以降：期近を+3ヶ月に交代
+    - 第2木曜の 8:45〜15:45：期先（期近+6ヶ月）を返す
+    暦の計算は utils/contract_calendar.py の表を引くだけ（ティックごとに呼ばれるため）。
+    """
+    return get_contract_calendar().term_at(now)
 
 
 def get_symbol_code(term: int, token: str) -> str:
     """
     限月（YYYYMM）から銘柄コードを取得する。
-    結果はキャッシュに保存して再利用。
+    結果はファイルにも保存し、再起動後も再利用する（cache/symbol_codes.json）。
     """
-    if term in _symbol_cache:
-        return _symbol_cache[term]
+    cache = get_symbol_cache()
+    symbol = cache.get(term)
+    if symbol:
+        return symbol
 
-    url = f"{API_BASE_URL}/symbolname/future"
-    headers = {
-        "Content-Type": "application/json",
-        "X-API-KEY": token
-    }
     params = {
         "FutureCode": FUTURE_CODE,
         "DerivMonth": term
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = get_rest_client().get("/symbolname/future", token=token, params=params)
         response.raise_for_status()
         symbol = response.json()["Symbol"]
-        _symbol_cache[term] = symbol
+        cache.put(term, symbol, persist=MOCK_SERVER_HEADER not in response.headers)
         print(f"[DEBUG] 銘柄コード取得成功: {symbol}")
         return symbol
     except Exception as e:
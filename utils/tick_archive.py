@@ -0,0 +1,244 @@
+import argparse
+import csv
+import gzip
+import io
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+TICK_SUFFIX = "_tick"
+ZSTD_EXT = ".csv.zst"
+GZIP_EXT = ".csv.gz"
+ARCHIVE_EXTS = (ZSTD_EXT, GZIP_EXT)
+ZSTD_LEVEL = 3        # 速度重視（記録ホストのCPUを取り合わない）
+GZIP_LEVEL = 6
+COPY_CHUNK = 1024 * 1024
+
+
+def default_codec() -> str:
+    """使用する圧縮形式。zstandard が入っていれば zstd、無ければ標準ライブラリの gzip。"""
+    return "zstd" if HAS_ZSTD else "gzip"
+
+
+def archive_path(csv_path: str, codec: Optional[str] = None) -> str:
+    """CSVファイルに対応する圧縮アーカイブのパスを返す。"""
+    ext = ZSTD_EXT if (codec or default_codec()) == "zstd" else GZIP_EXT
+    return os.path.splitext(csv_path)[0] + ext
+
+
+def find_tick_source(csv_path: str) -> Optional[str]:
+    """
+    ティックファイルの実体を探す。CSVが残っていればCSV、無ければ圧縮アーカイブのパスを返す。
+    """
+    if os.path.isfile(csv_path):
+        return csv_path
+    stem = os.path.splitext(csv_path)[0]
+    for ext in ARCHIVE_EXTS:
+        if os.path.isfile(stem + ext):
+            return stem + ext
+    return None
+
+
+def open_tick_text(path: str):
+    """
+    ティックファイルをテキストとして開く（.csv / .csv.gz / .csv.zst）。
+    圧縮ファイルはディスクに展開せず、読みながら伸長する。
+    """
+    if path.endswith(ZSTD_EXT):
+        if not HAS_ZSTD:
+            raise RuntimeError(f"zstandard が無いため読み込めません: {path}")
+        raw = open(path, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(io.BufferedReader(reader, COPY_CHUNK), encoding="utf-8-sig", newline="")
+    if path.endswith(GZIP_EXT):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    return open(path, "r", encoding="utf-8-sig", newline="")
+
+
+def iter_tick_rows(path: str, chunk_rows: int = 100_000) -> Iterator[list]:
+    """
+    ティックファイルを chunk_rows 行ずつ（dict のリストで）返す。
+    ファイル全体を読み込まないため、数GBのアーカイブでもメモリ使用量は一定。
+    """
+    with open_tick_text(path) as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _compress_stream(src, dst, codec: str):
+    if codec == "zstd":
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        with compressor.stream_writer(dst, closefd=False) as writer:
+            while True:
+                block = src.read(COPY_CHUNK)
+                if not block:
+                    break
+                writer.write(block)
+    else:
+        with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=GZIP_LEVEL) as writer:
+            while True:
+                block = src.read(COPY_CHUNK)
+                if not block:
+                    break
+                writer.write(block)
+
+
+def _count_lines(path: str) -> int:
+    count = 0
+    if path.endswith(ARCHIVE_EXTS):
+        with open_tick_text(path) as f:
+            for _ in f:
+                count += 1
+        return count
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(COPY_CHUNK)
+            if not block:
+                break
+            count += block.count(b"\n")
+    return count
+
+
+def archive_file(csv_path: str, codec: Optional[str] = None, verify: bool = True) -> Optional[dict]:
+    """
+    ティックCSVを1ファイル圧縮し、元のCSVを削除する。
+    ストリームで圧縮するため、ファイルサイズに関係なくメモリ使用量は一定。
+    戻り値は {"path", "raw_bytes", "archived_bytes", "ratio", "seconds", "mb_per_sec"}。
+    """
+    codec = codec or default_codec()
+    if codec == "zstd" and not HAS_ZSTD:
+        print("[WARN][archive] zstandard が無いため gzip で圧縮します")
+        codec = "gzip"
+
+    out_path = archive_path(csv_path, codec)
+    # 拡張子で形式を判定するため、一時ファイルも同じ拡張子にする
+    ext = ZSTD_EXT if codec == "zstd" else GZIP_EXT
+    tmp_path = out_path[:-len(ext)] + ".tmp" + ext
+    raw_bytes = os.path.getsize(csv_path)
+
+    started = time.perf_counter()
+    try:
+        with open(csv_path, "rb") as src, open(tmp_path, "wb") as dst:
+            _compress_stream(src, dst, codec)
+    except Exception as e:
+        print(f"[ERROR][archive] 圧縮失敗: {csv_path} → {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    seconds = time.perf_counter() - started
+
+    # 行数を検証してから置き換え、元のCSVを削除する
+    if verify:
+        expected, written = _count_lines(csv_path), _count_lines(tmp_path)
+        if expected != written:
+            os.remove(tmp_path)
+            print(f"[ERROR][archive] 行数不一致のため中止: {csv_path} csv={expected} archive={written}")
+            return None
+
+    os.replace(tmp_path, out_path)
+    os.remove(csv_path)
+
+    archived_bytes = os.path.getsize(out_path)
+    stats = {
+        "path": out_path,
+        "raw_bytes": raw_bytes,
+        "archived_bytes": archived_bytes,
+        "ratio": raw_bytes / max(archived_bytes, 1),
+        "seconds": seconds,
+        "mb_per_sec": raw_bytes / (1024 * 1024) / max(seconds, 1e-9),
+    }
+    print(f"[INFO][archive] {os.path.basename(csv_path)} → {os.path.basename(out_path)} "
+          f"{raw_bytes}→{archived_bytes}バイト 圧縮率={stats['ratio']:.1f}倍 {stats['mb_per_sec']:.1f}MB/秒")
+    return stats
+
+
+def _file_date(fname: str):
+    if fname[:8].isdigit() and TICK_SUFFIX in fname:
+        try:
+            return datetime.strptime(fname[:8], "%Y%m%d").date()
+        except ValueError:
+            return None
+    return None
+
+
+def archive_closed_ticks(tick_dir: str = "tick_csv", now: Optional[datetime] = None,
+                         codec: Optional[str] = None) -> dict:
+    """
+    当日より前（＝書き込みが終わった）のティックCSVをまとめて圧縮し、合計の圧縮率とスループットを返す。
+    compact_closed_days() の後に呼び出す想定（Parquet 化した後のCSVを圧縮して保管する）。
+    """
+    today = (now or datetime.now()).date()
+    summary = {"files": 0, "raw_bytes": 0, "archived_bytes": 0, "seconds": 0.0}
+    if not os.path.isdir(tick_dir):
+        return summary
+
+    for fname in sorted(os.listdir(tick_dir)):
+        if not fname.endswith(TICK_SUFFIX + ".csv"):
+            continue
+        file_date = _file_date(fname)
+        if file_date is None or file_date >= today:
+            continue
+        stats = archive_file(os.path.join(tick_dir, fname), codec=codec)
+        if stats:
+            summary["files"] += 1
+            summary["raw_bytes"] += stats["raw_bytes"]
+            summary["archived_bytes"] += stats["archived_bytes"]
+            summary["seconds"] += stats["seconds"]
+
+    if summary["files"]:
+        ratio = summary["raw_bytes"] / max(summary["archived_bytes"], 1)
+        mb_per_sec = summary["raw_bytes"] / (1024 * 1024) / max(summary["seconds"], 1e-9)
+        print(f"[INFO][archive] {summary['files']}ファイル 合計 {summary['raw_bytes']}→{summary['archived_bytes']}バイト "
+              f"圧縮率={ratio:.1f}倍 {mb_per_sec:.1f}MB/秒")
+    return summary
+
+
+def apply_retention(tick_dir: str = "tick_csv", retention_days: int = 0, now: Optional[datetime] = None) -> list:
+    """
+    保存期間（retention_days 日）を過ぎたティックアーカイブを削除する。0 以下なら何もしない。
+    削除対象は圧縮済みアーカイブと Parquet のみ（未圧縮のCSVは消さない）。
+    """
+    if retention_days <= 0 or not os.path.isdir(tick_dir):
+        return []
+
+    cutoff = (now or datetime.now()).date() - timedelta(days=retention_days)
+    removed = []
+    for fname in sorted(os.listdir(tick_dir)):
+        if not fname.endswith(ARCHIVE_EXTS + (".parquet",)):
+            continue
+        file_date = _file_date(fname)
+        if file_date is not None and file_date < cutoff:
+            os.remove(os.path.join(tick_dir, fname))
+            removed.append(fname)
+
+    if removed:
+        print(f"[INFO][archive] 保存期間（{retention_days}日）を過ぎたアーカイブを削除: {len(removed)}ファイル")
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="書き込みが終わったティックCSVを圧縮して保管する")
+    parser.add_argument("--tick-dir", default="tick_csv")
+    parser.add_argument("--codec", choices=["zstd", "gzip"], default=None, help="省略時は zstd（無ければ gzip）")
+    parser.add_argument("--retention-days", type=int, default=0, help="この日数より古いアーカイブを削除（0 で無期限）")
+    args = parser.parse_args()
+
+    archive_closed_ticks(args.tick_dir, codec=args.codec)
+    apply_retention(args.tick_dir, args.retention_days)
+
+
+if __name__ == "__main__":
+    main()
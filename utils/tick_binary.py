@@ -0,0 +1,74 @@
+import os
+from typing import Iterator
+
+import numpy as np
+
+# 高速リプレイ用のティックバイナリ形式
+# ヘッダー（8バイト）+ 固定長レコードの連続。時刻は取引所時刻（naive）をUTCとみなしたepochミリ秒。
+TICK_MAGIC = b"PFRTICK1"
+TICK_DTYPE = np.dtype([("time_ms", "<i8"), ("price", "<f8"), ("status", "<i2")])
+HEADER_SIZE = len(TICK_MAGIC)
+
+
+def datetime64_to_ms(times) -> np.ndarray:
+    """datetime64 の配列を epochミリ秒（int64）に変換する。"""
+    return np.asarray(times).astype("datetime64[ms]").astype(np.int64)
+
+
+def ms_to_datetime64(time_ms: np.ndarray) -> np.ndarray:
+    """epochミリ秒（int64）の配列を datetime64[ms] に変換する。"""
+    return np.asarray(time_ms, dtype=np.int64).astype("datetime64[ms]")
+
+
+class TickBinaryWriter:
+    """
+    ティックをバイナリ形式で追記するクラス。
+    配列単位で書き込むため、大量のティックでもメモリ使用量は書き込む塊の分だけで済む。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        is_new = not os.path.isfile(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if is_new:
+            self.file.write(TICK_MAGIC)
+        self.count = 0
+
+    def write_chunk(self, time_ms: np.ndarray, price: np.ndarray, status: np.ndarray):
+        records = np.empty(len(time_ms), dtype=TICK_DTYPE)
+        records["time_ms"] = time_ms
+        records["price"] = price
+        records["status"] = status
+        self.file.write(records.tobytes())
+        self.count += len(records)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def _check_header(path: str):
+    with open(path, "rb") as f:
+        if f.read(HEADER_SIZE) != TICK_MAGIC:
+            raise ValueError(f"ティックバイナリ形式ではありません: {path}")
+
+
+def read_ticks(path: str) -> np.ndarray:
+    """
+    ティックバイナリをメモリマップで開き、構造化配列として返す（コピーなし）。
+    """
+    _check_header(path)
+    size = os.path.getsize(path) - HEADER_SIZE
+    count = size // TICK_DTYPE.itemsize
+    if count == 0:
+        return np.empty(0, dtype=TICK_DTYPE)
+    return np.memmap(path, dtype=TICK_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def iter_tick_chunks(path: str, chunk_rows: int = 1_000_000) -> Iterator[np.ndarray]:
+    """ティックバイナリを chunk_rows 件ずつ返す。"""
+    ticks = read_ticks(path)
+    for start in range(0, len(ticks), chunk_rows):
+        yield ticks[start:start + chunk_rows]
@@ -1,4 +1,16 @@
-from datetime import datetime, time as dtime, timedelta
+from datetime import date, datetime, time as dtime, timedelta
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_minute(dt: datetime) -> int:
+    """datetime を epoch分に変換する（tz は無視）。"""
+    return (dt.toordinal() - _EPOCH_ORDINAL) * 1440 + dt.hour * 60 + dt.minute
+
+
+def from_minute(minute: int) -> datetime:
+    """epoch分を datetime に戻す。"""
+    return datetime(1970, 1, 1) + timedelta(minutes=int(minute))
 
 
 def is_market_closed(now: datetime) -> bool:
@@ -1,81 +1,64 @@
 from datetime import datetime, timedelta, time
+from typing import Optional
+
+from utils.market_types import Bar, Tick
+
+# プレクロージング補完を始める時刻（15:40 / 5:55 を1日の中の分で表す）
+PRE_CLOSE_TRIGGER_MINUTES = (15 * 60 + 40, 5 * 60 + 55)
 
 
 class OHLCBuilder:
     """
     ティックデータから1分足のOHLCを構築するクラス。
     日中・夜間セッションごとにクロージング補完に対応。
+    足は Bar、分は epoch分（整数）で扱い、ティックごとの辞書・datetime の生成を避ける。
     """
 
     def __init__(self):
-        self.current_minute = None
-        self.ohlc = None
+        self.current_minute = None   # epoch分
+        self.ohlc = None             # 構築中の Bar
         self.first_price_of_next_session = None
         self.closing_completed_session = None  # ← セッション単位で記録
         self.pre_close_count = None
         self.last_dummy_minute = None
 
-    def update(self, price: float, timestamp: datetime, contract_month=None) -> dict:
-        minute = timestamp.replace(second=0, microsecond=0, tzinfo=None)
-        print(f"[DEBUG][update] 呼び出し: price={price}, timestamp={timestamp}, minute={minute}")
+    def update(self, tick: Tick, contract_month=None) -> Optional[Bar]:
+        minute = tick.minute
+        print(f"[DEBUG][update] 呼び出し: price={tick.price}, timestamp={tick.timestamp}, minute={minute}")
 
         # 初回
         if self.current_minute is None:
             self.current_minute = minute
-            self.ohlc = {
-                "time": minute,
-                "open": price,
-                "high": price,
-                "low": price,
-                "close": price,
-                "is_dummy": False,
-                "contract_month": contract_month
-            }
+            self.ohlc = Bar.flat(minute, tick.price, False, contract_month)
             return None
 
-        # 通常の分切り替えを優先
+        # 通常の分切り替えを優先（確定した Bar はそのまま返し、新しい分は新しい Bar で始める）
         if minute > self.current_minute:
-            completed = self.ohlc.copy()
+            completed = self.ohlc
             self.current_minute = minute
-            self.ohlc = {
-                "time": minute,
-                "open": price,
-                "high": price,
-                "low": price,
-                "close": price,
-                "is_dummy": False,
-                "contract_month": contract_month
-            }
-
-            # プレクロージングトリガー判定
-            trigger_times = [time(15, 40), time(5, 55)]
-            if timestamp.time() in trigger_times and self.pre_close_count is None:
-                print(f"[TRIGGER] プレクロージング補完フラグをセット: {timestamp.time()}")
+            self.ohlc = Bar.flat(minute, tick.price, False, contract_month)
+
+            # プレクロージングトリガー判定（15:40:00 / 5:55:00 ちょうどのティック）
+            if (minute % 1440 in PRE_CLOSE_TRIGGER_MINUTES and tick.second == 0
+                    and tick.timestamp.microsecond == 0 and self.pre_close_count is None):
+                print(f"[TRIGGER] プレクロージング補完フラグをセット: {tick.timestamp.time()}")
                 self.pre_close_count = 5
-                self._pre_close_base_price = price
+                self._pre_close_base_price = tick.price
                 self._pre_close_base_minute = minute
 
             return completed
 
         if self.pre_close_count and self.pre_close_count > 0:
-            next_dummy_time = self._pre_close_base_minute + timedelta(minutes=5 - self.pre_close_count)
-            dummy = {
-                "time": next_dummy_time,
-                "open": self._pre_close_base_price,
-                "high": self._pre_close_base_price,
-                "low": self._pre_close_base_price,
-                "close": self._pre_close_base_price,
-                "is_dummy": True,
-                "contract_month": "dummy"
-            }
+            next_dummy_minute = self._pre_close_base_minute + (5 - self.pre_close_count)
+            dummy = Bar.flat(next_dummy_minute, self._pre_close_base_price, True, "dummy")
             self.pre_close_count -= 1
-            self.current_minute = next_dummy_time
+            self.current_minute = next_dummy_minute
             self.ohlc = dummy
 
-            self.last_dummy_minute = next_dummy_time
+            self.last_dummy_minute = next_dummy_minute
 
             #  print()はカウント減らす前にやる！
-            print(f"[DUMMY] プレクロージング補完 {5 - self.pre_close_count}/5: {dummy['time']}")
+            print(f"[DUMMY] プレクロージング補完 {5 - self.pre_close_count}/5: {dummy.time}")
 
             if self.pre_close_count == 0:
                 self.pre_close_count = None
@@ -85,25 +68,31 @@ class OHLCBuilder:
 
         # 同一分内の更新
         if minute == self.current_minute:
-            self.ohlc["high"] = max(self.ohlc["high"], price)
-            self.ohlc["low"] = min(self.ohlc["low"], price)
-            self.ohlc["close"] = price
+            self.ohlc.update(tick.price)
             return None
 
-    def _finalize_ohlc(self) -> dict:
+    def amend(self, tick: Tick) -> bool:
+        """
+        遅延ティックを構築中の足に反映する（高値・安値のみ）。構築中の足と同じ分の実データの足でなければ False。
+        """
+        if self.ohlc is None or self.ohlc.is_dummy or tick.minute != self.current_minute:
+            return False
+        self.ohlc.extend(tick.price)
+        return True
+
+    def _finalize_ohlc(self) -> Optional[Bar]:
         """
         現在保持している最新のOHLC（確定済み or 補完）を返す。
         """
         return self.ohlc
 
 
-    def force_finalize(self) -> dict:
+    def force_finalize(self) -> Optional[Bar]:
         """
         クロージングtickなどで明示的にOHLCを確定・取得する。
+        書き込み側はその場で値を読むため、コピーせずに構築中の Bar を返す。
         """
-        if self.ohlc is None:
-            return None
-        return self.ohlc.copy()
+        return self.ohlc
 
     def _get_session_id(self, dt: datetime) -> str:
         """
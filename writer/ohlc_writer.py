@@ -2,6 +2,8 @@ import os
 import csv
 from datetime import datetime
 from utils.time_util import get_trade_date
+from utils.archive_catalog import get_archive_catalog
+from utils.market_types import Bar
 
 
 class OHLCWriter:
@@ -15,6 +17,8 @@ class OHLCWriter:
         self.current_trade_date = None
         self.file = None
         self.writer = None
+        self.filename = None
+        self.catalog = get_archive_catalog(output_dir)
 
     def _open_new_file(self, trade_date: datetime.date):
         """
@@ -28,6 +32,7 @@ class OHLCWriter:
             self.output_dir,
             f"{trade_date.strftime('%Y%m%d')}_nikkei_mini_future.csv"
         )
+        self.filename = filename
         self.file = open(filename, "a", newline="", encoding="utf-8")
         self.writer = csv.writer(self.file)
 
@@ -35,37 +40,42 @@ class OHLCWriter:
             self.writer.writerow(["Time", "Open", "High", "Low", "Close", "Dummy", "ContractMonth"])
 
 
-    def write_row(self, ohlc: dict):
+    def write_row(self, bar: Bar):
         """
         OHLCを1行書き込む（取引日を見てファイル分割）
         """
-        time: datetime = ohlc["time"]
+        time: datetime = bar.time
         trade_date = get_trade_date(time)
 
         if self.current_trade_date != trade_date:
             self._open_new_file(trade_date)
 
         # Dummy フラグ（dummy または real）
-        dummy_flag = "dummy" if ohlc.get("is_dummy") else "real"
+        dummy_flag = "dummy" if bar.is_dummy else "real"
 
         # 限月（ダミーの場合は dummy）
-        contract_month = ohlc.get("contract_month", "")
+        contract_month = bar.contract_month if bar.contract_month is not None else ""
         if dummy_flag == "dummy":
             contract_month = "dummy"
 
+        offset = self.file.tell()
         self.writer.writerow([
             time.strftime("%Y/%m/%d %H:%M:%S"),
-            ohlc["open"],
-            ohlc["high"],
-            ohlc["low"],
-            ohlc["close"],
+            bar.open,
+            bar.high,
+            bar.low,
+            bar.close,
             dummy_flag,
             contract_month
         ])
         self.file.flush()
         os.fsync(self.file.fileno())
 
+        # 時刻→バイト位置の索引を伸ばす
+        self.catalog.record(trade_date, self.filename, bar.minute, offset, self.file.tell())
+
     def close(self):
+        self.catalog.save()
         if self.file:
             self.file.close()
             self.file = None
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from utils.archive_catalog import OHLC_COLUMNS
+from utils.time_util import from_minute, to_minute
+from utils.market_types import Bar, Tick
+from utils.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+DEFAULT_DB_PATH = os.path.join("db", "market.sqlite3")
+DEFAULT_SYMBOL = "NK225mini"
+TICK_BATCH_SIZE = 500        # ティックはこの件数ごとにまとめてコミット
+TICK_FLUSH_INTERVAL = 1.0    # 件数に達しなくてもこの秒数が経てばコミット
+
+
+class StorageBackend(ABC):
+    """
+    足とティックの保存先のインターフェース。
+
+    PriceHandler は確定した足を write_bar()、受信したティックを write_tick() に渡す。
+    保存先を追加する場合はこのクラスを継承して各メソッドを実装する。実装していないメソッドがあると、
+    記録の途中の最初の書き込みではなく、インスタンスを作る時点（起動時）で TypeError になる。
+    """
+
+    @abstractmethod
+    def write_bar(self, bar: Bar, timeframe: str = "1min"):
+        """足を保存する。同じ時刻の足は置き換える（実データはダミーで上書きしない）。"""
+
+    @abstractmethod
+    def write_tick(self, tick: Tick):
+        ...
+
+    @abstractmethod
+    def query_bars(self, start: datetime, end: datetime, timeframe: str = "1min") -> pd.DataFrame:
+        """[start, end] の足をCSVと同じ列名のDataFrameで返す。"""
+
+    @abstractmethod
+    def query_ticks(self, start: datetime, end: datetime) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def last_bar_time(self, timeframe: str = "1min") -> Optional[datetime]:
+        ...
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SqliteStorageBackend(StorageBackend):
+    """
+    ローカルのSQLiteに足とティックを保存するバックエンド。
+
+    - WALモードのため、記録中でも別プロセスから読み出せる
+    - 足は (symbol, time, timeframe) を主キーにしたUPSERTで、重複は構造上起こらない。
+      ダミー足は後から届いた実データの足で置き換わり、実データの足はダミーで上書きされない
+    - ティックは TICK_BATCH_SIZE 件 / TICK_FLUSH_INTERVAL 秒ごとに1トランザクションでまとめて挿入する
+    - time は epoch分（ティックは epochミリ秒）の整数で、範囲の読み出しは索引で引く
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, symbol: str = DEFAULT_SYMBOL,
+                 tick_batch_size: int = TICK_BATCH_SIZE, tick_flush_interval: float = TICK_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.symbol = symbol
+        self.tick_batch_size = tick_batch_size
+        self.tick_flush_interval = tick_flush_interval
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # 受信スレッドとメインスレッドの両方から呼ばれるため、ロックで直列化する
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+        self._tick_buffer = []
+        self._last_tick_flush = time.monotonic()
+        self.bars_written = 0
+        self.ticks_written = 0
+
+    def _create_tables(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS bars (
+                symbol TEXT NOT NULL,
+                time INTEGER NOT NULL,
+                timeframe TEXT NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                is_dummy INTEGER NOT NULL,
+                contract_month TEXT,
+                PRIMARY KEY (symbol, time, timeframe)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS ticks (
+                symbol TEXT NOT NULL,
+                time_ms INTEGER NOT NULL,
+                price REAL,
+                status INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS ticks_symbol_time ON ticks (symbol, time_ms);
+        """)
+
+    @staticmethod
+    def _bar_row(symbol: str, bar: Bar, timeframe: str) -> tuple:
+        contract_month = "dummy" if bar.is_dummy else bar.contract_month
+        return (symbol, bar.minute, timeframe, bar.open, bar.high, bar.low, bar.close, int(bool(bar.is_dummy)),
+                contract_month)
+
+    def write_bar(self, bar: Bar, timeframe: str = "1min"):
+        self.write_bars([bar], timeframe)
+
+    def write_bars(self, bars: list, timeframe: str = "1min"):
+        """複数の足を1トランザクションでUPSERTする（再構築や取り込み用）。"""
+        rows = [self._bar_row(self.symbol, bar, timeframe) for bar in bars]
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany("""
+                    INSERT INTO bars (symbol, time, timeframe, open, high, low, close, is_dummy, contract_month)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (symbol, time, timeframe) DO UPDATE SET
+                        open = excluded.open, high = excluded.high, low = excluded.low,
+                        close = excluded.close, is_dummy = excluded.is_dummy,
+                        contract_month = excluded.contract_month
+                    WHERE bars.is_dummy = 1 OR excluded.is_dummy = 0
+                """, rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.bars_written += len(rows)
+
+    def write_tick(self, tick: Tick):
+        with self._lock:
+            self._tick_buffer.append((self.symbol, tick.epoch_ms, tick.price, tick.status))
+            due = (len(self._tick_buffer) >= self.tick_batch_size
+                   or time.monotonic() - self._last_tick_flush >= self.tick_flush_interval)
+            if due:
+                self._flush_ticks()
+
+    def _flush_ticks(self):
+        self._last_tick_flush = time.monotonic()
+        if not self._tick_buffer:
+            return
+        rows, self._tick_buffer = self._tick_buffer, []
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany("INSERT INTO ticks (symbol, time_ms, price, status) VALUES (?, ?, ?, ?)", rows)
+            self.conn.execute("COMMIT")
+        except Exception as e:
+            self.conn.execute("ROLLBACK")
+            print(f"[ERROR][storage] ティックの書き込みに失敗しました（{len(rows)}件）: {e}")
+            return
+        self.ticks_written += len(rows)
+
+    def flush(self):
+        with self._lock:
+            self._flush_ticks()
+
+    def query_bars(self, start: datetime, end: datetime, timeframe: str = "1min") -> pd.DataFrame:
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT time, open, high, low, close, is_dummy, contract_month FROM bars
+                WHERE symbol = ? AND timeframe = ? AND time BETWEEN ? AND ?
+                ORDER BY time
+            """, (self.symbol, timeframe, to_minute(start), to_minute(end))).fetchall()
+
+        df = pd.DataFrame(rows, columns=OHLC_COLUMNS)
+        df["Time"] = pd.to_datetime(df["Time"].astype("int64") * 60, unit="s")
+        df["Dummy"] = df["Dummy"].map({1: "dummy", 0: "real"})
+        return df
+
+    def query_ticks(self, start: datetime, end: datetime) -> pd.DataFrame:
+        self.flush()
+        start_ms = to_minute(start) * 60_000 + start.second * 1000
+        end_ms = to_minute(end) * 60_000 + end.second * 1000 + 999
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT time_ms, price, status FROM ticks
+                WHERE symbol = ? AND time_ms BETWEEN ? AND ?
+                ORDER BY time_ms, rowid
+            """, (self.symbol, start_ms, end_ms)).fetchall()
+
+        df = pd.DataFrame(rows, columns=["Time", "Price", "CurrentPriceStatus"])
+        df["Time"] = pd.to_datetime(df["Time"].astype("int64"), unit="ms")
+        return df
+
+    def last_bar_time(self, timeframe: str = "1min") -> Optional[datetime]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MAX(time) FROM bars WHERE symbol = ? AND timeframe = ?", (self.symbol, timeframe)
+            ).fetchone()
+        return from_minute(row[0]) if row and row[0] is not None else None
+
+    def close(self):
+        with self._lock:
+            if self.conn is None:
+                return
+            self._flush_ticks()
+            self.conn.close()
+            self.conn = None
+        print(f"[INFO][storage] SQLite を閉じました: 足={self.bars_written}件 ティック={self.ticks_written}件")
+
+
+def create_storage_backend(name: str, **kwargs) -> Optional[StorageBackend]:
+    """
+    設定名から保存先を作る。"none" や空文字なら None（CSVのみ）。
+    """
+    if not name or name == "none":
+        return None
+    if name == "sqlite":
+        return SqliteStorageBackend(**kwargs)
+    raise ValueError(f"未知の保存先です: {name}")
@@ -2,6 +2,8 @@ import os
 import csv
 from datetime import datetime
 
+from utils.market_types import Tick
+
 class TickWriter:
     """
     受信したすべてのティックデータ（価格・時刻）をCSVファイルに記録するクラス。
@@ -11,6 +13,10 @@ class TickWriter:
     def __init__(self, enable_output=True):
         self.enable_output = enable_output
         self.current_date = datetime.now().date()
+        self._current_day = self.current_date.toordinal()
+        # 同じ分のティックでは時刻文字列の「YYYY/MM/DD HH:MM:」部分を使い回す
+        self._prefix_minute = None
+        self._prefix = ""
         self.first_file = None
         self.current_price_status = None
 
@@ -32,13 +38,14 @@ class TickWriter:
                 self.writer.writerow(["Time", "Price","CurrentPriceStatus"])
 
 
-    def write_tick(self, price, timestamp: datetime, current_price_status):
+    def write_tick(self, tick: Tick):
         """
         TickデータをCSVファイルに追記する。日付が変わった場合は新しいファイルに切り替える。
         """
+        timestamp = tick.timestamp
 
         # 日付が変わったら通常ファイルのみ切り替える
-        if timestamp.date() != self.current_date:
+        if timestamp.toordinal() != self._current_day:
             if self.enable_output and self.file:
                 self.file.close()
                 date_str = timestamp.strftime("%Y%m%d")
@@ -50,10 +57,14 @@ class TickWriter:
                     self.writer.writerow(["Time", "Price","CurrentPriceStatus"])
 
             self.current_date = timestamp.date()
+            self._current_day = timestamp.toordinal()
             self.last_written_minute = None  # 日付変更時にリセット
 
         # 書き込む内容を準備
-        row = [timestamp.strftime("%Y/%m/%d %H:%M:%S"), price,current_price_status]
+        if tick.minute != self._prefix_minute:
+            self._prefix_minute = tick.minute
+            self._prefix = timestamp.strftime("%Y/%m/%d %H:%M:")
+        row = [f"{self._prefix}{tick.second:02d}", tick.price, tick.status]
 
         # 通常のTick出力（有効時のみ）
         if self.enable_output and self.writer: